@@ -0,0 +1,74 @@
+"""
+Compare the 2-bit sequence kernel against the original per-character
+implementations of the dna_api.utils functions.
+
+Usage:
+    python -m benchmarks.bench_kernel [--sizes 1k 1M 100M] [--repeat 3]
+"""
+import argparse
+import time
+
+from dna_api.kernel import encode
+
+from .generators import parse_size, random_sequence
+
+
+# The implementations dna_api.utils shipped before the kernel
+def legacy_reverse_complement(sequence):
+    complement = {'A': 'T', 'T': 'A', 'C': 'G', 'G': 'C'}
+    return ''.join(complement[base] for base in reversed(sequence))
+
+
+def legacy_gc_content(sequence):
+    gc_count = sum(1 for base in sequence if base in 'GC')
+    return (gc_count / len(sequence)) * 100
+
+
+def legacy_validate_sequence(sequence):
+    valid_bases = {'A', 'T', 'C', 'G'}
+    return all(base in valid_bases for base in sequence)
+
+
+def kernel_gc_content(sequence):
+    counts = encode(sequence).base_counts()
+    return ((counts['G'] + counts['C']) / len(sequence)) * 100
+
+
+CASES = [
+    ("reverse_complement", legacy_reverse_complement,
+     lambda sequence: encode(sequence).reverse_complement().to_string()),
+    ("gc_content", legacy_gc_content, kernel_gc_content),
+    ("validate_sequence", legacy_validate_sequence,
+     lambda sequence: encode(sequence).is_valid()),
+]
+
+
+def best_of(func, sequence, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(sequence)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["1k", "1M", "100M"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'operation':<20}{'size':>8}{'legacy (s)':>14}{'kernel (s)':>14}{'speedup':>10}")
+    for size_label in args.sizes:
+        sequence = random_sequence(parse_size(size_label))
+        for name, legacy, kernel in CASES:
+            legacy_time, expected = best_of(legacy, sequence, args.repeat)
+            kernel_time, result = best_of(kernel, sequence, args.repeat)
+            if result != expected:
+                raise AssertionError(f"{name} results differ at size {size_label}")
+            print(f"{name:<20}{size_label:>8}{legacy_time:>14.6f}{kernel_time:>14.6f}"
+                  f"{legacy_time / kernel_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Measure worker cold start: time to load Django and the dna_api URLconf,
+resident memory afterwards, and the cost of the first chart render, with
+the heavy libraries loaded lazily or warmed up at startup.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Runs in a fresh interpreter per measurement
+CHILD = r"""
+import json, os, random, resource, sys, time
+start = time.perf_counter()
+os.environ["DJANGO_SETTINGS_MODULE"] = "dna_analysis.settings"
+import dna_analysis.settings
+dna_analysis.settings.DNA_WARM_UP = {warm}
+import django
+django.setup()
+import dna_api.urls
+startup = time.perf_counter() - start
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+rss = rss_mb()
+loaded = [name for name in ("matplotlib", "plotly", "reportlab", "Bio") if name in sys.modules]
+from dna_api.utils import gc_content_graph_png
+sequence = "".join(random.choices("ACGT", k=10000))  # random, so the result cache cannot answer
+start = time.perf_counter()
+gc_content_graph_png(sequence)
+first_chart = time.perf_counter() - start
+print(json.dumps({{"startup": startup, "rss_mb": rss, "first_chart": first_chart, "loaded": loaded}}))
+"""
+
+MODES = (("lazy", False), ("warm-up", True))
+
+
+def measure(warm):
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD.format(warm=warm)], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'mode':<10}{'startup (s)':>14}{'RSS (MB)':>12}{'first chart (s)':>18}  heavy modules loaded")
+    for label, warm in MODES:
+        runs = [measure(warm) for _ in range(args.runs)]
+        print(f"{label:<10}"
+              f"{statistics.median(run['startup'] for run in runs):>14.3f}"
+              f"{statistics.median(run['rss_mb'] for run in runs):>12.1f}"
+              f"{statistics.median(run['first_chart'] for run in runs):>18.3f}"
+              f"  {', '.join(runs[0]['loaded']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
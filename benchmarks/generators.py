@@ -0,0 +1,48 @@
+"""
+Synthetic, seeded sequences for the benchmarks: random DNA at a given GC
+fraction, and diverged copies of it with substitutions and, optionally,
+insertions and deletions.
+"""
+import numpy as np
+
+SIZE_SUFFIXES = {"k": 10 ** 3, "M": 10 ** 6, "G": 10 ** 9}
+DEFAULT_SIZES = ("1k", "100k", "1M")
+ALL_SIZES = ("1k", "10k", "100k", "1M", "10M", "100M")
+
+_BASES = np.frombuffer(b"ACGT", dtype=np.uint8)
+
+
+def parse_size(text):
+    if text[-1] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def random_sequence(length, seed=0, gc=0.5):
+    rng = np.random.default_rng(seed)
+    weights = [(1 - gc) / 2, gc / 2, gc / 2, (1 - gc) / 2]
+    return _BASES[rng.choice(4, size=length, p=weights)].tobytes().decode("ascii")
+
+
+# A copy of `sequence` with about `divergence` of its bases changed. Without
+# indels every change is a substitution and the copy keeps the length;
+# otherwise `indel_fraction` of the changes are single-base insertions or
+# deletions, half each.
+def diverged_sequence(sequence, divergence, seed=1, indel_fraction=0.0):
+    rng = np.random.default_rng(seed)
+    raw = np.frombuffer(sequence.encode("ascii"), dtype=np.uint8).copy()
+    changes = rng.random(len(raw)) < divergence
+    indels = changes & (rng.random(len(raw)) < indel_fraction)
+    substitutions = np.flatnonzero(changes & ~indels)
+    # Shifting the code by 1-3 always gives a different base
+    codes = np.searchsorted(_BASES, raw[substitutions])
+    raw[substitutions] = _BASES[(codes + rng.integers(1, 4, len(substitutions))) % 4]
+    if not indels.any():
+        return raw.tobytes().decode("ascii")
+    indel_positions = np.flatnonzero(indels)
+    deletions = indel_positions[rng.random(len(indel_positions)) < 0.5]
+    insertions = np.setdiff1d(indel_positions, deletions)
+    raw = np.insert(raw, insertions, _BASES[rng.integers(0, 4, len(insertions))])
+    # Deleted positions, shifted by the insertions before them
+    raw = np.delete(raw, deletions + np.searchsorted(insertions, deletions, side="right"))
+    return raw.tobytes().decode("ascii")
@@ -0,0 +1,281 @@
+"""
+Benchmark suite: micro-benchmarks of the dna_api.utils functions and
+renderers, and end-to-end latency and throughput of the REST endpoints
+through Django's test client, on synthetic sequences of several sizes and
+divergence levels. Results are written as JSON; given a baseline result
+file, cases whose median time grew by more than the threshold are flagged
+as regressions and the exit status is 1.
+
+The result cache is cleared before every timed call, so each run measures
+the computation. Do not point the suite at a shared cache in use elsewhere.
+
+Usage:
+    python -m benchmarks.suite [--sizes 1k 100k 1M] [--divergence 0.001 0.01]
+                               [--kind micro views] [--only NAME ...] [--repeat 5]
+                               [--output results.json] [--baseline old.json] [--threshold 0.2]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from .generators import ALL_SIZES, DEFAULT_SIZES, diverged_sequence, parse_size, random_sequence
+
+DEFAULT_DIVERGENCE = (0.001, 0.01)
+INDEL_FRACTION = 0.1
+KINDS = ("micro", "views")
+
+
+# A benchmarked operation. `run` takes the reference sequence and, for
+# paired cases, a diverged copy of it; sizes above `max_size` are skipped.
+# `prepare` turns those arguments into the call to time, so per-input setup
+# (such as encoding a request body) stays out of the measurement.
+class Case:
+    def __init__(self, name, kind, run=None, max_size=None, paired=False, indels=False, prepare=None):
+        self.name = name
+        self.kind = kind
+        self.prepare = prepare or (lambda *args: lambda: run(*args))
+        self.max_size = max_size
+        self.paired = paired
+        self.indels = indels
+
+
+def micro_cases():
+    from dna_api import utils
+    from dna_api.alignment import iter_aligned_variants
+    from dna_api.report import pdf_report_bytes
+
+    return [
+        Case("reverse_complement", "micro", lambda seq: utils.reverse_complement(seq)),
+        Case("gc_content", "micro", lambda seq: utils.gc_content(seq)),
+        Case("validate_sequence", "micro", lambda seq: utils.validate_sequence(seq)),
+        Case("translate_sequence", "micro", lambda seq: utils.translate_sequence(seq)),
+        Case("six_frame_translation", "micro", lambda seq: utils.six_frame_translation(seq)),
+        Case("detect_mutations", "micro", lambda seq, user: utils.detect_mutations(seq, user), paired=True),
+        Case("classify_mutations", "micro", lambda seq, user: utils.classify_mutations(seq, user), paired=True),
+        Case("aligned_variants", "micro", lambda seq, user: list(iter_aligned_variants(seq, user)),
+             max_size=10 ** 7, paired=True, indels=True),
+        Case("gc_content_graph_png", "micro", lambda seq: utils.gc_content_graph_png(seq), max_size=10 ** 7),
+        Case("interactive_gc_content_graph", "micro", lambda seq: utils.interactive_gc_content_graph(seq),
+             max_size=10 ** 7),
+        Case("pdf_report", "micro", lambda seq: pdf_report_bytes(seq), max_size=10 ** 6),
+    ]
+
+
+def _post(client, path, payload):
+    body = json.dumps(payload)
+
+    def run():
+        response = client.post(path, data=body, content_type="application/json")
+        if response.status_code not in (200, 201):
+            raise AssertionError(f"{path} returned {response.status_code}: {response.content[:200]!r}")
+        # Streaming responses are only produced as they are read
+        if response.streaming:
+            return sum(len(chunk) for chunk in response.streaming_content)
+        return len(response.content)
+
+    return run
+
+
+def view_cases():
+    from django.test import Client
+
+    client = Client()
+
+    def view(name, path, build, **options):
+        return Case(name, "views", prepare=lambda *args: _post(client, path, build(*args)), **options)
+
+    return [
+        view("reverse-complement", "/api/reverse-complement/", lambda seq: {"sequence": seq}, max_size=10 ** 7),
+        view("validate-sequence", "/api/validate-sequence/", lambda seq: {"sequence": seq}, max_size=10 ** 7),
+        view("protein-translation", "/api/protein-translation/", lambda seq: {"sequence": seq}, max_size=10 ** 7),
+        view("gc-content-graph", "/api/gc-content-graph/", lambda seq: {"sequence": seq}, max_size=10 ** 7),
+        view("interactive-gc-content", "/api/interactive-gc-content/", lambda seq: {"sequence": seq},
+             max_size=10 ** 7),
+        view("mutation-detection", "/api/mutation-detection/",
+             lambda seq, user: {"reference_sequence": seq, "user_sequence": user}, max_size=10 ** 7, paired=True),
+        view("mutation-detection-alignment", "/api/mutation-detection/",
+             lambda seq, user: {"reference_sequence": seq, "user_sequence": user, "mode": "alignment"},
+             max_size=10 ** 6, paired=True, indels=True),
+        view("mutation-classification", "/api/mutation-classification/",
+             lambda seq, user: {"reference_sequence": seq, "user_sequence": user}, max_size=10 ** 7, paired=True),
+        view("generate-report", "/api/generate-report/", lambda seq: {"sequence": seq}, max_size=10 ** 6),
+    ]
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "dna_analysis.settings")
+    import django
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    # Lets the test client's "testserver" host through ALLOWED_HOSTS
+    setup_test_environment()
+
+
+def time_case(case, args, repeat, warmup):
+    from dna_api.cache import get_result_cache
+
+    cache = get_result_cache()
+    call = case.prepare(*args)
+    for _ in range(warmup):
+        cache.clear()
+        call()
+    timings = []
+    for _ in range(repeat):
+        cache.clear()
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings, size):
+    ordered = sorted(timings)
+    median = statistics.median(ordered)
+    return {
+        "runs": len(ordered),
+        "min": ordered[0],
+        "median": median,
+        "p95": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+        "mean": statistics.fmean(ordered),
+        "bases_per_second": size / median if median else None,
+        "calls_per_second": 1 / median if median else None,
+    }
+
+
+def case_id(case, size_label, divergence):
+    parts = [case.kind, case.name, size_label]
+    if divergence is not None:
+        parts.append(f"d{divergence:g}")
+    return ":".join(parts)
+
+
+def run_suite(cases, sizes, divergences, repeat, warmup, log=print):
+    results = []
+    for size_label in sizes:
+        size = parse_size(size_label)
+        selected = [case for case in cases if case.max_size is None or size <= case.max_size]
+        if not selected:
+            continue
+        reference = random_sequence(size, seed=size)
+        copies = {}
+        for case in selected:
+            levels = divergences if case.paired else [None]
+            for divergence in levels:
+                if divergence is None:
+                    args = (reference,)
+                else:
+                    key = (divergence, case.indels)
+                    if key not in copies:
+                        copies[key] = diverged_sequence(
+                            reference, divergence, indel_fraction=INDEL_FRACTION if case.indels else 0.0
+                        )
+                    args = (reference, copies[key])
+                stats = summarize(time_case(case, args, repeat, warmup), size)
+                result = {
+                    "id": case_id(case, size_label, divergence),
+                    "kind": case.kind,
+                    "name": case.name,
+                    "size": size,
+                    "size_label": size_label,
+                    "divergence": divergence,
+                    **stats,
+                }
+                results.append(result)
+                log(f"{result['id']:<52}{stats['median']:>12.6f}{stats['p95']:>12.6f}"
+                    f"{stats['bases_per_second'] / 1e6:>14.1f}")
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+# (id, baseline median, median, ratio, status) for every case in both runs
+def compare(results, baseline, threshold):
+    previous = {result["id"]: result for result in baseline["results"]}
+    rows = []
+    for result in results:
+        old = previous.get(result["id"])
+        if old is None or not old["median"]:
+            continue
+        ratio = result["median"] / old["median"]
+        if ratio > 1 + threshold:
+            verdict = "REGRESSION"
+        elif ratio < 1 / (1 + threshold):
+            verdict = "improved"
+        else:
+            verdict = "ok"
+        rows.append((result["id"], old["median"], result["median"], ratio, verdict))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=list(DEFAULT_SIZES),
+                        help=f"Sequence sizes (default {' '.join(DEFAULT_SIZES)}; up to {ALL_SIZES[-1]}).")
+    parser.add_argument("--divergence", nargs="+", type=float, default=list(DEFAULT_DIVERGENCE),
+                        help="Fractions of changed bases for the paired cases.")
+    parser.add_argument("--kind", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--only", nargs="+", default=None, metavar="NAME", help="Only run these cases.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative slowdown of the median flagged as a regression (default 0.2).")
+    args = parser.parse_args(argv)
+
+    setup_django()
+    cases = []
+    if "micro" in args.kind:
+        cases += micro_cases()
+    if "views" in args.kind:
+        cases += view_cases()
+    if args.only:
+        unknown = set(args.only) - {case.name for case in cases}
+        if unknown:
+            parser.error(f"unknown case(s): {', '.join(sorted(unknown))}")
+        cases = [case for case in cases if case.name in args.only]
+
+    print(f"{'case':<52}{'median (s)':>12}{'p95 (s)':>12}{'Mbases/s':>14}")
+    results = run_suite(cases, args.sizes, args.divergence, args.repeat, args.warmup)
+    report = {"environment": environment(), "settings": vars(args), "results": results}
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as source:
+            rows = compare(results, json.load(source), args.threshold)
+        print(f"\n{'case':<52}{'baseline (s)':>14}{'now (s)':>12}{'ratio':>8}  verdict")
+        for case, old, new, ratio, verdict in rows:
+            print(f"{case:<52}{old:>14.6f}{new:>12.6f}{ratio:>8.2f}  {verdict}")
+        if any(row[4] == "REGRESSION" for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
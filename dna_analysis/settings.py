@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,9 +43,11 @@ INSTALLED_APPS = [
     'dna_api',
     'drf_yasg',
     'rest_framework.authtoken',
+    'rest_framework_simplejwt.token_blacklist',
 ]
 
 MIDDLEWARE = [
+    'dna_api.middleware.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,6 +89,85 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared tier of the analysis result cache, visible to every worker on the
+    # host. Entries are unpickled on read, so the directory must not be
+    # writable by other users: it lives inside the project and is created
+    # with mode 0700. MAX_BYTES bounds the total size of its files.
+    'dna_results': {
+        'BACKEND': 'dna_api.cache.BoundedFileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'results',
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 1000, 'MAX_BYTES': 1024 * 1024 * 1024},
+    },
+}
+
+# Analysis result cache (dna_api.cache): in-process LRU bounded by bytes,
+# backed by the shared cache alias below (None to disable the shared tier)
+DNA_RESULT_CACHE = {
+    'MAX_BYTES': 256 * 1024 * 1024,
+    'MAX_ITEM_BYTES': 32 * 1024 * 1024,
+    'SHARED_CACHE': 'dna_results',
+    'TIMEOUT': 24 * 60 * 60,
+}
+
+# Process pool size for /api/batch/ (None: number of CPUs)
+DNA_BATCH_PROCESSES = None
+
+# Directory of the packed, memory-mapped reference genome files (dna_api.references)
+DNA_REFERENCE_ROOT = BASE_DIR / 'references'
+
+# Import matplotlib, plotly, reportlab and Biopython at startup instead of on
+# first use (dna_api.warmup); useful with preforking servers such as gunicorn --preload
+DNA_WARM_UP = False
+
+# Requests sending this value in the X-DNA-Profile header are profiled with
+# cProfile (dna_api.metrics); profiling is disabled while it is empty.
+# Profiles are saved under DNA_PROFILE_DIR, or returned as text when the
+# request also sends "X-DNA-Profile-Output: text".
+DNA_PROFILE_TOKEN = os.environ.get('DNA_PROFILE_TOKEN', '')
+DNA_PROFILE_DIR = BASE_DIR / 'profiles'
+
+# Executor ('thread' or 'process') running each operation of the async views
+# under /api/async/ (dna_api.executors); DEFAULT covers the others. Worker
+# counts of None use the concurrent.futures defaults.
+DNA_ASYNC_EXECUTORS = {
+    'DEFAULT': 'thread',
+    'gc_content_graph': 'process',
+    'generate_report': 'process',
+    'interactive_gc_content_graph': 'process',
+}
+DNA_ASYNC_THREAD_WORKERS = None
+DNA_ASYNC_PROCESS_WORKERS = None
+
+# Admission control of the analysis endpoints (dna_api.admission). A request
+# costs its input bases times the endpoint weight and runs in the first class
+# whose MAX_COST covers it: at most CONCURRENCY at once per process, QUEUE
+# more waiting up to WAIT seconds (429/503 with Retry-After beyond that).
+# Costlier inputs become background jobs (202) when DEFER_OVERSIZED is set
+# and they are at most MAX_DEFERRED_BYTES, and are refused (413) otherwise.
+DNA_ADMISSION = {
+    'ENABLED': True,
+    'CLASSES': [
+        {'NAME': 'small', 'MAX_COST': 4 * 10 ** 6, 'CONCURRENCY': 8, 'QUEUE': 32, 'WAIT': 2},
+        {'NAME': 'medium', 'MAX_COST': 40 * 10 ** 6, 'CONCURRENCY': 2, 'QUEUE': 8, 'WAIT': 15},
+        {'NAME': 'large', 'MAX_COST': 400 * 10 ** 6, 'CONCURRENCY': 1, 'QUEUE': 2, 'WAIT': 60},
+    ],
+    'DEFER_OVERSIZED': True,
+    'MAX_DEFERRED_BYTES': 256 * 1024 * 1024,
+}
+
+# Largest request body read into memory; matches MAX_DEFERRED_BYTES above
+# (Django's default of 2.5 MB would refuse most inline sequences)
+DATA_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024 * 1024
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -128,6 +211,29 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-    ]
-}
\ No newline at end of file
+        'dna_api.authentication.CachedJWTAuthentication',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'dna_api.parsers.TimedJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Access tokens are checked without the database and expire quickly;
+# refresh tokens are rotated and blacklisted on use or logout, and changing
+# a password revokes every token of the user (dna_api.authentication)
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'ROTATE_REFRESH_TOKENS': True,
+    'BLACKLIST_AFTER_ROTATION': True,
+    'CHECK_REVOKE_TOKEN': True,
+}
+
+# Users named by access tokens are cached per process for TTL seconds (0 to
+# load the user on every request)
+DNA_AUTH_USER_CACHE = {
+    'TTL': 30,
+    'MAX_ENTRIES': 10000,
+}
@@ -1,4 +1,8 @@
 from django.contrib import admin
-from .models import DNAAnalysis
+from .models import AnalysisJob, DNAAnalysis, Mutation, ReferenceContig, ReferenceGenome
 
 admin.site.register(DNAAnalysis)
+admin.site.register(AnalysisJob)
+admin.site.register(Mutation)
+admin.site.register(ReferenceGenome)
+admin.site.register(ReferenceContig)
@@ -0,0 +1,403 @@
+import asyncio
+import functools
+import json
+import math
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import JsonResponse
+from django.urls import reverse
+
+from .options import parse_flag
+
+# Size-aware admission control for the analysis endpoints.
+#
+# Every request gets an estimated cost: its input size in bases times the
+# endpoint's weight. The input size is the request body length, known before
+# the body is read, or the length of the requested region when the input is
+# a registered reference. The cost selects a cost class, and each class
+# admits a fixed number of concurrent requests per process and queues a
+# bounded number more:
+#
+#     queue full                    429 Too Many Requests, Retry-After
+#     still queued after its wait   503 Service Unavailable, Retry-After
+#     above the largest class       202 and a background job when DEFER_OVERSIZED
+#                                   is set and the endpoint has a job operation,
+#                                   413 otherwise
+#
+# Retry-After is estimated from the recent service time of the class. Small
+# requests have their own slots, so a huge submission can only hold the
+# slots of its own class. Limits are per worker process, like the pools.
+
+DEFAULTS = {
+    "ENABLED": True,
+    "CLASSES": [
+        {"NAME": "small", "MAX_COST": 4 * 10 ** 6, "CONCURRENCY": 8, "QUEUE": 32, "WAIT": 2.0},
+        {"NAME": "medium", "MAX_COST": 40 * 10 ** 6, "CONCURRENCY": 2, "QUEUE": 8, "WAIT": 15.0},
+        {"NAME": "large", "MAX_COST": 400 * 10 ** 6, "CONCURRENCY": 1, "QUEUE": 2, "WAIT": 60.0},
+    ],
+    "DEFER_OVERSIZED": True,
+    "MAX_DEFERRED_BYTES": 256 * 1024 * 1024,
+}
+
+# Cost units per input base of each endpoint, roughly relative to its
+# measured time per base (benchmarks.suite)
+ENDPOINT_WEIGHTS = {
+    "validate_sequence": 0.5,
+    "reverse_complement": 1,
+    "protein_translation": 1,
+    "mutation_classification": 1,
+    "interactive_gc_content_graph": 1,
+    "motif_search": 1,
+    "mutation_detection": 2,
+    "kmer_spectrum": 2,
+    "gc_content_graph": 2,
+    "analysis": 3,
+    "generate_report": 4,
+    "batch": 1,
+}
+
+ASYNC_POLL_SECONDS = 0.01
+SERVICE_TIME_SMOOTHING = 0.2
+PEEK_BYTES = 64 * 1024
+
+
+def _window_params(data):
+    return {key: data[key] for key in ("window", "windows", "step", "start", "end", "points") if key in data}
+
+
+# The same choice as protein_translation_view: frame 1 only unless frames or
+# orfs is given. The view's orfs default (false) is passed on explicitly,
+# since the six-frame job defaults to true.
+def _translation_job(data):
+    orfs = parse_flag(data.get("orfs"), "orfs")
+    if data.get("frames") is None and not orfs:
+        return "translation", data.get("sequence", ""), "", {}
+    params = {key: data[key] for key in ("frames", "min_orf_length") if key in data}
+    return "six_frame_translation", data.get("sequence", ""), "", {**params, "orfs": orfs}
+
+
+# endpoint -> function(request data) -> (job operation, sequence, reference sequence, params)
+DEFERRED_OPERATIONS = {
+    "reverse_complement": lambda data: ("reverse_complement", data.get("sequence", ""), "", {}),
+    "protein_translation": _translation_job,
+    "gc_content_graph": lambda data: ("gc_content_graph", data.get("sequence", ""), "", _window_params(data)),
+    "interactive_gc_content_graph": lambda data: (
+        "interactive_gc_content_graph", data.get("sequence", ""), "", _window_params(data)
+    ),
+    "kmer_spectrum": lambda data: ("kmer_spectrum", data.get("sequence", ""), "", {
+        key: data[key] for key in ("k", "canonical", "top") if key in data
+    }),
+    "mutation_detection": lambda data: (
+        "mutation_detection", data.get("user_sequence", ""), data.get("reference_sequence", ""),
+        {key: data[key] for key in ("mode", "band", "collapse_runs") if key in data},
+    ),
+    "mutation_classification": lambda data: (
+        "mutation_classification", data.get("user_sequence", ""), data.get("reference_sequence", ""), {}
+    ),
+    "generate_report": lambda data: ("pdf_report", data.get("sequence", ""), data.get("reference_sequence", ""), {}),
+    "analysis": lambda data: ("analysis", data.get("sequence", ""), data.get("reference_sequence", ""), {
+        key: data[key] for key in ("mode", "band", "collapse_runs") if key in data
+    }),
+}
+
+
+class Rejected(Exception):
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CostClass:
+    def __init__(self, name, max_cost, concurrency, queue, wait):
+        self.name = name
+        self.max_cost = max_cost
+        self.concurrency = concurrency
+        self.queue = queue
+        self.wait = wait
+        self.condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.service_time = None
+        self.counters = {"admitted": 0, "queue_full": 0, "timed_out": 0}
+
+    # Seconds until a slot is likely free for one more queued request
+    def retry_after(self):
+        expected = (self.service_time or 1.0) * (self.waiting + 1) / self.concurrency
+        return max(1, math.ceil(expected))
+
+    # Takes a slot at once if nobody is queued ahead; True when taken
+    def _try_enter(self):
+        if self.active < self.concurrency and not self.waiting:
+            self.active += 1
+            self.counters["admitted"] += 1
+            return True
+        if self.waiting >= self.queue:
+            self.counters["queue_full"] += 1
+            raise Rejected(429, f"Too many {self.name} requests queued; retry later.", self.retry_after())
+        return False
+
+    def _timed_out(self):
+        self.counters["timed_out"] += 1
+        return Rejected(503, f"Timed out waiting for a {self.name} request slot; retry later.", self.retry_after())
+
+    def enter(self):
+        with self.condition:
+            if self._try_enter():
+                return
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.wait
+                while self.active >= self.concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._timed_out()
+                    self.condition.wait(remaining)
+                self.active += 1
+                self.counters["admitted"] += 1
+            finally:
+                self.waiting -= 1
+
+    # Like enter, polling so the event loop is never blocked
+    async def aenter(self):
+        with self.condition:
+            if self._try_enter():
+                return
+            self.waiting += 1
+        try:
+            deadline = time.monotonic() + self.wait
+            while True:
+                with self.condition:
+                    if self.active < self.concurrency:
+                        self.active += 1
+                        self.counters["admitted"] += 1
+                        return
+                if time.monotonic() >= deadline:
+                    with self.condition:
+                        raise self._timed_out()
+                await asyncio.sleep(ASYNC_POLL_SECONDS)
+        finally:
+            with self.condition:
+                self.waiting -= 1
+
+    def leave(self, duration):
+        with self.condition:
+            self.active -= 1
+            if self.service_time is None:
+                self.service_time = duration
+            else:
+                self.service_time += SERVICE_TIME_SMOOTHING * (duration - self.service_time)
+            self.condition.notify()
+
+
+_classes = None
+_classes_lock = threading.Lock()
+
+
+def admission_settings():
+    return {**DEFAULTS, **getattr(settings, "DNA_ADMISSION", {})}
+
+
+def cost_classes():
+    global _classes
+    with _classes_lock:
+        if _classes is None:
+            _classes = [
+                CostClass(spec["NAME"], spec["MAX_COST"], spec["CONCURRENCY"], spec["QUEUE"], spec["WAIT"])
+                for spec in sorted(admission_settings()["CLASSES"], key=lambda spec: spec["MAX_COST"])
+            ]
+        return _classes
+
+
+# Rebuilds the classes when DNA_ADMISSION is overridden (tests)
+@receiver(setting_changed)
+def _reset_cost_classes(setting, **kwargs):
+    global _classes
+    if setting == "DNA_ADMISSION":
+        with _classes_lock:
+            _classes = None
+
+
+def cost_class(cost):
+    for candidate in cost_classes():
+        if cost <= candidate.max_cost:
+            return candidate
+    return None
+
+
+def request_size(request, reads_references=False):
+    size = int(request.META.get("CONTENT_LENGTH") or 0)
+    # A small body may name a reference region, which is the real input
+    if reads_references and size <= PEEK_BYTES and hasattr(request, "data"):
+        data = request.data
+        if isinstance(data, dict) and data.get("reference"):
+            from .references import reference_region_length
+
+            try:
+                size = max(size, reference_region_length(data["reference"], data.get("region")))
+            except ValueError:
+                pass  # The view reports the bad reference
+    return size
+
+
+def _reject(rejected):
+    response = JsonResponse({"error": str(rejected)}, status=rejected.status)
+    if rejected.retry_after is not None:
+        response["Retry-After"] = str(rejected.retry_after)
+    return response
+
+
+def _oversized(endpoint, size, largest):
+    options = admission_settings()
+    defer = options["DEFER_OVERSIZED"] and endpoint in DEFERRED_OPERATIONS and size <= options["MAX_DEFERRED_BYTES"]
+    limit = int(largest.max_cost / ENDPOINT_WEIGHTS.get(endpoint, 1))
+    message = f"Input too large for this endpoint (size {size}, limit {limit})."
+    if endpoint in DEFERRED_OPERATIONS:
+        message += " Submit it to /api/jobs/ instead."
+    return defer, Rejected(413, message)
+
+
+def _request_data(request):
+    if hasattr(request, "data"):
+        return request.data
+    return json.loads(request.body or b"{}")
+
+
+def _deferred(endpoint, data):
+    from .jobs import submit_job
+
+    if data.get("reference"):
+        raise Rejected(413, "The reference region is too large for this endpoint; request a smaller region.")
+    job = submit_job(*DEFERRED_OPERATIONS[endpoint](data))
+    response = JsonResponse({
+        "job_id": str(job.id),
+        "operation": job.operation,
+        "status": job.status,
+        "deferred": True,
+        "message": "The input is too large to analyze in the request; poll the job for its result.",
+    }, status=202)
+    response["Location"] = reverse("job_status", args=[job.id])
+    return response
+
+
+# Gives the slot back once the response is done: now, or for a streaming
+# response, whose body is computed while it is sent, when the server
+# closes it
+def _release_when_done(response, selected, start):
+    if not getattr(response, "streaming", False):
+        selected.leave(time.perf_counter() - start)
+        return response
+    close = response.close
+    released = False
+
+    def close_and_release():
+        nonlocal released
+        try:
+            close()
+        finally:
+            if not released:
+                released = True
+                selected.leave(time.perf_counter() - start)
+
+    response.close = close_and_release
+    return response
+
+
+# Total length of the sequences of a batch request
+def batch_size(request):
+    sequences = request.data.get("sequences") if isinstance(request.data, dict) else None
+    if not isinstance(sequences, list):
+        return 0
+    return sum(len(sequence) for sequence in sequences if isinstance(sequence, str))
+
+
+# Limits the view to the cost class of each request (see above). Wraps the
+# function under @api_view, or an async view. reads_references marks views
+# taking a "reference" and "region" in place of an inline sequence; `size`,
+# when given, is a function(request) returning the input size to charge
+# instead of the body length.
+def admission(endpoint, reads_references=False, size=None):
+    weight = ENDPOINT_WEIGHTS.get(endpoint, 1)
+    measure = size or functools.partial(request_size, reads_references=reads_references)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not admission_settings()["ENABLED"]:
+                    return await view(request, *args, **kwargs)
+                size = measure(request)
+                selected = cost_class(size * weight)
+                if selected is None:
+                    defer, rejected = _oversized(endpoint, size, cost_classes()[-1])
+                    if not defer:
+                        return _reject(rejected)
+                    try:
+                        return await sync_to_async(_deferred)(endpoint, _request_data(request))
+                    except Rejected as rejected:
+                        return _reject(rejected)
+                    except ValueError as e:
+                        return JsonResponse({"error": str(e)}, status=400)
+                try:
+                    await selected.aenter()
+                except Rejected as rejected:
+                    return _reject(rejected)
+                start = time.perf_counter()
+                try:
+                    response = await view(request, *args, **kwargs)
+                except BaseException:
+                    selected.leave(time.perf_counter() - start)
+                    raise
+                return _release_when_done(response, selected, start)
+
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not admission_settings()["ENABLED"]:
+                return view(request, *args, **kwargs)
+            size = measure(request)
+            selected = cost_class(size * weight)
+            if selected is None:
+                defer, rejected = _oversized(endpoint, size, cost_classes()[-1])
+                if not defer:
+                    return _reject(rejected)
+                try:
+                    return _deferred(endpoint, _request_data(request))
+                except Rejected as rejected:
+                    return _reject(rejected)
+                except ValueError as e:
+                    return JsonResponse({"error": str(e)}, status=400)
+            try:
+                selected.enter()
+            except Rejected as rejected:
+                return _reject(rejected)
+            start = time.perf_counter()
+            try:
+                response = view(request, *args, **kwargs)
+            except BaseException:
+                selected.leave(time.perf_counter() - start)
+                raise
+            return _release_when_done(response, selected, start)
+
+        return wrapper
+
+    return decorator
+
+
+def metric_lines():
+    lines = []
+    for name, kind in (("active", "gauge"), ("waiting", "gauge"), ("admitted", "counter"),
+                       ("queue_full", "counter"), ("timed_out", "counter")):
+        metric = f"dna_admission_{name}" + ("_total" if kind == "counter" else "")
+        lines.append(f"# TYPE {metric} {kind}")
+        for cost in cost_classes():
+            with cost.condition:
+                value = getattr(cost, name) if kind == "gauge" else cost.counters[name]
+            lines.append(f'{metric}{{class="{cost.name}"}} {value}')
+    return lines
@@ -0,0 +1,353 @@
+from bisect import bisect_left
+
+import numpy as np
+
+from .kernel import as_bytes, encode
+from .mutations import SUBSTITUTION, MNV
+
+# Alignment-backed variant calling for sequences of different lengths.
+#
+# 1. Unique k-mers sampled from the reference are located in the user
+#    sequence and chained (longest increasing subsequence) into anchors.
+# 2. Consecutive anchors on the same diagonal form a stretch that is
+#    compared base by base, so substitutions need no dynamic programming.
+# 3. Only the gaps between stretches (and the sequence ends) are aligned,
+#    with a banded edit-distance DP. A segment whose traceback would not fit
+#    in MAX_TRACEBACK_CELLS is split at its middle row Hirschberg-style from
+#    one forward and one backward pass, so memory stays linear in length and
+#    time is proportional to length times band width.
+
+INSERTION = "insertion"
+DELETION = "deletion"
+
+DEFAULT_BAND = 64
+ANCHOR_K = 20
+MAX_TRACEBACK_CELLS = 1 << 22
+
+_INF = 1 << 40
+_DIAG, _UP, _LEFT = 0, 1, 2
+
+
+# Rolling 2-bit k-mer values at every position; k-mers overlapping a
+# non-ACGT base are flagged invalid
+def _kmers(sequence, k):
+    encoded = encode(sequence)
+    count = len(encoded) - k + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=bool)
+    codes = encoded.codes().astype(np.uint64)
+    values = np.zeros(count, dtype=np.uint64)
+    for offset in range(k):
+        values = (values << np.uint64(2)) | codes[offset:offset + count]
+    masked = np.concatenate([[0], np.cumsum(encoded.mask, dtype=np.int64)])
+    valid = masked[k:] - masked[:-k] == 0
+    return values, valid
+
+
+# Occurrence count of every query among values, with the index of its first
+# occurrence in sort order and the sort order itself
+def _occurrences(values, queries):
+    order = np.argsort(values, kind="stable")
+    ordered = values[order]
+    first = np.searchsorted(ordered, queries, side="left")
+    counts = np.searchsorted(ordered, queries, side="right") - first
+    return counts, first, order
+
+
+# Collinear (reference, user) positions of k-mers unique in both sequences
+def find_anchors(reference, user, k=ANCHOR_K):
+    ref_kmers, ref_valid = _kmers(reference, k)
+    user_kmers, user_valid = _kmers(user, k)
+    if not len(ref_kmers) or not len(user_kmers):
+        return []
+
+    # Non-overlapping reference samples that occur exactly once in each
+    # sequence, so repeats cannot pull the chain onto the wrong copy
+    ref_positions = np.arange(0, len(ref_kmers), k)
+    ref_positions = ref_positions[ref_valid[ref_positions]]
+    samples = ref_kmers[ref_positions]
+    once = _occurrences(ref_kmers[ref_valid], samples)[0] == 1
+    ref_positions, samples = ref_positions[once], samples[once]
+
+    user_positions = np.flatnonzero(user_valid)
+    counts, first, order = _occurrences(user_kmers[user_positions], samples)
+    once = counts == 1
+    ref_positions = ref_positions[once]
+    matched = user_positions[order[first[once]]]
+
+    # Longest chain with increasing user positions
+    tails, tail_index = [], []
+    parents = [-1] * len(matched)
+    matched_list = matched.tolist()
+    for index, position in enumerate(matched_list):
+        slot = bisect_left(tails, position)
+        parents[index] = tail_index[slot - 1] if slot else -1
+        if slot == len(tails):
+            tails.append(position)
+            tail_index.append(index)
+        else:
+            tails[slot] = position
+            tail_index[slot] = index
+    chain = []
+    index = tail_index[-1] if tail_index else -1
+    while index != -1:
+        chain.append(index)
+        index = parents[index]
+    chain.reverse()
+
+    anchors = []
+    ref_list = ref_positions.tolist()
+    for index in chain:
+        ref_position, user_position = ref_list[index], matched_list[index]
+        if anchors and user_position < anchors[-1][1] + k:
+            continue
+        anchors.append((ref_position, user_position))
+    return anchors
+
+
+# Banded edit-distance DP over diagonals j - i in [lo, hi]. Returns the last
+# row (indexed by k = j - n - lo) and, if requested, the traceback pointers.
+def _banded_dp(ref, user, lo, hi, traceback):
+    n, m = len(ref), len(user)
+    width = hi - lo + 1
+    band = np.arange(width, dtype=np.int64)
+    # padded_user[j + n] is user[j - 1] for every column the band can reach
+    padded_user = np.zeros(2 * n + m + 1, dtype=np.uint8)
+    padded_user[n + 1:n + 1 + m] = user
+    columns = lo + band
+    row = np.where((columns >= 0) & (columns <= m), columns, _INF)
+    pointers = np.empty((n, width), dtype=np.int8) if traceback else None
+    up = np.empty(width, dtype=np.int64)
+    for i in range(1, n + 1):
+        columns = i + lo + band
+        valid = (columns >= 0) & (columns <= m)
+        diag = row + (padded_user[columns + n] != ref[i - 1])
+        diag[columns < 1] = _INF
+        up[:-1] = row[1:] + 1
+        up[-1] = _INF
+        best = np.minimum(diag, up)
+        current = np.minimum.accumulate(best - band) + band
+        current[~valid] = _INF
+        np.minimum(current, _INF, out=current)
+        if traceback:
+            pointers[i - 1] = np.where(current < best, _LEFT, np.where(diag <= up, _DIAG, _UP))
+        row = current
+    return row, pointers
+
+
+# Alignment columns as (ref_index or None, user_index or None) pairs
+def _traceback(pointers, n, m, lo):
+    columns = []
+    i, k = n, m - n - lo
+    while i > 0 or i + lo + k > 0:
+        j = i + lo + k
+        pointer = pointers[i - 1, k] if i > 0 else _LEFT
+        if pointer == _DIAG:
+            columns.append((i - 1, j - 1))
+            i -= 1
+        elif pointer == _UP:
+            columns.append((i - 1, None))
+            i -= 1
+            k += 1
+        else:
+            columns.append((None, j - 1))
+            k -= 1
+    columns.reverse()
+    return columns
+
+
+# Diagonals outside [-n, m] cannot be reached from either corner
+def _clamp_band(lo, hi, n, m):
+    return max(lo, -n), min(hi, m)
+
+
+# Score of every column j of the split row, as a dense array over 0..m
+def _row_scores(ref, user, lo, hi, row_index, reverse):
+    m = len(user)
+    lo, hi = _clamp_band(lo, hi, len(ref), m)
+    row, _ = _banded_dp(ref, user, lo, hi, traceback=False)
+    scores = np.full(m + 1, _INF, dtype=np.int64)
+    columns = row_index + lo + np.arange(hi - lo + 1)
+    valid = (columns >= 0) & (columns <= m)
+    if reverse:
+        scores[m - columns[valid]] = row[valid]
+    else:
+        scores[columns[valid]] = row[valid]
+    return scores
+
+
+def _align_columns(ref, user, lo, hi, ref_offset, user_offset):
+    n, m = len(ref), len(user)
+    if n == 0 or m == 0:
+        if n:
+            return [(ref_offset + i, None) for i in range(n)]
+        return [(None, user_offset + j) for j in range(m)]
+    lo, hi = _clamp_band(lo, hi, n, m)
+    if n * (hi - lo + 1) <= MAX_TRACEBACK_CELLS or n == 1:
+        _, pointers = _banded_dp(ref, user, lo, hi, traceback=True)
+        return [
+            (None if i is None else ref_offset + i, None if j is None else user_offset + j)
+            for i, j in _traceback(pointers, n, m, lo)
+        ]
+    half = n // 2
+    forward = _row_scores(ref[:half], user, lo, hi, half, reverse=False)
+    backward = _row_scores(ref[half:][::-1], user[::-1], (m - n) - hi, (m - n) - lo, n - half, reverse=True)
+    split = int(np.argmin(forward + backward))
+    shift = split - half
+    return (
+        _align_columns(ref[:half], user[:split], lo, hi, ref_offset, user_offset)
+        + _align_columns(ref[half:], user[split:], lo - shift, hi - shift, ref_offset + half, user_offset + split)
+    )
+
+
+# Global banded alignment of two segments as alignment columns
+def align_segment(ref, user, band=DEFAULT_BAND, ref_offset=0, user_offset=0):
+    n, m = len(ref), len(user)
+    lo, hi = min(0, m - n) - band, max(0, m - n) + band
+    return _align_columns(ref, user, lo, hi, ref_offset, user_offset)
+
+
+# Reference / user position of the next aligned base after every column,
+# used to place insertions and deletions
+def _next_positions(columns):
+    next_ref, next_user = [0] * len(columns), [0] * len(columns)
+    ref_position = user_position = None
+    for index in range(len(columns) - 1, -1, -1):
+        next_ref[index], next_user[index] = ref_position, user_position
+        ref_index, user_index = columns[index]
+        if ref_index is not None:
+            ref_position = ref_index
+        if user_index is not None:
+            user_position = user_index
+    return next_ref, next_user
+
+
+def _columns_to_variants(columns, reference, user):
+    next_ref, next_user = _next_positions(columns)
+    variants = []
+    for index, (ref_index, user_index) in enumerate(columns):
+        if ref_index is not None and user_index is not None:
+            if reference[ref_index] != user[user_index]:
+                variants.append({
+                    "position": ref_index,
+                    "user_position": user_index,
+                    "reference_base": reference[ref_index],
+                    "user_base": user[user_index],
+                    "mutation_type": SUBSTITUTION,
+                })
+            continue
+        previous = variants[-1] if variants else None
+        if user_index is None:
+            if (previous is not None and previous["mutation_type"] == DELETION
+                    and previous["position"] + len(previous["reference_base"]) == ref_index):
+                previous["reference_base"] += reference[ref_index]
+                continue
+            following = next_user[index]
+            variants.append({
+                "position": ref_index,
+                "user_position": len(user) if following is None else following,
+                "reference_base": reference[ref_index],
+                "user_base": "",
+                "mutation_type": DELETION,
+            })
+        else:
+            if (previous is not None and previous["mutation_type"] == INSERTION
+                    and previous["user_position"] + len(previous["user_base"]) == user_index):
+                previous["user_base"] += user[user_index]
+                continue
+            following = next_ref[index]
+            variants.append({
+                "position": len(reference) if following is None else following,
+                "user_position": user_index,
+                "reference_base": "",
+                "user_base": user[user_index],
+                "mutation_type": INSERTION,
+            })
+    return variants
+
+
+def _stretch_substitutions(reference, user, ref_bytes, user_bytes, ref_start, ref_end, user_start):
+    length = ref_end - ref_start
+    positions = np.flatnonzero(
+        ref_bytes[ref_start:ref_end] != user_bytes[user_start:user_start + length]
+    ).tolist()
+    for offset in positions:
+        yield {
+            "position": ref_start + offset,
+            "user_position": user_start + offset,
+            "reference_base": reference[ref_start + offset],
+            "user_base": user[user_start + offset],
+            "mutation_type": SUBSTITUTION,
+        }
+
+
+def _aligned_gap(reference, user, ref_bytes, user_bytes, ref_start, ref_end, user_start, user_end, band):
+    columns = align_segment(
+        ref_bytes[ref_start:ref_end], user_bytes[user_start:user_end], band, ref_start, user_start
+    )
+    # Insertions / deletions touching the gap edges are positioned relative
+    # to the whole sequences, so pad the columns with the flanking matches
+    if ref_start and user_start:
+        columns.insert(0, (ref_start - 1, user_start - 1))
+    if ref_end < len(reference) and user_end < len(user):
+        columns.append((ref_end, user_end))
+    return _columns_to_variants(columns, reference, user)
+
+
+# Substitutions, insertions and deletions of user relative to reference, in
+# reference order. Positions are 0-based; insertions are reported at the
+# reference position they precede. The arguments are checked eagerly so
+# callers can report errors before they start streaming.
+def iter_aligned_variants(reference_sequence, user_sequence, band=DEFAULT_BAND, k=ANCHOR_K):
+    if band < 0:
+        raise ValueError("Band must be a non-negative integer.")
+    ref_bytes, user_bytes = as_bytes(reference_sequence), as_bytes(user_sequence)
+    return _iter_aligned_variants(reference_sequence, user_sequence, ref_bytes, user_bytes, band, k)
+
+
+def _iter_aligned_variants(reference_sequence, user_sequence, ref_bytes, user_bytes, band, k):
+    anchors = find_anchors(ref_bytes, user_bytes, k)
+
+    # Merge anchors on the same diagonal into stretches
+    stretches = []
+    for ref_position, user_position in anchors:
+        if stretches and user_position - ref_position == stretches[-1][2]:
+            stretches[-1][1] = ref_position + k
+        else:
+            stretches.append([ref_position, ref_position + k, user_position - ref_position])
+
+    ref_cursor = user_cursor = 0
+    for ref_start, ref_end, diagonal in stretches:
+        yield from _aligned_gap(
+            reference_sequence, user_sequence, ref_bytes, user_bytes,
+            ref_cursor, ref_start, user_cursor, ref_start + diagonal, band
+        )
+        yield from _stretch_substitutions(
+            reference_sequence, user_sequence, ref_bytes, user_bytes, ref_start, ref_end, ref_start + diagonal
+        )
+        ref_cursor, user_cursor = ref_end, ref_end + diagonal
+    yield from _aligned_gap(
+        reference_sequence, user_sequence, ref_bytes, user_bytes,
+        ref_cursor, len(ref_bytes), user_cursor, len(user_bytes), band
+    )
+
+
+# Merges adjacent substitutions into multi-nucleotide variants
+def collapse_substitution_runs(variants):
+    pending = None
+    for variant in variants:
+        if (
+            pending is not None and variant["mutation_type"] == SUBSTITUTION
+            and pending["mutation_type"] in (SUBSTITUTION, MNV)
+            and pending["position"] + len(pending["reference_base"]) == variant["position"]
+            and pending["user_position"] + len(pending["user_base"]) == variant["user_position"]
+        ):
+            pending = dict(pending, mutation_type=MNV,
+                           reference_base=pending["reference_base"] + variant["reference_base"],
+                           user_base=pending["user_base"] + variant["user_base"])
+            continue
+        if pending is not None:
+            yield pending
+        pending = variant
+    if pending is not None:
+        yield pending
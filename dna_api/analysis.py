@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+from django.db import transaction
+
+from .alignment import DEFAULT_BAND, collapse_substitution_runs, iter_aligned_variants
+from .kernel import BASE_CODES, as_bytes, encode
+from .models import DNAAnalysis
+from .mutations import mutations_from_blocks
+from .translation import AMINO_ACIDS
+from .variants import store_mutations
+
+# Full analysis in one fused pass.
+#
+# The sequence is encoded once and walked block by block; each block is
+# unpacked once and, while it is hot in cache, counted for GC content,
+# translated (frame 1, like translate_sequence) and compared against the
+# reference. Blocks are a multiple of 12 bases so they split on both packed
+# byte and codon boundaries. References of a different length (or
+# mode="alignment") are aligned instead, outside the fused pass.
+
+DEFAULT_BLOCK_SIZE = 3 * 4 * (1 << 16)
+
+_G, _C = BASE_CODES['G'], BASE_CODES['C']
+
+
+def analyze_sequence(sequence, reference_sequence=None, mode=None, collapse_runs=False, band=DEFAULT_BAND,
+                     block_size=DEFAULT_BLOCK_SIZE):
+    encoded = encode(sequence)
+    length = len(encoded)
+    if reference_sequence and mode is None:
+        mode = "direct" if len(reference_sequence) == length else "alignment"
+    if reference_sequence and mode == "direct" and len(reference_sequence) != length:
+        raise ValueError("Sequences must be of the same length for mutation detection.")
+    same_length = bool(reference_sequence) and mode == "direct"
+    if same_length:
+        raw, reference_raw = as_bytes(sequence), as_bytes(reference_sequence)
+    positions = encoded.exception_positions
+
+    gc_count = 0
+    protein, mismatch_blocks = [], []
+    for start in range(0, length, block_size):
+        stop = min(start + block_size, length)
+        codes = encoded.codes(start, stop)
+        gc_count += int(np.count_nonzero((codes == _G) | (codes == _C)))
+
+        usable = (stop - start) - (stop - start) % 3
+        triplets = codes[:usable].reshape(-1, 3)
+        amino_acids = AMINO_ACIDS[(triplets[:, 0] << 4) | (triplets[:, 1] << 2) | triplets[:, 2]]
+        lo, hi = np.searchsorted(positions, [start, start + usable])
+        if hi > lo:
+            unknown = np.zeros(len(amino_acids), dtype=bool)
+            unknown[(positions[lo:hi] - start) // 3] = True
+            amino_acids = amino_acids[~unknown]
+        protein.append(amino_acids.tobytes())
+
+        if same_length:
+            mismatch_blocks.append(np.flatnonzero(raw[start:stop] != reference_raw[start:stop]) + start)
+
+    if not reference_sequence:
+        mutations = []
+    elif same_length:
+        mutations = list(mutations_from_blocks(reference_sequence, sequence, mismatch_blocks, collapse_runs))
+    else:
+        mutations = iter_aligned_variants(reference_sequence, sequence, band)
+        if collapse_runs:
+            mutations = collapse_substitution_runs(mutations)
+        mutations = list(mutations)
+
+    return {
+        "length": length,
+        "valid": encoded.is_valid(),
+        "gc_content": gc_count / length * 100 if length else 0.0,
+        "translated_sequence": b"".join(protein).decode("ascii"),
+        "mutations": mutations,
+    }
+
+
+# Saves the analysis and its mutations as Mutation rows, atomically
+def save_sequence_analysis(sequence, result):
+    analysis = DNAAnalysis()
+    with transaction.atomic():
+        analysis.save_analysis(
+            sequence, result["gc_content"], result["translated_sequence"], json.dumps(result["mutations"])
+        )
+        store_mutations(analysis, result["mutations"])
+    return analysis
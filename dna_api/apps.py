@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class DnaApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dna_api'
+
+    def ready(self):
+        from .authentication import connect_signals
+        connect_signals()
+
+        if getattr(settings, 'DNA_WARM_UP', False):
+            from .warmup import warm_up
+            warm_up()
@@ -0,0 +1,333 @@
+import base64
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import APIException
+
+from .admission import admission
+from .alignment import DEFAULT_BAND, collapse_substitution_runs, iter_aligned_variants
+from .authentication import CachedJWTAuthentication
+from .cache import cached_result
+from .downsample import DEFAULT_POINTS
+from .executors import run_cpu
+from .kmers import DEFAULT_K, DEFAULT_TOP, kmer_spectrum
+from .mutations import DETECTION_MODES, iter_mutations
+from .report import PDF_CONTENT_TYPE, pdf_report_bytes
+from .translation import DEFAULT_MIN_ORF_LENGTH, classify_codon_changes
+from .utils import (
+    gc_content_graph_png, interactive_gc_content_graph, reverse_complement, six_frame_translation,
+    translate_sequence, validate_sequence
+)
+from .options import parse_flag
+from .views import GRAPH_FORMATS, parse_frames, parse_gc_window_params
+
+# Async versions of the analysis endpoints, under /api/async/.
+#
+# They take the same JSON bodies as their synchronous counterparts (inline
+# sequences only) and return the same responses. They are plain Django
+# views, so the JWT authentication DRF applies to the synchronous views is
+# applied here by `authenticated`, with the same outcome: anonymous requests
+# are allowed and a bad or revoked token is rejected with 401. The body is parsed and
+# checked on the event loop and the analysis runs through
+# dna_api.executors, so under an ASGI server one process keeps serving other
+# requests while slow analyses run. The tasks below are module-level
+# functions so the process executor can pickle them, and they share result
+# cache entries with the synchronous views. A client disconnect cancels the
+# request (Django raises CancelledError in the view), which drops its
+# queued work.
+
+
+def _error(message, status=400):
+    return JsonResponse({"error": message}, status=status)
+
+
+def _request_json(request):
+    try:
+        data = json.loads(request.body or b"{}")
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("Request body must be JSON.")
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object.")
+    return data
+
+
+# Authenticates the request like DRF's DEFAULT_AUTHENTICATION_CLASSES
+# before admission control; the user lookup may query the database
+def authenticated(view):
+    authenticator = CachedJWTAuthentication()
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            user_token = await sync_to_async(authenticator.authenticate)(request)
+        except APIException as e:
+            response = JsonResponse({"detail": str(e.detail)}, status=401)
+            response["WWW-Authenticate"] = authenticator.authenticate_header(request)
+            return response
+        request.user = user_token[0] if user_token is not None else AnonymousUser()
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _reverse_complement_task(sequence):
+    return cached_result("reverse_complement", {}, [sequence], lambda: reverse_complement(sequence))
+
+
+def _gc_content_graph_task(sequence, params):
+    return cached_result("gc_content_graph", params, [sequence], lambda: gc_content_graph_png(sequence, **params))
+
+
+def _translation_task(sequence, params):
+    if params is None:
+        return cached_result("translation", {}, [sequence], lambda: translate_sequence(sequence))
+    return cached_result("six_frame_translation", params, [sequence], lambda: six_frame_translation(sequence, **params))
+
+
+def _mutation_detection_task(reference_sequence, user_sequence, mode, band, collapse_runs):
+    if mode == "alignment":
+        mutations = iter_aligned_variants(reference_sequence, user_sequence, band)
+        if collapse_runs:
+            mutations = collapse_substitution_runs(mutations)
+    else:
+        mutations = iter_mutations(reference_sequence, user_sequence, collapse_runs)
+    return list(mutations)
+
+
+def _mutation_classification_task(reference_sequence, user_sequence):
+    summary, mutations = classify_codon_changes(reference_sequence, user_sequence)
+    return summary, list(mutations)
+
+
+def _interactive_task(sequence, params):
+    return cached_result(
+        "interactive_gc_content_graph", params, [sequence], lambda: interactive_gc_content_graph(sequence, **params)
+    )
+
+
+def _kmer_task(sequence, params):
+    return cached_result("kmer_spectrum", params, [sequence], lambda: kmer_spectrum(sequence, **params))
+
+
+@csrf_exempt
+@require_POST
+@authenticated
+@admission("reverse_complement")
+async def reverse_complement_view(request):
+    try:
+        sequence = _request_json(request).get("sequence", "")
+    except ValueError as e:
+        return _error(str(e))
+    if not sequence:
+        return _error("DNA sequence is required.")
+    try:
+        result = await run_cpu("reverse_complement", len(sequence), _reverse_complement_task, sequence)
+    except Exception as e:
+        return _error(str(e), 500)
+    return JsonResponse({"reverse_complement": result})
+
+
+@csrf_exempt
+@require_POST
+@authenticated
+@admission("gc_content_graph")
+async def gc_content_graph_view(request):
+    try:
+        data = _request_json(request)
+        sequence = data.get("sequence", "")
+        if not sequence:
+            return _error("DNA sequence is required.")
+        graph_format = data.get("format", "json")
+        if graph_format not in GRAPH_FORMATS:
+            raise ValueError(f"Format must be one of {', '.join(GRAPH_FORMATS)}.")
+        params = parse_gc_window_params(data)
+        png = await run_cpu("gc_content_graph", len(sequence), _gc_content_graph_task, sequence, params)
+    except ValueError as e:
+        return _error(str(e))
+    except Exception as e:
+        return _error(str(e), 500)
+    if graph_format == "png":
+        return HttpResponse(png, content_type="image/png")
+    return JsonResponse({"gc_content_graph": base64.b64encode(png).decode("utf-8")})
+
+
+@csrf_exempt
+@require_POST
+@authenticated
+@admission("protein_translation")
+async def protein_translation_view(request):
+    try:
+        data = _request_json(request)
+        sequence = data.get("sequence", "")
+        if not sequence:
+            return _error("DNA sequence is required.")
+        frames = data.get("frames")
+        find_orfs = parse_flag(data.get("orfs"), "orfs")
+        params = None
+        if frames is not None or find_orfs:
+            params = {
+                "frames": parse_frames(frames),
+                "orfs": find_orfs,
+                "min_orf_length": int(data.get("min_orf_length", DEFAULT_MIN_ORF_LENGTH)),
+            }
+        result = await run_cpu("protein_translation", len(sequence), _translation_task, sequence, params)
+    except (TypeError, ValueError) as e:
+        return _error(str(e))
+    except Exception as e:
+        return _error(str(e), 500)
+    if params is None:
+        return JsonResponse({"protein_sequence": result})
+    if frames is None:
+        del result["frames"]
+    return JsonResponse(result)
+
+
+@csrf_exempt
+@require_POST
+@authenticated
+@admission("mutation_detection")
+async def mutation_detection_view(request):
+    try:
+        data = _request_json(request)
+    except ValueError as e:
+        return _error(str(e))
+    reference_sequence = data.get("reference_sequence", "")
+    user_sequence = data.get("user_sequence", "")
+    if not reference_sequence or not user_sequence:
+        return _error("Both reference and user sequences are required.")
+    mode = data.get("mode", "direct")
+    if mode not in DETECTION_MODES:
+        return _error(f"Mode must be one of {', '.join(DETECTION_MODES)}.")
+    if mode == "direct" and len(reference_sequence) != len(user_sequence):
+        return _error('Sequences must be of the same length for mutation detection. '
+                      'Use "mode": "alignment" for sequences with insertions or deletions.')
+    try:
+        band = int(data.get("band", DEFAULT_BAND))
+        collapse_runs = parse_flag(data.get("collapse_runs"), "collapse_runs")
+        mutations = await run_cpu(
+            "mutation_detection", len(reference_sequence), _mutation_detection_task,
+            reference_sequence, user_sequence, mode, band, collapse_runs,
+        )
+    except (TypeError, ValueError) as e:
+        return _error(str(e))
+    except Exception as e:
+        return _error(str(e), 500)
+    return JsonResponse({"mutations": mutations})
+
+
+@csrf_exempt
+@require_POST
+@authenticated
+@admission("mutation_classification")
+async def mutation_classification_view(request):
+    try:
+        data = _request_json(request)
+    except ValueError as e:
+        return _error(str(e))
+    reference_sequence = data.get("reference_sequence", "")
+    user_sequence = data.get("user_sequence", "")
+    if not reference_sequence or not user_sequence:
+        return _error("Both reference and user sequences are required.")
+    try:
+        summary, mutations = await run_cpu(
+            "mutation_classification", len(reference_sequence), _mutation_classification_task,
+            reference_sequence, user_sequence,
+        )
+    except ValueError as e:
+        return _error(str(e))
+    except Exception as e:
+        return _error(str(e), 500)
+    return JsonResponse({"summary": summary, "mutations": mutations})
+
+
+@csrf_exempt
+@require_POST
+@authenticated
+@admission("validate_sequence")
+async def sequence_validation_view(request):
+    try:
+        sequence = _request_json(request).get("sequence", "")
+    except ValueError as e:
+        return _error(str(e))
+    if not sequence:
+        return _error("DNA sequence is required.")
+    try:
+        valid = await run_cpu("validate_sequence", len(sequence), validate_sequence, sequence)
+    except Exception as e:
+        return _error(str(e), 500)
+    if not valid:
+        return _error("Invalid DNA sequence: contains non-ACGT characters.")
+    return JsonResponse({"message": "DNA sequence is valid."})
+
+
+@csrf_exempt
+@require_POST
+@authenticated
+@admission("generate_report")
+async def generate_report_view(request):
+    try:
+        data = _request_json(request)
+    except ValueError as e:
+        return _error(str(e))
+    sequence = data.get("sequence", "")
+    if not sequence:
+        return _error("DNA sequence is required.")
+    try:
+        pdf = await run_cpu(
+            "generate_report", len(sequence), pdf_report_bytes, sequence, data.get("reference_sequence") or None
+        )
+    except ValueError as e:
+        return _error(str(e))
+    except Exception as e:
+        return _error(str(e), 500)
+    response = HttpResponse(pdf, content_type=PDF_CONTENT_TYPE)
+    response["Content-Disposition"] = 'attachment; filename="DNA_Analysis_Report.pdf"'
+    return response
+
+
+@csrf_exempt
+@require_POST
+@authenticated
+@admission("interactive_gc_content_graph")
+async def interactive_gc_content_view(request):
+    try:
+        data = _request_json(request)
+        sequence = data.get("sequence", "")
+        if not sequence:
+            return _error("DNA sequence is required.")
+        params = parse_gc_window_params(data)
+        params["points"] = int(data.get("points", DEFAULT_POINTS))
+        graph = await run_cpu("interactive_gc_content_graph", len(sequence), _interactive_task, sequence, params)
+    except (TypeError, ValueError) as e:
+        return _error(str(e))
+    except Exception as e:
+        return _error(str(e), 500)
+    return JsonResponse({"interactive_graph": graph})
+
+
+@csrf_exempt
+@require_POST
+@authenticated
+@admission("kmer_spectrum")
+async def kmer_spectrum_view(request):
+    try:
+        data = _request_json(request)
+        sequence = data.get("sequence", "")
+        if not sequence:
+            return _error("DNA sequence is required.")
+        params = {
+            "k": int(data.get("k", DEFAULT_K)),
+            "canonical": parse_flag(data.get("canonical"), "canonical"),
+            "top": int(data.get("top", DEFAULT_TOP)),
+        }
+        spectrum = await run_cpu("kmer_spectrum", len(sequence), _kmer_task, sequence, params)
+    except (TypeError, ValueError) as e:
+        return _error(str(e))
+    except Exception as e:
+        return _error(str(e), 500)
+    return JsonResponse(spectrum)
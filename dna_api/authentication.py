@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# Stateless request authentication with simplejwt access tokens.
+#
+# The token's signature and expiry are checked without the database. The
+# user it names is loaded once and kept in an in-process cache for
+# DNA_AUTH_USER_CACHE['TTL'] seconds, so authenticated requests normally cost
+# no query; a TTL of 0 loads the user on every request. The active flag and
+# the password hash claim are checked against the cached user each time.
+#
+# Revocation:
+#   logout (/api/logout/)        blacklists the refresh token, which can no
+#                                longer be refreshed; access tokens issued
+#                                from it expire within ACCESS_TOKEN_LIFETIME
+#   password change              invalidates every token of the user
+#                                (SIMPLE_JWT['CHECK_REVOKE_TOKEN'])
+#   deactivation or deletion     rejects every token of the user
+#
+# Saving or deleting a user drops it from the cache of the process doing
+# so; other worker processes see the change within the TTL.
+
+DEFAULT_TTL = 30
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class UserCache:
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires <= time.monotonic():
+                del self.entries[user_id]
+                return None
+            return user
+
+    def set(self, user_id, user):
+        with self.lock:
+            self.entries[user_id] = (time.monotonic() + self.ttl, user)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_user_cache = None
+_user_cache_lock = threading.Lock()
+
+
+def get_user_cache():
+    global _user_cache
+    with _user_cache_lock:
+        if _user_cache is None:
+            options = getattr(settings, "DNA_AUTH_USER_CACHE", {})
+            _user_cache = UserCache(options.get("TTL", DEFAULT_TTL), options.get("MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        return _user_cache
+
+
+# Connected to the user model's post_save and post_delete signals (apps.py)
+def forget_user(sender, instance, **kwargs):
+    get_user_cache().discard(str(getattr(instance, api_settings.USER_ID_FIELD)))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def load_user(self, user_id):
+        try:
+            return self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        cache = get_user_cache()
+        if cache.ttl > 0:
+            user = cache.get(str(user_id))
+            if user is None:
+                user = self.load_user(user_id)
+                cache.set(str(user_id), user)
+        else:
+            user = self.load_user(user_id)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+
+
+def connect_signals():
+    from django.db.models.signals import post_delete, post_save
+
+    user_model = get_user_model()
+    post_save.connect(forget_user, sender=user_model, dispatch_uid="dna_api_forget_user_saved")
+    post_delete.connect(forget_user, sender=user_model, dispatch_uid="dna_api_forget_user_deleted")
@@ -0,0 +1,134 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+from django.conf import settings
+
+from . import utils
+
+# Batch analysis of many sequences.
+#
+# All sequences of a batch are copied once into a single shared-memory block;
+# pool tasks only carry the block name and (index, start, end) offsets, so
+# no sequence is pickled per task. Items are grouped into tasks of roughly
+# TASK_BYTES so small sequences do not pay one round-trip each, and batches
+# below INLINE_BYTES run in the request thread without touching the pool.
+
+BATCH_OPERATIONS = {
+    "reverse_complement": utils.reverse_complement,
+    "complement": utils.complement,
+    "base_counts": utils.base_counts,
+    "gc_content": utils.gc_content,
+    "translate_sequence": utils.translate_sequence,
+    "six_frame_translation": utils.six_frame_translation,
+    "validate_sequence": utils.validate_sequence,
+}
+
+TASK_BYTES = 1 << 20
+INLINE_BYTES = 64 * 1024
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_batch_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            processes = getattr(settings, "DNA_BATCH_PROCESSES", None) or os.cpu_count() or 1
+            _pool = ProcessPoolExecutor(processes)
+        return _pool
+
+
+def _reset_batch_pool(broken):
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+
+
+def _run_item(sequence, operations):
+    item = {"status": "ok", "results": {}, "errors": {}}
+    for operation in operations:
+        try:
+            item["results"][operation] = BATCH_OPERATIONS[operation](sequence)
+        except Exception as e:
+            item["errors"][operation] = str(e) or e.__class__.__name__
+    if item["errors"]:
+        item["status"] = "error" if not item["results"] else "partial"
+    return item
+
+
+# Runs in a pool process against the shared block
+def _run_task(block_name, spans, operations):
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        return [
+            (index, _run_item(str(block.buf[start:end], "ascii"), operations))
+            for index, start, end in spans
+        ]
+    finally:
+        block.close()
+
+
+def _tasks(spans):
+    task, size = [], 0
+    for span in spans:
+        task.append(span)
+        size += span[2] - span[1]
+        if size >= TASK_BYTES:
+            yield task
+            task, size = [], 0
+    if task:
+        yield task
+
+
+def parse_batch_operations(operations):
+    if not operations:
+        raise ValueError("At least one operation is required.")
+    for operation in operations:
+        if operation not in BATCH_OPERATIONS:
+            raise ValueError(f"Unknown operation '{operation}'; choose from {', '.join(BATCH_OPERATIONS)}.")
+    return list(operations)
+
+
+# Results of every operation on every sequence, in input order. A failing
+# operation is reported in the item's errors instead of failing the batch.
+def run_batch(sequences, operations):
+    encoded, failed = [], {}
+    for index, sequence in enumerate(sequences):
+        try:
+            encoded.append((index, sequence.encode("ascii")))
+        except (AttributeError, UnicodeEncodeError):
+            failed[index] = {"status": "error", "results": {},
+                             "errors": {"sequence": "Sequence must be an ASCII string."}}
+
+    total = sum(len(data) for _, data in encoded)
+    if total <= INLINE_BYTES:
+        results = {index: _run_item(data.decode("ascii"), operations) for index, data in encoded}
+    else:
+        results = _run_pooled(encoded, total, operations)
+    results.update(failed)
+    return [dict(results[index], index=index) for index in range(len(sequences))]
+
+
+def _run_pooled(encoded, total, operations):
+    block = shared_memory.SharedMemory(create=True, size=max(total, 1))
+    try:
+        spans, offset = [], 0
+        for index, data in encoded:
+            block.buf[offset:offset + len(data)] = data
+            spans.append((index, offset, offset + len(data)))
+            offset += len(data)
+        pool = get_batch_pool()
+        try:
+            futures = [pool.submit(_run_task, block.name, task, operations) for task in _tasks(spans)]
+            return {index: item for future in futures for index, item in future.result()}
+        except BrokenProcessPool:
+            _reset_batch_pool(pool)
+            raise
+    finally:
+        block.close()
+        block.unlink()
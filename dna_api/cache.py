@@ -0,0 +1,184 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+
+# Content-addressed cache for deterministic analysis results.
+#
+# Results are keyed by a hash of (operation, parameters, sequence bytes) and
+# stored pickled, so their size is known exactly and callers can never mutate
+# a cached value. The in-process tier is an LRU bounded by total bytes; an
+# optional shared tier (any Django cache alias) lets worker processes reuse
+# each other's results. BoundedFileBasedCache is the file-based backend for
+# that tier with the same kind of byte budget on disk.
+
+DEFAULTS = {
+    "MAX_BYTES": 256 * 1024 * 1024,
+    "MAX_ITEM_BYTES": 32 * 1024 * 1024,
+    "SHARED_CACHE": None,
+    "TIMEOUT": 24 * 60 * 60,
+}
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(operation, params, sequences):
+    digest = hashlib.blake2b(digest_size=32)
+    digest.update(operation.encode("utf-8"))
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    for sequence in sequences:
+        data = sequence.encode("utf-8") if isinstance(sequence, str) else bytes(sequence)
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return f"dna:{operation}:{digest.hexdigest()}"
+
+
+# FileBasedCache that also keeps the total size of its files under
+# OPTIONS['MAX_BYTES'], removing the least recently used files first (a hit
+# refreshes the file's modification time). The budget is checked before each
+# write, so the directory can exceed it by at most one item.
+class BoundedFileBasedCache(FileBasedCache):
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._max_bytes = int(params.get("OPTIONS", {}).get("MAX_BYTES", DEFAULTS["MAX_BYTES"]))
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, default, version)
+        if value is not default:
+            try:
+                os.utime(self._key_to_file(key, version))
+            except OSError:
+                pass
+        return value
+
+    def _cull(self):
+        super()._cull()
+        files = []
+        for name in self._list_cache_files():
+            try:
+                stat = os.stat(name)
+            except OSError:
+                continue  # Removed by another process
+            files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self._max_bytes:
+                break
+            self._delete(name)
+            total -= size
+
+
+class ResultCache:
+    def __init__(self, max_bytes=DEFAULTS["MAX_BYTES"], max_item_bytes=DEFAULTS["MAX_ITEM_BYTES"],
+                 shared_cache=None, timeout=DEFAULTS["TIMEOUT"]):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.shared_cache = shared_cache
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "skipped": 0}
+
+    @classmethod
+    def from_settings(cls):
+        config = {**DEFAULTS, **getattr(settings, "DNA_RESULT_CACHE", {})}
+        shared = caches[config["SHARED_CACHE"]] if config["SHARED_CACHE"] else None
+        return cls(config["MAX_BYTES"], config["MAX_ITEM_BYTES"], shared, config["TIMEOUT"])
+
+    def _count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def _store_local(self, key, blob):
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = blob
+            self.size += len(blob)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.counters["evictions"] += 1
+
+    def _get_blob(self, key):
+        with self.lock:
+            blob = self.entries.get(key)
+            if blob is not None:
+                self.entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return blob
+        if self.shared_cache is not None:
+            blob = self.shared_cache.get(key)
+            if blob is not None:
+                self._count("shared_hits")
+                self._store_local(key, blob)
+                return blob
+        self._count("misses")
+        return None
+
+    def get(self, key):
+        blob = self._get_blob(key)
+        return (False, None) if blob is None else (True, pickle.loads(blob))
+
+    def set(self, key, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_item_bytes or len(blob) > self.max_bytes:
+            self._count("skipped")
+            logger.warning("Not caching %s: %d bytes is over the %d byte limit", key, len(blob),
+                           min(self.max_item_bytes, self.max_bytes))
+            return
+        self._store_local(key, blob)
+        if self.shared_cache is not None:
+            self.shared_cache.set(key, blob, self.timeout)
+
+    # Cached result of compute() for the operation, its parameters and input
+    # sequence(s); exceptions from compute are not cached
+    def get_or_compute(self, operation, params, sequences, compute):
+        key = cache_key(operation, params, sequences)
+        found, value = self.get(key)
+        if not found:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def stats(self):
+        with self.lock:
+            return {
+                **self.counters,
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "shared": self.shared_cache is not None,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+        if self.shared_cache is not None:
+            self.shared_cache.clear()
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache.from_settings()
+    return _result_cache
+
+
+def cached_result(operation, params, sequences, compute):
+    return get_result_cache().get_or_compute(operation, params, sequences, compute)
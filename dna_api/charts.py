@@ -0,0 +1,94 @@
+import io
+import queue
+
+from .cache import cached_result
+
+# Thread-safe chart rendering.
+#
+# Charts are drawn on explicit Agg Figure objects instead of the global
+# pyplot state machine, so concurrent requests never share a figure. Figures
+# with their axes, titles and labels already set up are kept in a pool of
+# templates; a render takes one, plots its data, writes the PNG and gives
+# it back with the data removed. Rendered PNGs are cached by the plotted
+# data, so the same profile is only ever drawn once. matplotlib itself is
+# imported when the first template is built.
+
+POOL_SIZE = 8
+DPI = 100
+
+
+def _gc_content_template():
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 6), dpi=DPI)
+    FigureCanvasAgg(figure)
+    gc_ax, skew_ax = figure.subplots(2, 1, sharex=True)
+    gc_ax.set_ylabel("GC Content (%)")
+    gc_ax.set_title("GC Content Analysis")
+    skew_ax.set_ylabel("GC Skew")
+    skew_ax.set_xlabel("Position")
+    return figure
+
+
+class FigurePool:
+    def __init__(self, build, size=POOL_SIZE):
+        self.build = build
+        self.figures = queue.LifoQueue(size)
+
+    def acquire(self):
+        try:
+            return self.figures.get_nowait()
+        except queue.Empty:
+            return self.build()
+
+    def release(self, figure):
+        for ax in figure.axes:
+            for line in list(ax.lines):
+                line.remove()
+            legend = ax.get_legend()
+            if legend is not None:
+                legend.remove()
+            ax.set_prop_cycle(None)
+        try:
+            self.figures.put_nowait(figure)
+        except queue.Full:
+            pass
+
+    def render_png(self, draw):
+        figure = self.acquire()
+        try:
+            draw(figure)
+            for ax in figure.axes:
+                ax.relim()
+                ax.autoscale_view()
+            buffer = io.BytesIO()
+            figure.canvas.print_png(buffer)
+            return buffer.getvalue()
+        finally:
+            self.release(figure)
+
+
+gc_content_figures = FigurePool(_gc_content_template)
+
+
+# PNG of windowed GC content and GC skew against window midpoints, for
+# profiles as returned by gc_profiles()
+def render_gc_content_png(profiles):
+    data = [
+        array.tobytes()
+        for profile in profiles.values()
+        for array in (profile["start"], profile["end"], profile["gc_content"], profile["gc_skew"])
+    ]
+
+    def draw(figure):
+        gc_ax, skew_ax = figure.axes
+        for window, profile in profiles.items():
+            midpoints = (profile["start"] + profile["end"]) / 2
+            gc_ax.plot(midpoints, profile["gc_content"], label=f"{window} bp")
+            skew_ax.plot(midpoints, profile["gc_skew"], label=f"{window} bp")
+        gc_ax.legend(loc="upper right")
+
+    return cached_result(
+        "gc_content_png", {"windows": list(profiles)}, data, lambda: gc_content_figures.render_png(draw)
+    )
@@ -0,0 +1,163 @@
+import numpy as np
+
+from .cache import cache_key, get_result_cache
+from .gc_profile import GCProfile
+
+# Shape-preserving downsampling for plotted series.
+#
+# A MinMaxPyramid keeps a series at full resolution plus coarser levels in
+# which bucket i of level k covers buckets 2i and 2i+1 of level k-1 (so
+# points i * 2**k to (i + 1) * 2**k - 1 of the series) and remembers the
+# position and value of its minimum and maximum. A query for a zoom range
+# and a point budget picks the finest level that fits and returns each
+# bucket's min and max in position order, so peaks and troughs survive at
+# any zoom. Building the levels is O(n) once; every query after that only
+# touches the buckets it returns.
+#
+# The GC pyramids are cached level by level in blocks of BLOCK_BUCKETS
+# buckets, so no cache entry grows with the sequence and a query only
+# unpickles the blocks it reads.
+
+DEFAULT_POINTS = 2000
+MAX_POINTS = 100000
+BLOCK_BUCKETS = 1 << 16
+
+
+class MinMaxPyramid:
+    def __init__(self, x, y):
+        x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        level = {"min_x": x, "min_y": y, "max_x": x, "max_y": y}
+        self.levels = [level]
+        while len(level["min_x"]) > 1:
+            level = self._coarsen(level)
+            self.levels.append(level)
+
+    @staticmethod
+    def _coarsen(level):
+        if len(level["min_x"]) % 2:
+            level = {name: np.append(values, values[-1]) for name, values in level.items()}
+        left = {name: values[0::2] for name, values in level.items()}
+        right = {name: values[1::2] for name, values in level.items()}
+        lower = right["min_y"] < left["min_y"]
+        higher = right["max_y"] > left["max_y"]
+        return {
+            "min_x": np.where(lower, right["min_x"], left["min_x"]),
+            "min_y": np.where(lower, right["min_y"], left["min_y"]),
+            "max_x": np.where(higher, right["max_x"], left["max_x"]),
+            "max_y": np.where(higher, right["max_y"], left["max_y"]),
+        }
+
+    @property
+    def depth(self):
+        return len(self.levels)
+
+    # Points of the series inside [start, end]
+    def _finest_span(self, start, end):
+        x = self.levels[0]["min_x"]
+        return np.searchsorted(x, start), np.searchsorted(x, end, side="right")
+
+    # Buckets lo:hi of a level
+    def _buckets(self, index, lo, hi):
+        return {name: values[lo:hi] for name, values in self.levels[index].items()}
+
+    # (x, y) of at most `points` points covering [start, end]
+    def query(self, start=-np.inf, end=np.inf, points=DEFAULT_POINTS):
+        if not 2 <= points <= MAX_POINTS:
+            raise ValueError(f"Points must be between 2 and {MAX_POINTS}.")
+        lo, hi = self._finest_span(start, end)
+        if hi - lo <= points:
+            finest = self._buckets(0, lo, hi)
+            return finest["min_x"], finest["min_y"]
+        for index in range(1, self.depth):
+            level_lo, level_hi = lo >> index, ((hi - 1) >> index) + 1
+            if 2 * (level_hi - level_lo) <= points:
+                break
+        buckets = self._buckets(index, level_lo, level_hi)
+        min_x, min_y = buckets["min_x"], buckets["min_y"]
+        max_x, max_y = buckets["max_x"], buckets["max_y"]
+        min_first = min_x <= max_x
+        x = np.stack([np.where(min_first, min_x, max_x), np.where(min_first, max_x, min_x)], axis=1)
+        y = np.stack([np.where(min_first, min_y, max_y), np.where(min_first, max_y, min_y)], axis=1)
+        return x.ravel(), y.ravel()
+
+    # ((level, block), buckets) for every block of BLOCK_BUCKETS buckets; the
+    # finest level only needs its points
+    def blocks(self):
+        for index, level in enumerate(self.levels):
+            names = ("min_x", "min_y") if index == 0 else tuple(level)
+            for block in range(0, len(level["min_x"]), BLOCK_BUCKETS):
+                yield (index, block // BLOCK_BUCKETS), {
+                    name: level[name][block:block + BLOCK_BUCKETS].copy() for name in names
+                }
+
+
+# A MinMaxPyramid of a GC series whose levels are read block by block from
+# the result cache. The window midpoints are i * step + window / 2, so the
+# points inside a zoom range follow from the window geometry alone; a
+# missing block rebuilds and stores both series of its window.
+class CachedGCPyramid(MinMaxPyramid):
+    def __init__(self, sequence, source, window, step, series):
+        self.sequence = sequence
+        self.source = source
+        self.window = window
+        self.step = step
+        self.series = series
+        length = len(sequence)
+        step = window if step is None else step
+        if window < 1 or step < 1:
+            raise ValueError("Window and step must be positive integers.")
+        self.span = min(window, length)
+        self.stride = step
+        self.points = (length - self.span) // step + 1 if length else 0
+
+    @property
+    def depth(self):
+        return max(self.points - 1, 0).bit_length() + 1
+
+    def _finest_span(self, start, end):
+        # 2 * midpoint_i = 2 * i * stride + span is an integer, so compare it
+        # with the bounds doubled and rounded inwards
+        lo, hi = 0, self.points
+        if start > -np.inf:
+            lo = max(lo, -((self.span - int(np.ceil(2 * start))) // (2 * self.stride)))
+        if end < np.inf:
+            hi = min(hi, (int(np.floor(2 * end)) - self.span) // (2 * self.stride) + 1)
+        return lo, max(lo, hi)
+
+    def _block_key(self, series, index, block):
+        params = {"window": self.window, "step": self.step, "series": series, "level": index, "block": block}
+        return cache_key("gc_pyramid_block", params, [self.source])
+
+    def _block(self, index, block):
+        cache = get_result_cache()
+        found, buckets = cache.get(self._block_key(self.series, index, block))
+        if found:
+            return buckets
+        series = GCProfile(self.sequence).windows(self.window, self.step)
+        midpoints = (series["start"] + series["end"]) / 2
+        for name in ("gc_content", "gc_skew"):
+            for (level, number), values in MinMaxPyramid(midpoints, series[name]).blocks():
+                cache.set(self._block_key(name, level, number), values)
+                if name == self.series and (level, number) == (index, block):
+                    buckets = values
+        return buckets
+
+    def _buckets(self, index, lo, hi):
+        if lo >= hi:
+            return {name: np.empty(0) for name in ("min_x", "min_y", "max_x", "max_y")}
+        parts = [self._block(index, block) for block in range(lo // BLOCK_BUCKETS, (hi - 1) // BLOCK_BUCKETS + 1)]
+        offset = lo - lo // BLOCK_BUCKETS * BLOCK_BUCKETS
+        return {name: np.concatenate([part[name] for part in parts])[offset:offset + hi - lo] for name in parts[0]}
+
+
+# GC content and GC skew pyramids over the whole sequence, one pair per
+# window size. Their blocks are cached so pan and zoom requests do not
+# rescan the sequence.
+def gc_pyramids(sequence, windows, step=None):
+    source = cache_key("gc_profile", {}, [sequence])
+    return {
+        window: {
+            series: CachedGCPyramid(sequence, source, window, step, series) for series in ("gc_content", "gc_skew")
+        }
+        for window in windows
+    }
@@ -0,0 +1,100 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+# Executors for the CPU-bound work of the async views (dna_api.async_views).
+#
+# Each operation runs on the thread or the process executor, as configured in
+# DNA_ASYNC_EXECUTORS. Threads suit the NumPy kernels, which release the GIL
+# for most of their work; rendering (matplotlib, reportlab, plotly) holds the
+# GIL and is better sent to processes. Process workers are spawned rather
+# than forked, since the server process runs threads, and set Django up
+# before their first task. Small inputs of the operations in INLINE_BASES
+# run directly on the event loop, where queueing behind slow work would
+# cost more than they do. Every other operation is always sent to an
+# executor: the renderers take tens to hundreds of milliseconds even on
+# small inputs, and operations going through the result cache may read its
+# shared tier (files by default).
+#
+# When the awaiting request is cancelled (the client disconnected), work
+# still queued is dropped; work already running completes and its result is
+# discarded.
+
+THREAD = "thread"
+PROCESS = "process"
+EXECUTOR_KINDS = (THREAD, PROCESS)
+# Largest input, in bases, run on the event loop (about 1-3 ms each)
+INLINE_BASES = {
+    "validate_sequence": 64 * 1024,
+    "mutation_classification": 64 * 1024,
+    "mutation_detection": 8 * 1024,  # Banded alignment is the slow mode
+}
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _setup_worker():
+    import django
+
+    django.setup()
+
+
+def executor_kind(operation):
+    kinds = getattr(settings, "DNA_ASYNC_EXECUTORS", {})
+    kind = kinds.get(operation, kinds.get("DEFAULT", THREAD))
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f"DNA_ASYNC_EXECUTORS['{operation}'] must be one of {', '.join(EXECUTOR_KINDS)}.")
+    return kind
+
+
+def get_executor(kind):
+    with _executors_lock:
+        executor = _executors.get(kind)
+        if executor is None:
+            if kind == PROCESS:
+                executor = ProcessPoolExecutor(
+                    getattr(settings, "DNA_ASYNC_PROCESS_WORKERS", None),
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_setup_worker,
+                )
+            else:
+                executor = ThreadPoolExecutor(
+                    getattr(settings, "DNA_ASYNC_THREAD_WORKERS", None), thread_name_prefix="dna-async"
+                )
+            _executors[kind] = executor
+        return executor
+
+
+def _reset_executor(kind, broken):
+    with _executors_lock:
+        if _executors.get(kind) is broken:
+            del _executors[kind]
+
+
+# Result of fn(*args), computed off the event loop unless the operation is
+# cheap and the input small
+async def run_cpu(operation, size, fn, *args):
+    if size <= INLINE_BASES.get(operation, -1):
+        return fn(*args)
+    kind = executor_kind(operation)
+    executor = get_executor(kind)
+    if kind == THREAD:
+        # Keeps the request's context, so stage timers still reach its Server-Timing header
+        future = executor.submit(functools.partial(contextvars.copy_context().run, fn, *args))
+    else:
+        future = executor.submit(fn, *args)
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BrokenProcessPool:
+        _reset_executor(kind, executor)
+        raise
@@ -0,0 +1,49 @@
+from django import forms
+from django.db import models
+
+from .storage import pack_sequence, pack_text, unpack_sequence, unpack_text
+
+# Model fields that store text in a compact binary form (dna_api.storage)
+# while model code, forms and serializers keep working with plain strings.
+
+
+class _PackedTextField(models.BinaryField):
+    pack = unpack = None
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("editable", True)
+        super().__init__(*args, **kwargs)
+
+    def get_default(self):
+        return models.Field.get_default(self)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        return self.pack(str(value))
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else self.unpack(value)
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return self.unpack(value)
+        return value
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{"form_class": forms.CharField, "widget": forms.Textarea, **kwargs})
+
+
+class PackedSequenceField(_PackedTextField):
+    description = "DNA sequence stored 2 bits per base"
+    pack = staticmethod(pack_sequence)
+    unpack = staticmethod(unpack_sequence)
+
+
+class CompressedTextField(_PackedTextField):
+    description = "Text stored zlib-compressed when that is smaller"
+    pack = staticmethod(pack_text)
+    unpack = staticmethod(unpack_text)
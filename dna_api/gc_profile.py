@@ -0,0 +1,95 @@
+import numpy as np
+
+from .kernel import BASE_CODES, encode
+
+DEFAULT_WINDOW = 100
+
+_G, _C = BASE_CODES['G'], BASE_CODES['C']
+
+
+# _PARTIAL[byte, k]: value summed over the first k 2-bit fields of a byte
+def _partial_table(g_weight, c_weight):
+    table = np.zeros((256, 5), dtype=np.int64)
+    for byte in range(256):
+        for k in range(4):
+            code = (byte >> (6 - 2 * k)) & 3
+            table[byte, k + 1] = table[byte, k] + (g_weight if code == _G else c_weight if code == _C else 0)
+    return table
+
+
+_PARTIAL_GC = _partial_table(1, 1)
+_PARTIAL_SKEW = _partial_table(1, -1)
+
+
+# Windowed GC content / GC skew over one sequence.
+#
+# Prefix sums of G+C and G-C are built once per packed byte (so they take a
+# quarter of the entries a per-base array would); the count up to any base
+# position is the prefix at its byte plus a table lookup for the partial
+# byte. Every window, step and sub-region is then answered in O(1) per
+# window without rescanning the bases.
+class GCProfile:
+    def __init__(self, sequence):
+        encoded = encode(sequence)
+        self.length = len(encoded)
+        # One zero byte of padding so position == length is addressable
+        self.packed = np.concatenate([encoded.packed, np.zeros(1, dtype=np.uint8)])
+        dtype = np.int32 if self.length < 2 ** 31 else np.int64
+        self.cum_gc = self._cumulative(_PARTIAL_GC[encoded.packed, 4], dtype)
+        self.cum_skew = self._cumulative(_PARTIAL_SKEW[encoded.packed, 4], dtype)
+
+    @staticmethod
+    def _cumulative(per_byte, dtype):
+        cumulative = np.zeros(len(per_byte) + 1, dtype=dtype)
+        np.cumsum(per_byte, out=cumulative[1:])
+        return cumulative
+
+    def _prefix(self, cumulative, partial, positions):
+        byte_index = positions >> 2
+        return cumulative[byte_index].astype(np.int64) + partial[self.packed[byte_index], positions & 3]
+
+    def gc_count(self, positions):
+        return self._prefix(self.cum_gc, _PARTIAL_GC, np.asarray(positions, dtype=np.int64))
+
+    def skew_count(self, positions):
+        return self._prefix(self.cum_skew, _PARTIAL_SKEW, np.asarray(positions, dtype=np.int64))
+
+    def region_bounds(self, start=0, end=None):
+        end = self.length if end is None else end
+        if not 0 <= start < end <= self.length:
+            raise ValueError(f"Region {start}-{end} is outside the sequence (length {self.length}).")
+        return start, end
+
+    # Window start/end coordinates inside [start, end). A region shorter than
+    # the window yields a single window covering the whole region.
+    def window_bounds(self, window, step=None, start=0, end=None):
+        start, end = self.region_bounds(start, end)
+        step = window if step is None else step
+        if window < 1 or step < 1:
+            raise ValueError("Window and step must be positive integers.")
+        window = min(window, end - start)
+        starts = np.arange(start, end - window + 1, step, dtype=np.int64)
+        return starts, starts + window
+
+    def windows(self, window=DEFAULT_WINDOW, step=None, start=0, end=None):
+        starts, ends = self.window_bounds(window, step, start, end)
+        gc = self.gc_count(ends) - self.gc_count(starts)
+        skew = self.skew_count(ends) - self.skew_count(starts)
+        gc_skew = np.divide(skew, gc, out=np.zeros(len(gc)), where=gc > 0)
+        return {
+            "start": starts,
+            "end": ends,
+            "gc_content": gc / (ends - starts) * 100,
+            "gc_skew": gc_skew,
+        }
+
+    def gc_content(self, start=0, end=None):
+        start, end = self.region_bounds(start, end)
+        gc = self.gc_count([start, end])
+        return float(gc[1] - gc[0]) / (end - start) * 100
+
+
+# Window profiles for one or several window sizes over the same sequence
+def gc_profiles(sequence, windows=(DEFAULT_WINDOW,), step=None, start=0, end=None):
+    profile = sequence if isinstance(sequence, GCProfile) else GCProfile(sequence)
+    return {window: profile.windows(window, step, start, end) for window in windows}
@@ -0,0 +1,214 @@
+import gzip
+import json
+import zlib
+
+from .kernel import encode
+from .utils import reverse_complement, translate_sequence
+
+# Streaming FASTA / FASTQ ingestion.
+#
+# Uploads are read in fixed-size blocks and parsed into records without ever
+# holding a whole line, record or file in memory: sequence bytes are handed
+# to the analyses in chunks of at most chunk_size bases. Gzip input is
+# detected from its magic bytes and decompressed on the fly.
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+GZIP_MAGIC = b"\x1f\x8b"
+
+RECORD = "record"
+SEQUENCE = "sequence"
+
+_WHITESPACE = b" \t\r"
+
+
+# Re-attaches bytes that were read to sniff the format to the front of a stream
+class _PrefixedStream:
+    def __init__(self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def read(self, size=-1):
+        if not self.prefix:
+            return self.stream.read(size)
+        if size is None or size < 0:
+            data, self.prefix = self.prefix + self.stream.read(), b""
+            return data
+        data, self.prefix = self.prefix[:size], self.prefix[size:]
+        if len(data) < size:
+            data += self.stream.read(size - len(data))
+        return data
+
+
+def open_stream(stream):
+    head = stream.read(len(GZIP_MAGIC))
+    stream = _PrefixedStream(head, stream)
+    if head == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    return stream
+
+
+# Yields (fragment, ends_line) pairs; lines longer than a block are split
+# across several fragments
+def _line_fragments(stream, block_size):
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            return
+        start = 0
+        while start < len(block):
+            newline = block.find(b"\n", start)
+            if newline == -1:
+                yield block[start:], False
+                break
+            yield block[start:newline], True
+            start = newline + 1
+
+
+# Yields (RECORD, name) at the start of every record followed by
+# (SEQUENCE, chunk) events for its bases. FASTA (">"), FASTQ ("@", four-line
+# records) and bare sequence text without headers are accepted.
+def parse_records(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    stream = open_stream(stream)
+    fastq = None
+    at_line_start = True
+    line_kind = None
+    fastq_line = 0
+    header = bytearray()
+    buffer = bytearray()
+
+    for fragment, ends_line in _line_fragments(stream, chunk_size):
+        if at_line_start:
+            if fastq is None:
+                if not fragment.strip():
+                    continue
+                fastq = fragment.startswith(b"@")
+                if not fastq and not fragment.startswith(b">"):
+                    yield RECORD, ""
+            if fastq:
+                line_kind = (RECORD, SEQUENCE, None, None)[fastq_line % 4]
+                fastq_line += 1
+            else:
+                line_kind = RECORD if fragment.startswith(b">") else SEQUENCE
+            if line_kind is RECORD:
+                if buffer:
+                    yield SEQUENCE, bytes(buffer)
+                    buffer.clear()
+                header.clear()
+                fragment = fragment[1:]
+
+        if line_kind is RECORD:
+            header += fragment
+            if ends_line:
+                yield RECORD, header.decode("utf-8", "replace").strip()
+        elif line_kind is SEQUENCE:
+            buffer += fragment.translate(None, _WHITESPACE)
+            if len(buffer) >= chunk_size:
+                yield SEQUENCE, bytes(buffer)
+                buffer.clear()
+        at_line_start = ends_line
+
+    if line_kind is RECORD and not at_line_start:
+        yield RECORD, header.decode("utf-8", "replace").strip()
+    if buffer:
+        yield SEQUENCE, bytes(buffer)
+
+
+# Incremental versions of the per-sequence analyses, fed one chunk at a time.
+# A record that cannot be analyzed (e.g. a base that has no complement) is
+# reported with an "error" field instead of ending the response, which has
+# already started streaming by then.
+class RecordAnalysis:
+    OPERATIONS = ("length", "base_counts", "gc_content", "valid", "translation", "reverse_complement")
+    DEFAULT_OPERATIONS = ("length", "base_counts", "gc_content", "valid")
+
+    def __init__(self, name, operations=DEFAULT_OPERATIONS):
+        self.name = name
+        self.operations = operations
+        self.length = 0
+        self.counts = {}
+        self.valid = True
+        self.codon_carry = b""
+        self.protein = []
+        self.reverse_complement = []
+        self.error = None
+
+    def update(self, chunk):
+        self.length += len(chunk)
+        if self.error is not None:
+            return
+        try:
+            self.analyze(chunk)
+        except ValueError as e:
+            self.error = str(e)
+
+    def analyze(self, chunk):
+        encoded = encode(chunk)
+        for base, count in encoded.base_counts().items():
+            self.counts[base] = self.counts.get(base, 0) + count
+        self.valid = self.valid and encoded.is_valid()
+        if "translation" in self.operations:
+            chunk = self.codon_carry + chunk
+            usable = len(chunk) - len(chunk) % 3
+            self.protein.append(translate_sequence(chunk[:usable]))
+            self.codon_carry = chunk[usable:]
+        if "reverse_complement" in self.operations:
+            self.reverse_complement.append(reverse_complement(encoded))
+
+    def result(self):
+        if self.error is not None:
+            return {"name": self.name, "length": self.length, "error": self.error}
+        counts = self.counts or {base: 0 for base in "ACGT"}
+        values = {
+            "length": self.length,
+            "base_counts": counts,
+            "gc_content": (counts["G"] + counts["C"]) / self.length * 100 if self.length else 0.0,
+            "valid": self.valid,
+        }
+        result = {"name": self.name}
+        for operation in self.operations:
+            if operation == "translation":
+                result[operation] = "".join(self.protein)
+            elif operation == "reverse_complement":
+                result[operation] = "".join(reversed(self.reverse_complement))
+            else:
+                result[operation] = values[operation]
+        return result
+
+
+def parse_operations(operations):
+    if not operations:
+        return RecordAnalysis.DEFAULT_OPERATIONS
+    if isinstance(operations, str):
+        operations = [operation.strip() for operation in operations.split(",") if operation.strip()]
+    for operation in operations:
+        if operation not in RecordAnalysis.OPERATIONS:
+            raise ValueError(
+                f"Unknown operation '{operation}'; choose from {', '.join(RecordAnalysis.OPERATIONS)}."
+            )
+    return tuple(operations)
+
+
+# Runs the analyses over every record of a stream, yielding one result per
+# record as soon as the record ends. A stream that cannot be read to the end
+# (e.g. truncated gzip) ends with a result holding only an "error" field; the
+# record being read at that point is dropped.
+def analyze_stream(stream, operations=RecordAnalysis.DEFAULT_OPERATIONS, chunk_size=DEFAULT_CHUNK_SIZE):
+    analysis = None
+    try:
+        for event, value in parse_records(stream, chunk_size):
+            if event is RECORD:
+                if analysis is not None:
+                    yield analysis.result()
+                analysis = RecordAnalysis(value, operations)
+            else:
+                analysis.update(value)
+    except (OSError, EOFError, zlib.error) as e:
+        yield {"error": f"Could not read the upload: {e}"}
+        return
+    if analysis is not None:
+        yield analysis.result()
+
+
+def ndjson_lines(results):
+    for result in results:
+        yield json.dumps(result) + "\n"
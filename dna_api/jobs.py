@@ -0,0 +1,319 @@
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from .alignment import DEFAULT_BAND, collapse_substitution_runs, iter_aligned_variants
+from .analysis import analyze_sequence, save_sequence_analysis
+from .downsample import DEFAULT_POINTS
+from .gc_profile import DEFAULT_WINDOW
+from .kmers import DEFAULT_K, DEFAULT_TOP, kmer_spectrum
+from .models import AnalysisJob, AnalysisJobResultChunk
+from .mutations import iter_mutations
+from .options import parse_flag
+from .report import PDF_CONTENT_TYPE, pdf_report_bytes
+from .translation import DEFAULT_MIN_ORF_LENGTH, classify_codon_changes
+from .utils import (
+    interactive_gc_content_graph, reverse_complement,
+    six_frame_translation, translate_sequence, visualize_gc_content_graph,
+)
+
+# Background analysis jobs.
+#
+# Jobs are rows of AnalysisJob; there is no broker. `manage.py
+# run_analysis_worker` polls the table, claims queued jobs with a conditional
+# UPDATE (so several workers can share one database) and runs them on a
+# process pool. Pool processes only read their job's input; all writes happen
+# in the worker's main process. List-valued results are split into
+# AnalysisJobResultChunk rows so they can be paged without loading them whole.
+
+RESULT_CHUNK_SIZE = 1000
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+def _mutations(sequence, reference, params):
+    collapse_runs = parse_flag(params.get("collapse_runs"), "collapse_runs")
+    if params.get("mode", "direct") == "alignment":
+        mutations = iter_aligned_variants(reference, sequence, int(params.get("band", DEFAULT_BAND)))
+        if collapse_runs:
+            mutations = collapse_substitution_runs(mutations)
+    else:
+        mutations = iter_mutations(reference, sequence, collapse_runs)
+    return list(mutations)
+
+
+def _window_params(params):
+    return {
+        "windows": params.get("windows", [params["window"]] if "window" in params else [DEFAULT_WINDOW]),
+        "step": params.get("step"),
+        "start": params.get("start", 0),
+        "end": params.get("end"),
+    }
+
+
+def _analysis(sequence, reference, params):
+    return analyze_sequence(
+        sequence, reference,
+        mode=params.get("mode"),
+        collapse_runs=parse_flag(params.get("collapse_runs"), "collapse_runs"),
+        band=int(params.get("band", DEFAULT_BAND)),
+    )
+
+
+def _classification(sequence, reference, params):
+    summary, mutations = classify_codon_changes(reference, sequence)
+    return {"summary": summary, "mutations": list(mutations)}
+
+
+# operation -> (function(sequence, reference_sequence, params), needs a reference)
+JOB_OPERATIONS = {
+    "reverse_complement": (lambda sequence, reference, params: {"reverse_complement": reverse_complement(sequence)}, False),
+    "translation": (lambda sequence, reference, params: {"protein_sequence": translate_sequence(sequence)}, False),
+    "six_frame_translation": (
+        lambda sequence, reference, params: six_frame_translation(
+            sequence,
+            frames=params.get("frames", (1, 2, 3, -1, -2, -3)),
+            orfs=parse_flag(params.get("orfs"), "orfs", default=True),
+            min_orf_length=int(params.get("min_orf_length", DEFAULT_MIN_ORF_LENGTH)),
+        ),
+        False,
+    ),
+    "gc_content_graph": (
+        lambda sequence, reference, params: {"gc_content_graph": visualize_gc_content_graph(sequence, **_window_params(params))},
+        False,
+    ),
+    "interactive_gc_content_graph": (
+        lambda sequence, reference, params: {
+            "interactive_graph": interactive_gc_content_graph(
+                sequence, **_window_params(params), points=int(params.get("points", DEFAULT_POINTS))
+            )
+        },
+        False,
+    ),
+    "pdf_report": (lambda sequence, reference, params: pdf_report_bytes(sequence, reference or None), False),
+    "kmer_spectrum": (
+        lambda sequence, reference, params: kmer_spectrum(
+            sequence,
+            k=int(params.get("k", DEFAULT_K)),
+            canonical=parse_flag(params.get("canonical"), "canonical"),
+            top=int(params.get("top", DEFAULT_TOP)),
+        ),
+        False,
+    ),
+    "mutation_detection": (lambda sequence, reference, params: {"mutations": _mutations(sequence, reference, params)}, True),
+    "mutation_classification": (_classification, True),
+    "analysis": (_analysis, False),
+}
+
+
+# Boolean job parameters, stored as JSON booleans
+FLAG_PARAMS = ("collapse_runs", "orfs", "canonical")
+
+
+def submit_job(operation, sequence, reference_sequence="", params=None):
+    if operation not in JOB_OPERATIONS:
+        raise ValueError(f"Unknown operation '{operation}'; choose from {', '.join(JOB_OPERATIONS)}.")
+    if JOB_OPERATIONS[operation][1] and not reference_sequence:
+        raise ValueError(f"Operation '{operation}' requires a reference sequence.")
+    params = dict(params or {})
+    for name in FLAG_PARAMS:
+        if name in params:
+            params[name] = parse_flag(params[name], name)
+    return AnalysisJob.objects.create(
+        operation=operation,
+        params=params,
+        sequence=sequence,
+        reference_sequence=reference_sequence or "",
+    )
+
+
+def _init_process():
+    import django
+    django.setup()
+    # Connections inherited from a forked parent must not be shared
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+
+
+# Runs in a pool process: loads the job input and returns the raw result
+def execute_job(job_id):
+    close_old_connections()
+    job = AnalysisJob.objects.only("operation", "params", "sequence", "reference_sequence").get(pk=job_id)
+    function, _ = JOB_OPERATIONS[job.operation]
+    return function(job.sequence, job.reference_sequence, job.params)
+
+
+def store_result(job, result):
+    if isinstance(result, bytes):
+        job.result_file = result
+        job.result_content_type = PDF_CONTENT_TYPE
+        job.result = None
+        return []
+    stored, chunks = {}, []
+    for field, value in result.items():
+        if isinstance(value, list):
+            stored[field] = {"count": len(value), "paginated": True}
+            chunks.extend(
+                AnalysisJobResultChunk(job=job, field=field, index=index // RESULT_CHUNK_SIZE,
+                                       items=value[index:index + RESULT_CHUNK_SIZE])
+                for index in range(0, len(value), RESULT_CHUNK_SIZE)
+            )
+        else:
+            stored[field] = value
+    job.result = stored
+    return chunks
+
+
+def finish_job(job_id, result=None, error=None):
+    job = AnalysisJob.objects.defer("sequence", "reference_sequence").get(pk=job_id)
+    job.finished_at = timezone.now()
+    with transaction.atomic():
+        if error is not None:
+            job.status = AnalysisJob.FAILED
+            job.error = error
+        else:
+            if job.operation == "analysis":
+                analysis = save_sequence_analysis(
+                    AnalysisJob.objects.values_list("sequence", flat=True).get(pk=job_id), result
+                )
+                job.analysis = analysis
+                result = dict(result, analysis_id=analysis.id)
+            chunks = store_result(job, result)
+            AnalysisJobResultChunk.objects.bulk_create(chunks, batch_size=100)
+            job.status = AnalysisJob.SUCCEEDED
+        job.save()
+
+
+def claim_jobs(limit, worker_name):
+    claimed = []
+    candidates = AnalysisJob.objects.filter(status=AnalysisJob.QUEUED).order_by("created_at")
+    for job_id in candidates.values_list("pk", flat=True)[:limit * 2]:
+        if len(claimed) == limit:
+            break
+        updated = AnalysisJob.objects.filter(pk=job_id, status=AnalysisJob.QUEUED).update(
+            status=AnalysisJob.RUNNING, started_at=timezone.now(), worker=worker_name
+        )
+        if updated:
+            claimed.append(job_id)
+    return claimed
+
+
+def requeue_stale_jobs(older_than):
+    cutoff = timezone.now() - older_than
+    return AnalysisJob.objects.filter(status=AnalysisJob.RUNNING, started_at__lt=cutoff).update(
+        status=AnalysisJob.QUEUED, started_at=None, worker=""
+    )
+
+
+def requeue_job(job_id):
+    AnalysisJob.objects.filter(pk=job_id, status=AnalysisJob.RUNNING).update(
+        status=AnalysisJob.QUEUED, started_at=None, worker=""
+    )
+
+
+LOST_JOB_ERROR = "The process running this job exited unexpectedly (out of memory or crashed)."
+
+
+# Runs claimed jobs in a process pool. When a pool process dies (out of
+# memory, segfault) the pool breaks and every job in it fails with
+# BrokenProcessPool, not only the one that killed it; the pool is replaced
+# and those jobs are requeued. A job lost a second time by this worker is
+# most likely the cause and is failed instead.
+class JobWorker:
+    def __init__(self, processes=None, poll_interval=1.0, name=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.poll_interval = poll_interval
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.lost = set()
+
+    def new_pool(self):
+        return ProcessPoolExecutor(self.processes, initializer=_init_process)
+
+    def lose_job(self, job_id, log=None):
+        if job_id in self.lost:
+            self.lost.discard(job_id)
+            finish_job(job_id, error=LOST_JOB_ERROR)
+            if log:
+                log(f"Failed job {job_id}: its process exited again")
+        else:
+            self.lost.add(job_id)
+            requeue_job(job_id)
+            if log:
+                log(f"Requeued job {job_id}: its process exited")
+
+    def run(self, once=False, log=None):
+        running = {}
+        pool = self.new_pool()
+        try:
+            while True:
+                broken = False
+                free = self.processes - len(running)
+                if free:
+                    claimed = claim_jobs(free, self.name)
+                    for position, job_id in enumerate(claimed):
+                        try:
+                            future = pool.submit(execute_job, job_id)
+                        except BrokenProcessPool:
+                            # These never started; they are run by the next pool
+                            for unstarted in claimed[position:]:
+                                requeue_job(unstarted)
+                            broken = True
+                            break
+                        running[future] = job_id
+                        if log:
+                            log(f"Started job {job_id}")
+                if running:
+                    done, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job_id = running.pop(future)
+                        try:
+                            finish_job(job_id, result=future.result())
+                        except BrokenProcessPool:
+                            broken = True
+                            self.lose_job(job_id, log)
+                            continue
+                        except Exception as e:
+                            finish_job(job_id, error=str(e) or e.__class__.__name__)
+                        self.lost.discard(job_id)
+                        if log:
+                            log(f"Finished job {job_id}")
+                elif not broken:
+                    if once:
+                        return
+                    time.sleep(self.poll_interval)
+                if broken:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self.new_pool()
+                    if log:
+                        log("Replaced the process pool after a worker process exited")
+        finally:
+            pool.shutdown()
+
+
+# One page of a stored result: scalar fields as stored plus items
+# [offset, offset + limit) of one list-valued field
+def result_page(job, field=None, offset=0, limit=DEFAULT_PAGE_SIZE):
+    result = dict(job.result or {})
+    paginated = [name for name, value in result.items() if isinstance(value, dict) and value.get("paginated")]
+    if not paginated:
+        return result
+    field = field or paginated[0]
+    if field not in paginated:
+        raise ValueError(f"Field '{field}' is not paginated; choose from {', '.join(paginated)}.")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = max(0, offset)
+    first, last = offset // RESULT_CHUNK_SIZE, (offset + limit - 1) // RESULT_CHUNK_SIZE
+    chunks = job.result_chunks.filter(field=field, index__gte=first, index__lte=last).order_by("index")
+    items = [item for chunk in chunks for item in chunk.items]
+    start = offset - first * RESULT_CHUNK_SIZE
+    result[field] = {
+        "count": result[field]["count"],
+        "offset": offset,
+        "limit": limit,
+        "items": items[start:start + limit],
+    }
+    return result
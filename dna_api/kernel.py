@@ -0,0 +1,189 @@
+import numpy as np
+
+# Shared sequence kernel.
+#
+# A sequence is encoded once into 2-bit codes packed four bases per byte
+# (first base in the high bits). Anything that is not an upper-case A, C, G
+# or T (N, IUPAC ambiguity codes, lower-case soft-masking, ...) is stored in a
+# side list of (position, character) exceptions and occupies code 0 in the
+# packed array. Per-base operations then run as whole-array table lookups.
+
+BASES = b"ACGT"
+BASE_CODES = {chr(base): code for code, base in enumerate(BASES)}
+INVALID = 255
+
+_ENCODE = np.full(256, INVALID, dtype=np.uint8)
+for _code, _base in enumerate(BASES):
+    _ENCODE[_base] = _code
+
+_DECODE = np.frombuffer(BASES, dtype=np.uint8)
+
+# Complement of the characters that may appear in the exception list
+_IUPAC_COMPLEMENT = np.zeros(256, dtype=np.uint8)
+for _base, _comp in zip(b"ACGTRYKMSWBDHVN-acgtrykmswbdhvn",
+                        b"TGCAYRMKSWVHDBN-tgcayrmkswvhdbn"):
+    _IUPAC_COMPLEMENT[_base] = _comp
+
+# Reverses the order of the four 2-bit fields inside a byte
+_REVERSE_FIELDS = np.array(
+    [((b & 3) << 6) | (((b >> 2) & 3) << 4) | (((b >> 4) & 3) << 2) | (b >> 6) for b in range(256)],
+    dtype=np.uint8,
+)
+
+# Number of A, C, G and T fields in every possible byte
+_BYTE_COUNTS = np.zeros((256, 4), dtype=np.int64)
+for _byte in range(256):
+    for _shift in (6, 4, 2, 0):
+        _BYTE_COUNTS[_byte, (_byte >> _shift) & 3] += 1
+
+
+# Raw bytes of a str / bytes / bytearray sequence as a uint8 array
+def as_bytes(sequence):
+    if isinstance(sequence, str):
+        try:
+            sequence = sequence.encode("ascii")
+        except UnicodeEncodeError:
+            raise ValueError("Sequence contains non-ASCII characters.")
+    return np.frombuffer(sequence, dtype=np.uint8)
+
+
+# 2-bit codes of a raw byte array; exceptions are reported separately
+def encode_codes(raw):
+    codes = _ENCODE[raw]
+    invalid = codes == INVALID
+    positions = np.flatnonzero(invalid)
+    chars = raw[positions]
+    codes[invalid] = 0
+    return codes, positions, chars
+
+
+def pack_codes(codes):
+    pad = -len(codes) % 4
+    if pad:
+        codes = np.concatenate([codes, np.zeros(pad, dtype=np.uint8)])
+    quads = codes.reshape(-1, 4)
+    return (quads[:, 0] << 6) | (quads[:, 1] << 4) | (quads[:, 2] << 2) | quads[:, 3]
+
+
+def unpack_codes(packed, start, stop):
+    if stop <= start:
+        return np.zeros(0, dtype=np.uint8)
+    first, last = start // 4, (stop + 3) // 4
+    chunk = packed[first:last]
+    codes = np.empty((len(chunk), 4), dtype=np.uint8)
+    codes[:, 0] = chunk >> 6
+    codes[:, 1] = (chunk >> 4) & 3
+    codes[:, 2] = (chunk >> 2) & 3
+    codes[:, 3] = chunk & 3
+    offset = first * 4
+    return codes.reshape(-1)[start - offset:stop - offset]
+
+
+class EncodedSequence:
+    __slots__ = ("packed", "length", "exception_positions", "exception_bases")
+
+    def __init__(self, packed, length, exception_positions=None, exception_bases=None):
+        self.packed = packed
+        self.length = length
+        if exception_positions is None:
+            exception_positions = np.zeros(0, dtype=np.int64)
+            exception_bases = np.zeros(0, dtype=np.uint8)
+        self.exception_positions = exception_positions
+        self.exception_bases = exception_bases
+
+    @classmethod
+    def from_string(cls, sequence):
+        raw = as_bytes(sequence)
+        codes, positions, chars = encode_codes(raw)
+        return cls(pack_codes(codes), len(raw), positions, chars)
+
+    @classmethod
+    def from_codes(cls, codes):
+        return cls(pack_codes(np.asarray(codes, dtype=np.uint8)), len(codes))
+
+    def __len__(self):
+        return self.length
+
+    # Boolean mask of the positions held in the exception list
+    @property
+    def mask(self):
+        mask = np.zeros(self.length, dtype=bool)
+        mask[self.exception_positions] = True
+        return mask
+
+    def is_valid(self):
+        return len(self.exception_positions) == 0
+
+    def codes(self, start=0, stop=None):
+        stop = self.length if stop is None else min(stop, self.length)
+        return unpack_codes(self.packed, start, stop)
+
+    def codes_at(self, positions):
+        shifts = (6 - 2 * (positions & 3)).astype(np.uint8)
+        return (self.packed[positions >> 2] >> shifts) & 3
+
+    # ASCII bytes of the [start, stop) range; only that range is decoded
+    def to_bytes(self, start=0, stop=None):
+        stop = self.length if stop is None else min(stop, self.length)
+        out = _DECODE[self.codes(start, stop)]
+        lo, hi = np.searchsorted(self.exception_positions, [start, stop])
+        if hi > lo:
+            out[self.exception_positions[lo:hi] - start] = self.exception_bases[lo:hi]
+        return out.tobytes()
+
+    def to_string(self, start=0, stop=None):
+        return self.to_bytes(start, stop).decode("ascii")
+
+    def __str__(self):
+        return self.to_string()
+
+    def _complement_exceptions(self):
+        bases = _IUPAC_COMPLEMENT[self.exception_bases]
+        if not bases.all():
+            bad = self.exception_bases[bases == 0][0]
+            raise ValueError(f"Cannot complement invalid base '{chr(bad)}'.")
+        return bases
+
+    def _clear_padding(self, packed):
+        pad = -self.length % 4
+        if pad and len(packed):
+            packed[-1] &= (0xFF << (2 * pad)) & 0xFF
+        return packed
+
+    def complement(self):
+        bases = self._complement_exceptions()
+        packed = self._clear_padding(~self.packed)
+        return EncodedSequence(packed, self.length, self.exception_positions, bases)
+
+    def reverse_complement(self):
+        bases = self._complement_exceptions()[::-1]
+        packed = _REVERSE_FIELDS[~self.packed[::-1]]
+        # The padding fields of the last byte are now at the front; shift
+        # the whole bit string left to drop them.
+        pad = -self.length % 4
+        if pad:
+            shift = 2 * pad
+            shifted = packed << shift
+            shifted[:-1] |= packed[1:] >> (8 - shift)
+            packed = shifted
+        positions = (self.length - 1) - self.exception_positions[::-1]
+        return EncodedSequence(packed, self.length, positions, bases)
+
+    # Counts of every character in the sequence, always including A, C, G, T
+    def base_counts(self):
+        totals = np.bincount(self.packed, minlength=256) @ _BYTE_COUNTS
+        totals[0] -= -self.length % 4
+        if len(self.exception_positions):
+            totals -= np.bincount(self.codes_at(self.exception_positions), minlength=4)
+        counts = {chr(base): int(totals[code]) for code, base in enumerate(BASES)}
+        if len(self.exception_bases):
+            values, occurrences = np.unique(self.exception_bases, return_counts=True)
+            for value, occurrence in zip(values, occurrences):
+                counts[chr(value)] = int(occurrence)
+        return counts
+
+
+def encode(sequence):
+    if isinstance(sequence, EncodedSequence):
+        return sequence
+    return EncodedSequence.from_string(sequence)
@@ -0,0 +1,150 @@
+import numpy as np
+
+from .kernel import BASES, EncodedSequence, encode
+
+# k-mer counting on the 2-bit encoded sequence.
+#
+# Every k-mer is hashed to its 2-bit code (first base in the high bits) by
+# rolling the shift-or over the k offsets for a whole block at once; k-mers
+# overlapping a non-ACGT base are skipped. For small k the codes are counted
+# with bincount into a dense 4**k table. For larger k they are counted by
+# sorting; to keep memory bounded on long sequences the code space is split
+# into hash partitions and each pass only keeps the k-mers of one, so no pass
+# holds more than MAX_KMERS_PER_PASS codes. Canonical mode merges each k-mer
+# with its reverse complement, hashed from the kernel's reverse-complemented
+# sequence.
+
+MAX_K = 32
+DENSE_MAX_K = 11
+DEFAULT_K = 21
+DEFAULT_TOP = 20
+MAX_TOP = 10000
+BLOCK_SIZE = 1 << 20
+MAX_KMERS_PER_PASS = 1 << 24
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_DECODE = np.frombuffer(BASES, dtype=np.uint8)
+
+
+def _block_hashes(encoded, start, stop, k):
+    codes = encoded.codes(start, stop + k - 1).astype(np.uint64)
+    count = len(codes) - k + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(k):
+        hashes <<= np.uint64(2)
+        hashes |= codes[offset:offset + count]
+    return hashes
+
+
+# k-mers starting in [start, stop) that contain no exception
+def _block_valid(encoded, start, stop, k):
+    positions = encoded.exception_positions
+    lo, hi = np.searchsorted(positions, [start, stop + k - 1])
+    exceptions = np.zeros(stop - start + k, dtype=np.int64)
+    exceptions[positions[lo:hi] - start + 1] = 1
+    np.cumsum(exceptions, out=exceptions)
+    return exceptions[k:] == exceptions[:-k]
+
+
+class _KmerHasher:
+    def __init__(self, sequence, k, canonical):
+        self.encoded = encode(sequence)
+        self.k = k
+        self.canonical = canonical
+        self.count = max(len(self.encoded) - k + 1, 0)
+        if canonical and self.count:
+            # Reverse complement of the 2-bit codes alone: exceptions hold
+            # code 0 and the k-mers over them are dropped by the forward mask
+            self.reverse = EncodedSequence(self.encoded.packed, len(self.encoded)).reverse_complement()
+
+    # Codes of the valid k-mers starting in each block, in order
+    def blocks(self):
+        k, n = self.k, len(self.encoded)
+        for start in range(0, self.count, BLOCK_SIZE):
+            stop = min(start + BLOCK_SIZE, self.count)
+            hashes = _block_hashes(self.encoded, start, stop, k)
+            if self.canonical:
+                # The k-mer at i is the reverse complement of the one at n - k - i
+                reverse = _block_hashes(self.reverse, n - k - stop + 1, n - k - start + 1, k)[::-1]
+                hashes = np.minimum(hashes, reverse)
+            if len(self.encoded.exception_positions):
+                hashes = hashes[_block_valid(self.encoded, start, stop, k)]
+            yield hashes
+
+
+def kmer_string(code, k):
+    shifts = np.arange(2 * (k - 1), -1, -2, dtype=np.uint64)
+    return _DECODE[(np.uint64(code) >> shifts) & np.uint64(3)].tobytes().decode("ascii")
+
+
+def _top(codes, counts, top):
+    if len(codes) > top:
+        keep = np.argpartition(-counts, top - 1)[:top]
+        # Ties at the cut-off are broken by code, like the final ordering
+        cutoff = counts[keep].min()
+        keep = np.concatenate([np.flatnonzero(counts > cutoff), np.flatnonzero(counts == cutoff)])
+        codes, counts = codes[keep], counts[keep]
+    order = np.lexsort((codes, -counts))[:top]
+    return codes[order], counts[order]
+
+
+def _dense_counts(hasher):
+    counts = np.zeros(4 ** hasher.k, dtype=np.int64)
+    for hashes in hasher.blocks():
+        counts += np.bincount(hashes.astype(np.int64), minlength=len(counts))
+    codes = np.flatnonzero(counts)
+    yield codes.astype(np.uint64), counts[codes]
+
+
+# (codes, counts) of the distinct k-mers, one hash partition at a time
+def _sorted_counts(hasher):
+    partitions = 1 << int(np.ceil(np.log2(max(hasher.count / MAX_KMERS_PER_PASS, 1))))
+    for partition in range(partitions):
+        selected = []
+        for hashes in hasher.blocks():
+            if partitions > 1:
+                hashes = hashes[((hashes * _MIX) >> np.uint64(40)) & np.uint64(partitions - 1) == partition]
+            selected.append(hashes)
+        if selected:
+            codes, counts = np.unique(np.concatenate(selected), return_counts=True)
+            yield codes, counts
+
+
+# Top-N k-mers and the spectrum histogram (how many distinct k-mers occur
+# exactly m times, for every multiplicity m)
+def kmer_spectrum(sequence, k=DEFAULT_K, canonical=False, top=DEFAULT_TOP):
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k must be between 1 and {MAX_K}.")
+    if not 1 <= top <= MAX_TOP:
+        raise ValueError(f"Top must be between 1 and {MAX_TOP}.")
+    hasher = _KmerHasher(sequence, k, canonical)
+    top_codes = np.zeros(0, dtype=np.uint64)
+    top_counts = np.zeros(0, dtype=np.int64)
+    histogram = np.zeros(1, dtype=np.int64)
+    total = distinct = 0
+    parts = _dense_counts(hasher) if k <= DENSE_MAX_K else _sorted_counts(hasher)
+    for codes, counts in parts:
+        counts = counts.astype(np.int64)
+        total += int(counts.sum())
+        distinct += len(codes)
+        part_histogram = np.bincount(counts)
+        if len(part_histogram) > len(histogram):
+            histogram = np.concatenate([histogram, np.zeros(len(part_histogram) - len(histogram), dtype=np.int64)])
+        histogram[:len(part_histogram)] += part_histogram
+        top_codes, top_counts = _top(
+            np.concatenate([top_codes, codes]), np.concatenate([top_counts, counts]), top
+        )
+    multiplicities = np.flatnonzero(histogram)
+    return {
+        "k": k,
+        "canonical": canonical,
+        "total_kmers": total,
+        "distinct_kmers": distinct,
+        "top": [
+            {"kmer": kmer_string(code, k), "count": int(count)}
+            for code, count in zip(top_codes.tolist(), top_counts.tolist())
+        ],
+        "histogram": [
+            {"multiplicity": int(m), "kmers": int(histogram[m])} for m in multiplicities.tolist()
+        ],
+    }
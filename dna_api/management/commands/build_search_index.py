@@ -0,0 +1,33 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dna_api.motifs import build_index
+from dna_api.references import get_reference
+
+
+class Command(BaseCommand):
+    help = "Builds the motif search suffix arrays of a registered reference genome."
+
+    def add_arguments(self, parser):
+        parser.add_argument("reference", help="Name of the registered reference.")
+        parser.add_argument("--sequence", action="append", default=None, metavar="NAME",
+                            help="Only index this sequence of the reference (may be repeated).")
+
+    def handle(self, *args, **options):
+        try:
+            reference = get_reference(options["reference"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        contigs = list(reference.contigs.all())
+        if options["sequence"]:
+            unknown = set(options["sequence"]) - {contig.name for contig in contigs}
+            if unknown:
+                raise CommandError(f"Unknown sequence(s): {', '.join(sorted(unknown))}.")
+            contigs = [contig for contig in contigs if contig.name in options["sequence"]]
+        for contig in contigs:
+            if not contig.length:
+                continue
+            started = perf_counter()
+            build_index(reference, contig)
+            self.stdout.write(f"Indexed {contig.name} ({contig.length} bases) in {perf_counter() - started:.1f}s.")
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from dna_api.jobs import JobWorker, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = "Runs queued analysis jobs on a local process pool, polling the database for new jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=None,
+                            help="Number of pool processes (default: number of CPUs).")
+        parser.add_argument("--poll-interval", type=float, default=1.0,
+                            help="Seconds between polls of the job table when idle.")
+        parser.add_argument("--requeue-stale", type=int, default=None, metavar="SECONDS",
+                            help="Requeue jobs left running for longer than this, e.g. by a crashed worker.")
+        parser.add_argument("--once", action="store_true",
+                            help="Exit once the queue is empty instead of polling forever.")
+
+    def handle(self, *args, **options):
+        if options["requeue_stale"] is not None:
+            requeued = requeue_stale_jobs(timedelta(seconds=options["requeue_stale"]))
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+        worker = JobWorker(options["processes"], options["poll_interval"])
+        self.stdout.write(f"Worker {worker.name} running with {worker.processes} process(es).")
+        try:
+            worker.run(once=options["once"], log=self.stdout.write)
+        except KeyboardInterrupt:
+            self.stdout.write("Worker stopped.")
@@ -0,0 +1,198 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+
+from .cache import get_result_cache
+
+# Latency metrics, stage timers and on-demand profiling.
+#
+# Request durations (per method, route and status) and the durations of the
+# stages inside the analysis code (per operation, stage and sequence size
+# class) are aggregated into histograms in this process and rendered in the
+# Prometheus text format by /api/metrics/. Each worker process keeps its own
+# histograms, so a multi-process server is scraped per worker. Stages timed
+# during a request are also returned in its Server-Timing header.
+#
+# A single request can be profiled with cProfile by sending the header
+# X-DNA-Profile with the value of DNA_PROFILE_TOKEN; no restart is needed and
+# profiling is off whenever that setting is empty. Only one request per
+# process is profiled at a time, and only in the sync (WSGI) middleware chain.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_CLASSES = ((10 ** 3, "1k"), (10 ** 4, "10k"), (10 ** 5, "100k"), (10 ** 6, "1M"), (10 ** 7, "10M"),
+                (10 ** 8, "100M"), (10 ** 9, "1G"))
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+PROFILE_HEADER = "HTTP_X_DNA_PROFILE"
+PROFILE_OUTPUT_HEADER = "HTTP_X_DNA_PROFILE_OUTPUT"
+PROFILE_OUTPUTS = ("save", "text")
+PROFILE_TEXT_LINES = 60
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        bucket = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0}
+            series["buckets"][bucket] += 1
+            series["sum"] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = [(values, list(data["buckets"]), data["sum"]) for values, data in sorted(self.series.items())]
+        for values, buckets, total in series:
+            labels = _labels(self.labels, values)
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), buckets):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "dna_http_request_duration_seconds", "Time to produce the response of a request.",
+    ("method", "route", "status"),
+)
+STAGE_SECONDS = Histogram(
+    "dna_stage_duration_seconds", "Time spent in one stage of an operation.",
+    ("operation", "stage", "size"),
+)
+
+_request_stages = ContextVar("dna_request_stages", default=None)
+_profile_lock = threading.Lock()
+
+
+# Smallest size class holding `length` bases ("1k" is up to 1,000)
+def size_class(length):
+    if length is None:
+        return "unknown"
+    for limit, label in SIZE_CLASSES:
+        if length <= limit:
+            return label
+    return f">{SIZE_CLASSES[-1][1]}"
+
+
+@contextmanager
+def stage(operation, name, length=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_SECONDS.observe(duration, operation, name, size_class(length))
+        stages = _request_stages.get()
+        if stages is not None:
+            stages.append((f"{operation}.{name}", duration))
+
+
+# Collects the stages timed until the returned token is passed to end_request
+def begin_request():
+    return _request_stages.set([])
+
+
+def end_request(token):
+    stages = _request_stages.get() or []
+    _request_stages.reset(token)
+    return stages
+
+
+def server_timing(stages, total):
+    durations = {}
+    for name, duration in stages:
+        durations[name] = durations.get(name, 0.0) + duration
+    entries = [f'{name.replace(".", "-")};desc="{name}";dur={duration * 1000:.2f}'
+               for name, duration in durations.items()]
+    return ", ".join([*entries, f"total;dur={total * 1000:.2f}"])
+
+
+def render_metrics():
+    lines = REQUEST_SECONDS.render() + STAGE_SECONDS.render()
+    stats = get_result_cache().stats()
+    for counter in ("hits", "shared_hits", "misses", "evictions", "skipped"):
+        lines += [f"# TYPE dna_result_cache_{counter}_total counter", f"dna_result_cache_{counter}_total {stats[counter]}"]
+    for gauge in ("entries", "bytes"):
+        lines += [f"# TYPE dna_result_cache_{gauge} gauge", f"dna_result_cache_{gauge} {stats[gauge]}"]
+    from .admission import metric_lines
+
+    lines += metric_lines()
+    return "\n".join(lines) + "\n"
+
+
+# "save" or "text" when the request asks to be profiled with the right token
+def profile_requested(request):
+    token = getattr(settings, "DNA_PROFILE_TOKEN", None)
+    given = request.META.get(PROFILE_HEADER)
+    if not token or not given:
+        return None
+    from django.utils.crypto import constant_time_compare
+
+    if not constant_time_compare(given, token):
+        return None
+    output = request.META.get(PROFILE_OUTPUT_HEADER, "save")
+    return output if output in PROFILE_OUTPUTS else "save"
+
+
+def profile_root():
+    return Path(getattr(settings, "DNA_PROFILE_DIR", Path(settings.BASE_DIR) / "profiles"))
+
+
+# Runs `call` under cProfile; returns its result and the profiler, or no
+# profiler when another request of this process is being profiled
+def profiled(call):
+    if not _profile_lock.acquire(blocking=False):
+        return call(), None
+    try:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            result = call()
+        finally:
+            profiler.disable()
+        return result, profiler
+    finally:
+        _profile_lock.release()
+
+
+def save_profile(profiler):
+    root = profile_root()
+    root.mkdir(parents=True, exist_ok=True)
+    file_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.prof"
+    profiler.dump_stats(str(root / file_name))
+    return file_name
+
+
+def profile_text(profiler):
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_TEXT_LINES)
+    return output.getvalue()
@@ -0,0 +1,76 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpResponse
+
+from .metrics import (
+    REQUEST_SECONDS, begin_request, end_request, profile_requested, profile_text, profiled, save_profile,
+    server_timing
+)
+
+
+# Times every request into the request histogram, adds a Server-Timing
+# header with the stages timed while handling it, and profiles it when asked
+# to (see dna_api.metrics). Streaming responses are timed up to their first
+# byte, since their body is produced after the view returns.
+#
+# The middleware runs natively in both sync and async chains, so under ASGI
+# async views are not pushed onto a thread. cProfile follows a single
+# thread, so profiling is only available in the sync chain (WSGI).
+class TimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        profile = profile_requested(request)
+        token = begin_request()
+        start = time.perf_counter()
+        profiler = None
+        try:
+            if profile:
+                response, profiler = profiled(lambda: self.get_response(request))
+            else:
+                response = self.get_response(request)
+        finally:
+            stages = end_request(token)
+        response = self.record(request, response, stages, time.perf_counter() - start)
+
+        if profile and profiler is None:
+            response["X-DNA-Profile"] = "busy"
+        elif profile == "text":
+            text = HttpResponse(profile_text(profiler), content_type="text/plain; charset=utf-8")
+            text["X-DNA-Profile-Status"] = str(response.status_code)
+            text["Server-Timing"] = response["Server-Timing"]
+            response.close()
+            return text
+        elif profile:
+            response["X-DNA-Profile-File"] = save_profile(profiler)
+        return response
+
+    async def __acall__(self, request):
+        profile = profile_requested(request)
+        token = begin_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stages = end_request(token)
+        response = self.record(request, response, stages, time.perf_counter() - start)
+        if profile:
+            response["X-DNA-Profile"] = "unavailable under ASGI"
+        return response
+
+    def record(self, request, response, stages, duration):
+        match = getattr(request, "resolver_match", None)
+        route = match.route if match is not None else "unmatched"
+        REQUEST_SECONDS.observe(duration, request.method, route, str(response.status_code))
+        response["Server-Timing"] = server_timing(stages, duration)
+        return response
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.7 on 2026-10-17 04:39
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dna_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('operation', models.CharField(max_length=64)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('sequence', models.TextField()),
+                ('reference_sequence', models.TextField(blank=True, default='')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('result_file', models.BinaryField(blank=True, null=True)),
+                ('result_content_type', models.CharField(blank=True, default='', max_length=64)),
+                ('error', models.TextField(blank=True, default='')),
+                ('worker', models.CharField(blank=True, default='', max_length=128)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('analysis', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='dna_api.dnaanalysis')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AnalysisJobResultChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=64)),
+                ('index', models.PositiveIntegerField()),
+                ('items', models.JSONField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='result_chunks', to='dna_api.analysisjob')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='analysisjob',
+            index=models.Index(fields=['status', 'created_at'], name='dna_api_ana_status_eb9734_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='analysisjobresultchunk',
+            unique_together={('job', 'field', 'index')},
+        ),
+    ]
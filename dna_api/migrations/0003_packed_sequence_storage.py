@@ -0,0 +1,92 @@
+# Generated by Django 5.0.7 on 2026-10-17 06:12
+
+import dna_api.fields
+from django.db import migrations, models
+
+BATCH_SIZE = 100
+
+
+def pack_rows(apps, schema_editor):
+    DNAAnalysis = apps.get_model('dna_api', 'DNAAnalysis')
+    batch = []
+    for analysis in DNAAnalysis.objects.only('sequence', 'translated_sequence').iterator(chunk_size=BATCH_SIZE):
+        analysis.packed_sequence = analysis.sequence
+        analysis.packed_translated_sequence = analysis.translated_sequence
+        batch.append(analysis)
+        if len(batch) == BATCH_SIZE:
+            DNAAnalysis.objects.bulk_update(batch, ['packed_sequence', 'packed_translated_sequence'])
+            batch = []
+    DNAAnalysis.objects.bulk_update(batch, ['packed_sequence', 'packed_translated_sequence'])
+
+
+def unpack_rows(apps, schema_editor):
+    DNAAnalysis = apps.get_model('dna_api', 'DNAAnalysis')
+    batch = []
+    for analysis in DNAAnalysis.objects.only('packed_sequence', 'packed_translated_sequence').iterator(chunk_size=BATCH_SIZE):
+        analysis.sequence = analysis.packed_sequence
+        analysis.translated_sequence = analysis.packed_translated_sequence
+        batch.append(analysis)
+        if len(batch) == BATCH_SIZE:
+            DNAAnalysis.objects.bulk_update(batch, ['sequence', 'translated_sequence'])
+            batch = []
+    DNAAnalysis.objects.bulk_update(batch, ['sequence', 'translated_sequence'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dna_api', '0002_analysisjob'),
+    ]
+
+    operations = [
+        # Nullable while both columns exist, so the migration can also run backwards
+        migrations.AlterField(
+            model_name='dnaanalysis',
+            name='sequence',
+            field=models.TextField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='dnaanalysis',
+            name='translated_sequence',
+            field=models.TextField(null=True),
+        ),
+        migrations.AddField(
+            model_name='dnaanalysis',
+            name='packed_sequence',
+            field=dna_api.fields.PackedSequenceField(editable=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='dnaanalysis',
+            name='packed_translated_sequence',
+            field=dna_api.fields.CompressedTextField(editable=True, null=True),
+        ),
+        migrations.RunPython(pack_rows, unpack_rows),
+        migrations.RemoveField(
+            model_name='dnaanalysis',
+            name='sequence',
+        ),
+        migrations.RemoveField(
+            model_name='dnaanalysis',
+            name='translated_sequence',
+        ),
+        migrations.RenameField(
+            model_name='dnaanalysis',
+            old_name='packed_sequence',
+            new_name='sequence',
+        ),
+        migrations.RenameField(
+            model_name='dnaanalysis',
+            old_name='packed_translated_sequence',
+            new_name='translated_sequence',
+        ),
+        migrations.AlterField(
+            model_name='dnaanalysis',
+            name='sequence',
+            field=dna_api.fields.PackedSequenceField(editable=True),
+        ),
+        migrations.AlterField(
+            model_name='dnaanalysis',
+            name='translated_sequence',
+            field=dna_api.fields.CompressedTextField(editable=True),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.7 on 2026-10-17 07:05
+
+import django.db.models.deletion
+import json
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+# Mutation rows for the JSON mutation lists of existing analyses
+def backfill_mutations(apps, schema_editor):
+    DNAAnalysis = apps.get_model('dna_api', 'DNAAnalysis')
+    Mutation = apps.get_model('dna_api', 'Mutation')
+    batch = []
+    for analysis_id, mutations in DNAAnalysis.objects.values_list('id', 'mutations').iterator(chunk_size=100):
+        try:
+            mutations = json.loads(mutations)
+        except ValueError:
+            continue
+        for mutation in mutations if isinstance(mutations, list) else []:
+            if not isinstance(mutation, dict) or 'position' not in mutation:
+                continue
+            batch.append(Mutation(
+                analysis_id=analysis_id,
+                position=mutation['position'],
+                user_position=mutation.get('user_position'),
+                reference_base=mutation.get('reference_base', ''),
+                user_base=mutation.get('user_base', ''),
+                mutation_type=mutation.get('mutation_type', 'substitution'),
+            ))
+            if len(batch) == BATCH_SIZE:
+                Mutation.objects.bulk_create(batch)
+                batch = []
+    Mutation.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dna_api', '0003_packed_sequence_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Mutation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveBigIntegerField()),
+                ('user_position', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('reference_base', models.TextField(blank=True)),
+                ('user_base', models.TextField(blank=True)),
+                ('mutation_type', models.CharField(choices=[('substitution', 'Substitution'), ('mnv', 'Multi-nucleotide variant'), ('insertion', 'Insertion'), ('deletion', 'Deletion')], max_length=16)),
+                ('analysis', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='dna_api.dnaanalysis')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['position'], name='dna_api_mut_positio_851acd_idx'), models.Index(fields=['mutation_type', 'position'], name='dna_api_mut_mutatio_75998d_idx'), models.Index(fields=['reference_base', 'user_base'], name='dna_api_mut_referen_f2a4a6_idx'), models.Index(fields=['analysis', 'position'], name='dna_api_mut_analysi_e3f8e9_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_mutations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.7 on 2026-10-17 08:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dna_api', '0004_mutation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceGenome',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.SlugField(max_length=100, unique=True)),
+                ('description', models.TextField(blank=True, default='')),
+                ('file_name', models.CharField(max_length=255)),
+                ('total_length', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReferenceContig',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('index', models.PositiveIntegerField()),
+                ('length', models.PositiveBigIntegerField()),
+                ('packed_offset', models.PositiveBigIntegerField()),
+                ('runs_offset', models.PositiveBigIntegerField()),
+                ('run_count', models.PositiveBigIntegerField()),
+                ('reference', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contigs', to='dna_api.referencegenome')),
+            ],
+            options={
+                'ordering': ['reference', 'index'],
+                'unique_together': {('reference', 'name')},
+            },
+        ),
+    ]
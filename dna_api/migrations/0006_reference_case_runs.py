@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dna_api', '0005_reference_genome'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='referencecontig',
+            name='case_offset',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='referencecontig',
+            name='case_run_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
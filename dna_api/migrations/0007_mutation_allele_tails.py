@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:47
+
+from django.db import migrations, models
+
+ALLELE_INDEX_LENGTH = 255
+
+
+# Moves the bases past ALLELE_INDEX_LENGTH of existing long alleles into the
+# tail columns before the indexed columns are shortened
+def split_long_alleles(apps, schema_editor):
+    Mutation = apps.get_model('dna_api', 'Mutation')
+    for field in ('reference', 'user'):
+        base, tail = f'{field}_base', f'{field}_tail'
+        long_alleles = Mutation.objects.annotate(length=models.functions.Length(base)).filter(
+            length__gt=ALLELE_INDEX_LENGTH
+        )
+        for mutation in long_alleles.only('id', base).iterator(chunk_size=1000):
+            bases = getattr(mutation, base)
+            Mutation.objects.filter(pk=mutation.pk).update(
+                **{base: bases[:ALLELE_INDEX_LENGTH], tail: bases[ALLELE_INDEX_LENGTH:]}
+            )
+
+
+def join_long_alleles(apps, schema_editor):
+    Mutation = apps.get_model('dna_api', 'Mutation')
+    for field in ('reference', 'user'):
+        base, tail = f'{field}_base', f'{field}_tail'
+        Mutation.objects.exclude(**{tail: ''}).update(
+            **{base: models.functions.Concat(base, tail), tail: ''}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dna_api', '0006_reference_case_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mutation',
+            name='reference_tail',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='mutation',
+            name='user_tail',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(split_long_alleles, join_long_alleles),
+        migrations.AlterField(
+            model_name='mutation',
+            name='reference_base',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='mutation',
+            name='user_base',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
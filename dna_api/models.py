@@ -1,9 +1,13 @@
+import uuid
 from django.db import models
+from django.db.models.functions import Substr
+from .fields import CompressedTextField, PackedSequenceField
+from .storage import unpack_sequence_range
 
 class DNAAnalysis(models.Model):
-    sequence = models.TextField()
+    sequence = PackedSequenceField()  # 2 bits per base, see dna_api.storage
     gc_content = models.FloatField()
-    translated_sequence = models.TextField()
+    translated_sequence = CompressedTextField()
     mutations = models.TextField()  # For storing mutations in JSON format
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -14,5 +18,139 @@ class DNAAnalysis(models.Model):
         self.mutations = mutations
         self.save()
     
+    # Bases [start, end) of a saved sequence. Only the blob's header, runs
+    # and the packed bytes of the range are fetched (with SUBSTR), except for
+    # zlib-compressed blobs, which are read whole.
+    @classmethod
+    def sequence_range(cls, pk, start=0, end=None):
+        blob = models.ExpressionWrapper(models.F("sequence"), output_field=models.BinaryField())
+
+        def read(ranges):
+            row = cls.objects.filter(pk=pk).values_list(*(
+                Substr(blob, offset + 1, size, output_field=models.BinaryField()) for offset, size in ranges
+            )).first()
+            if row is None:
+                raise cls.DoesNotExist(f"DNA Analysis #{pk} does not exist.")
+            return [bytes(part or b"") for part in row]
+
+        return unpack_sequence_range(read, start, end)
+
     def __str__(self):
         return f"DNA Analysis #{self.id}"
+
+
+# Alleles are indexed by their first ALLELE_INDEX_LENGTH bases; longer ones
+# keep the rest in the unindexed *_tail columns, so the (reference_base,
+# user_base) index stays within MySQL's index key size.
+ALLELE_INDEX_LENGTH = 255
+
+
+class Mutation(models.Model):
+    SUBSTITUTION = 'substitution'
+    MNV = 'mnv'
+    INSERTION = 'insertion'
+    DELETION = 'deletion'
+    TYPE_CHOICES = [
+        (SUBSTITUTION, 'Substitution'),
+        (MNV, 'Multi-nucleotide variant'),
+        (INSERTION, 'Insertion'),
+        (DELETION, 'Deletion'),
+    ]
+
+    analysis = models.ForeignKey(DNAAnalysis, on_delete=models.CASCADE, related_name='variants')
+    position = models.PositiveBigIntegerField()  # 0-based, in the reference
+    user_position = models.PositiveBigIntegerField(null=True, blank=True)  # Alignment mode only
+    reference_base = models.CharField(max_length=ALLELE_INDEX_LENGTH, blank=True)
+    reference_tail = models.TextField(blank=True, default='')
+    user_base = models.CharField(max_length=ALLELE_INDEX_LENGTH, blank=True)
+    user_tail = models.TextField(blank=True, default='')
+    mutation_type = models.CharField(max_length=16, choices=TYPE_CHOICES)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['position']),
+            models.Index(fields=['mutation_type', 'position']),
+            models.Index(fields=['reference_base', 'user_base']),
+            models.Index(fields=['analysis', 'position']),
+        ]
+
+    def __str__(self):
+        reference, user = self.reference_base + self.reference_tail, self.user_base + self.user_tail
+        return f"{self.mutation_type} at {self.position} ({reference or '-'}>{user or '-'})"
+
+
+class ReferenceGenome(models.Model):
+    name = models.SlugField(max_length=100, unique=True)
+    description = models.TextField(blank=True, default='')
+    file_name = models.CharField(max_length=255)  # Packed sequence file under DNA_REFERENCE_ROOT
+    total_length = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+# Index of one sequence of a reference file (like a FASTA .fai line): where
+# its packed bases, exception runs and lower-case runs start in the file
+class ReferenceContig(models.Model):
+    reference = models.ForeignKey(ReferenceGenome, on_delete=models.CASCADE, related_name='contigs')
+    name = models.CharField(max_length=255)
+    index = models.PositiveIntegerField()  # Order in the FASTA file
+    length = models.PositiveBigIntegerField()
+    packed_offset = models.PositiveBigIntegerField()
+    runs_offset = models.PositiveBigIntegerField()
+    run_count = models.PositiveBigIntegerField()
+    case_offset = models.PositiveBigIntegerField(default=0)  # Lower-case runs; none in files written before them
+    case_run_count = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = [('reference', 'name')]
+        ordering = ['reference', 'index']
+
+    def __str__(self):
+        return f"{self.reference.name}:{self.name}"
+
+
+class AnalysisJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    operation = models.CharField(max_length=64)
+    params = models.JSONField(default=dict, blank=True)
+    sequence = models.TextField()
+    reference_sequence = models.TextField(blank=True, default='')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    result = models.JSONField(null=True, blank=True)  # List-valued fields are stored in AnalysisJobResultChunk
+    result_file = models.BinaryField(null=True, blank=True)  # Binary results such as PDF reports
+    result_content_type = models.CharField(max_length=64, blank=True, default='')
+    error = models.TextField(blank=True, default='')
+    analysis = models.ForeignKey(DNAAnalysis, null=True, blank=True, on_delete=models.SET_NULL, related_name='jobs')
+    worker = models.CharField(max_length=128, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"Analysis Job {self.id} ({self.operation}, {self.status})"
+
+
+class AnalysisJobResultChunk(models.Model):
+    job = models.ForeignKey(AnalysisJob, on_delete=models.CASCADE, related_name='result_chunks')
+    field = models.CharField(max_length=64)
+    index = models.PositiveIntegerField()
+    items = models.JSONField()
+
+    class Meta:
+        unique_together = [('job', 'field', 'index')]
@@ -0,0 +1,418 @@
+import os
+import threading
+import uuid
+from itertools import product
+
+import numpy as np
+
+from .cache import cached_result
+from .kernel import EncodedSequence, unpack_codes
+from .references import contig_arrays, derived_file_name, get_reference, mapped_file, parse_region, reference_root
+from .storage import decode_range, sequence_arrays
+from .utils import reverse_complement
+
+# Motif search with IUPAC patterns, both strands and mismatches.
+#
+# Patterns are compared as bit masks: every base is one bit (A=1, C=2, G=4,
+# T=8) and an IUPAC code is the union of its bases, so a position matches
+# when the mask of the pattern and the bit of the base intersect. Case is
+# ignored: sequences are searched folded to upper case, as they are packed
+# (dna_api.storage), so soft-masked repeats match like any other bases.
+# Exception characters of the sequence (N, IUPAC) never match. The minus
+# strand is searched with the reverse complement of the pattern; its hits
+# are reported in forward coordinates.
+#
+# One-off sequences are scanned: the first columns of the pattern are
+# compared for all positions of a block at once, and the remaining columns
+# only for the positions still within the mismatch budget.
+#
+# Registered references are searched with a suffix array per sequence,
+# built once and stored next to the reference file. With k mismatches the
+# pattern is split into k + 1 seeds, at least one of which must match
+# exactly (pigeonhole); every IUPAC expansion of every seed is looked up in
+# the suffix array and the candidates are verified against the full
+# pattern. Patterns whose seeds are too short or too ambiguous fall back to
+# the scan. Complete hit lists are cached, so paging through them, or
+# repeating a query, does not search again.
+
+STRANDS = ("both", "+", "-")
+MAX_PATTERN_LENGTH = 1000
+MAX_MISMATCHES = 10
+MAX_HITS = 1000000
+DEFAULT_HIT_LIMIT = 100
+MAX_HIT_LIMIT = 10000
+
+SCAN_BLOCK_SIZE = 1 << 20
+SCAN_DENSE_COLUMNS = 8
+VERIFY_BATCH_SIZE = 1 << 16
+
+MIN_SEED_LENGTH = 8
+MAX_SEED_EXPANSIONS = 256
+MAX_SEED_CANDIDATES = 1 << 22
+SUFFIX_ARRAY_SEED = 21
+LAZY_INDEX_MAX_LENGTH = 16 * 1024 * 1024
+INDEX_SUFFIX = "sa"
+
+_IUPAC_MASKS = np.zeros(256, dtype=np.uint8)
+for _codes, _mask in (("A", 1), ("C", 2), ("G", 4), ("T", 8), ("R", 5), ("Y", 10), ("S", 6), ("W", 9),
+                      ("K", 12), ("M", 3), ("B", 14), ("D", 13), ("H", 11), ("V", 7), ("N", 15)):
+    _IUPAC_MASKS[ord(_codes)] = _IUPAC_MASKS[ord(_codes.lower())] = _mask
+_BITS = np.array([1, 2, 4, 8], dtype=np.uint8)
+_MASK_CODES = [[code for code in range(4) if mask >> code & 1] for mask in range(16)]
+_STRAND_SIGNS = ("+", "-")
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+# A sequence to search: 2-bit codes of its upper-case bases plus the runs of
+# exception characters
+class _Text:
+    def __init__(self, length, starts, lengths, bases, packed, case_starts, case_lengths):
+        self.encoded = EncodedSequence(packed, length)
+        self.length = length
+        self.starts = starts
+        self.ends = starts + lengths
+        self.packed = packed
+
+    @classmethod
+    def from_string(cls, sequence):
+        return cls(*sequence_arrays(sequence))
+
+    # Base bits of [start, stop), zero at exception characters
+    def bits(self, start, stop):
+        bits = _BITS[unpack_codes(self.packed, start, stop)]
+        lo = np.searchsorted(self.ends, start, side="right")
+        hi = np.searchsorted(self.starts, stop)
+        if hi > lo:
+            run_starts = np.maximum(self.starts[lo:hi], start)
+            run_lengths = np.minimum(self.ends[lo:hi], stop) - run_starts
+            offsets = np.repeat(run_starts - start - (np.cumsum(run_lengths) - run_lengths), run_lengths)
+            bits[offsets + np.arange(len(offsets))] = 0
+        return bits
+
+    def bits_at(self, positions):
+        bits = _BITS[self.encoded.codes_at(positions)]
+        if len(self.starts):
+            runs = np.searchsorted(self.starts, positions, side="right") - 1
+            bits[(runs >= 0) & (positions < self.ends[np.maximum(runs, 0)])] = 0
+        return bits
+
+
+def pattern_masks(pattern):
+    raw = np.frombuffer(pattern.encode("ascii", "replace"), dtype=np.uint8)
+    masks = _IUPAC_MASKS[raw]
+    if not masks.all():
+        bad = pattern[int(np.flatnonzero(masks == 0)[0])]
+        raise ValueError(f"Invalid character '{bad}' in pattern; use A, C, G, T or IUPAC codes.")
+    return masks
+
+
+def validate_search(pattern, mismatches, strands):
+    if not 1 <= len(pattern) <= MAX_PATTERN_LENGTH:
+        raise ValueError(f"Pattern must be between 1 and {MAX_PATTERN_LENGTH} bases long.")
+    if not 0 <= mismatches <= min(MAX_MISMATCHES, len(pattern) - 1):
+        raise ValueError(f"Mismatches must be between 0 and {min(MAX_MISMATCHES, len(pattern) - 1)}.")
+    if strands not in STRANDS:
+        raise ValueError(f"Strands must be one of: {', '.join(STRANDS)}.")
+    pattern_masks(pattern)
+
+
+# Masks to search for on the forward sequence, with the strand of each
+def _strand_masks(pattern, strands):
+    searches = []
+    if strands in ("both", "+"):
+        searches.append((0, pattern_masks(pattern)))
+    if strands in ("both", "-"):
+        searches.append((1, pattern_masks(reverse_complement(pattern.upper()))))
+    return searches
+
+
+# (positions, mismatches) of the windows of [start, stop) within the budget
+def _scan(text, masks, mismatches, start=0, stop=None):
+    stop = text.length if stop is None else min(stop, text.length)
+    m = len(masks)
+    dense = min(m, SCAN_DENSE_COLUMNS)
+    positions, counts = [], []
+    for block in range(start, stop - m + 1, SCAN_BLOCK_SIZE):
+        bits = text.bits(block, min(block + SCAN_BLOCK_SIZE + m - 1, stop))
+        count = len(bits) - m + 1
+        misses = np.zeros(count, dtype=np.int16)
+        for column in range(dense):
+            misses += (bits[column:column + count] & masks[column]) == 0
+        alive = np.flatnonzero(misses <= mismatches)
+        misses = misses[alive]
+        for column in range(dense, m):
+            misses += (bits[alive + column] & masks[column]) == 0
+            if column % SCAN_DENSE_COLUMNS == 0:
+                keep = misses <= mismatches
+                alive, misses = alive[keep], misses[keep]
+        keep = misses <= mismatches
+        positions.append(alive[keep] + block)
+        counts.append(misses[keep])
+    if not positions:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int16)
+    return np.concatenate(positions), np.concatenate(counts)
+
+
+# Candidate window starts that are within the budget
+def _verify(text, candidates, masks, mismatches):
+    offsets = np.arange(len(masks))
+    positions, counts = [], []
+    for first in range(0, len(candidates), VERIFY_BATCH_SIZE):
+        batch = candidates[first:first + VERIFY_BATCH_SIZE]
+        misses = ((text.bits_at(batch[:, None] + offsets) & masks) == 0).sum(axis=1)
+        keep = misses <= mismatches
+        positions.append(batch[keep])
+        counts.append(misses[keep].astype(np.int16))
+    if not positions:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int16)
+    return np.concatenate(positions), np.concatenate(counts)
+
+
+def _dense_ranks(keys, order):
+    ranked = keys[order]
+    ranks = np.empty(len(keys), dtype=np.int64)
+    ranks[order] = np.concatenate([[0], np.cumsum(ranked[1:] != ranked[:-1])])
+    return ranks
+
+
+# Suffix array of the 2-bit codes by prefix doubling, starting from the
+# first SUFFIX_ARRAY_SEED bases of every suffix (3 bits each, 0 past the end
+# so a suffix sorts before its extensions)
+def build_suffix_array(text):
+    n = text.length
+    if not n:
+        return np.zeros(0, dtype=np.int64)
+    h = min(SUFFIX_ARRAY_SEED, n)
+    padded = np.concatenate([unpack_codes(text.packed, 0, n).astype(np.uint64) + np.uint64(1),
+                             np.zeros(h, dtype=np.uint64)])
+    keys = np.zeros(n, dtype=np.uint64)
+    for offset in range(h):
+        keys <<= np.uint64(3)
+        keys |= padded[offset:offset + n]
+    del padded
+    order = np.argsort(keys, kind="stable")
+    ranks = _dense_ranks(keys, order)
+    while ranks.max() < n - 1:
+        following = np.zeros(n, dtype=np.int64)
+        following[:n - h] = ranks[h:] + 1
+        keys = ranks * (n + 1) + following
+        order = np.argsort(keys, kind="stable")
+        ranks = _dense_ranks(keys, order)
+        h *= 2
+    return order
+
+
+def _index_dtype(length):
+    return np.dtype("<i4") if length < 2 ** 31 else np.dtype("<i8")
+
+
+def _index_file_name(reference, contig):
+    return derived_file_name(reference, f"{contig.index}.{INDEX_SUFFIX}")
+
+
+def build_index(reference, contig):
+    text = _Text(*contig_arrays(reference, contig))
+    path = reference_root() / _index_file_name(reference, contig)
+    partial = path.with_name(f"{path.name}.{uuid.uuid4().hex}.partial")
+    try:
+        with open(partial, "wb") as output:
+            output.write(build_suffix_array(text).astype(_index_dtype(contig.length)).tobytes())
+        os.replace(partial, path)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    return path
+
+
+# Suffix array of a contig, mapped from its index file. A missing index is
+# built on first use for sequences up to LAZY_INDEX_MAX_LENGTH; longer ones
+# are scanned until it is built with the build_search_index command.
+def contig_index(reference, contig):
+    if not contig.length:
+        return None
+    file_name = _index_file_name(reference, contig)
+    with _indexes_lock:
+        index = _indexes.get(file_name)
+    if index is not None:
+        return index
+    if not (reference_root() / file_name).exists():
+        if contig.length > LAZY_INDEX_MAX_LENGTH:
+            return None
+        build_index(reference, contig)
+    index = np.frombuffer(mapped_file(file_name), dtype=_index_dtype(contig.length), count=contig.length)
+    with _indexes_lock:
+        _indexes[file_name] = index
+    return index
+
+
+# Compares the suffix at `position` with the codes of a seed: negative if it
+# sorts first, 0 if the seed is a prefix of it, positive otherwise
+def _compare(text, position, seed):
+    window = unpack_codes(text.packed, position, min(position + len(seed), text.length))
+    differ = np.flatnonzero(window != seed[:len(window)])
+    if len(differ):
+        return int(window[differ[0]]) - int(seed[differ[0]])
+    return 0 if len(window) == len(seed) else -1
+
+
+# [lo, hi) of the suffix array entries starting with the seed
+def _seed_interval(text, index, seed):
+    lo, hi = 0, len(index)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _compare(text, int(index[mid]), seed) < 0:
+            lo = mid + 1
+        else:
+            hi = mid
+    first, hi = lo, len(index)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _compare(text, int(index[mid]), seed) <= 0:
+            lo = mid + 1
+        else:
+            hi = mid
+    return first, lo
+
+
+# Window starts where at least one pigeonhole seed matches exactly, or None
+# when the seeds are too short, too ambiguous or too frequent to be useful
+def _seed_candidates(text, index, masks, mismatches):
+    m = len(masks)
+    pieces = mismatches + 1
+    if m // pieces < MIN_SEED_LENGTH:
+        return None
+    bounds = [m * piece // pieces for piece in range(pieces + 1)]
+    seeds = []
+    for first, last in zip(bounds, bounds[1:]):
+        choices = [_MASK_CODES[mask] for mask in masks[first:last].tolist()]
+        if np.prod([len(choice) for choice in choices], dtype=np.float64) > MAX_SEED_EXPANSIONS:
+            return None
+        seeds.append((first, choices))
+    candidates, total = [], 0
+    for offset, choices in seeds:
+        for codes in product(*choices):
+            lo, hi = _seed_interval(text, index, np.array(codes, dtype=np.uint8))
+            total += hi - lo
+            if total > MAX_SEED_CANDIDATES:
+                return None
+            candidates.append(index[lo:hi].astype(np.int64) - offset)
+    if not candidates:
+        return np.zeros(0, dtype=np.int64)
+    candidates = np.unique(np.concatenate(candidates))
+    return candidates[(candidates >= 0) & (candidates <= text.length - m)]
+
+
+# Hits of one strand in [start, stop) of a text
+def _strand_hits(text, index, masks, mismatches, start, stop):
+    candidates = None
+    if index is not None:
+        candidates = _seed_candidates(text, index, masks, mismatches)
+    if candidates is None:
+        return _scan(text, masks, mismatches, start, stop)
+    candidates = candidates[(candidates >= start) & (candidates + len(masks) <= stop)]
+    return _verify(text, candidates, masks, mismatches)
+
+
+# All hits in [start, stop) of a text, ordered by position then strand, as
+# arrays so that long hit lists stay compact in the result cache
+def _text_hits(text, index, pattern, mismatches, strands, start=0, stop=None):
+    stop = text.length if stop is None else min(stop, text.length)
+    positions, strand_codes, counts = [], [], []
+    for strand, masks in _strand_masks(pattern, strands):
+        found, misses = _strand_hits(text, index, masks, mismatches, start, stop)
+        positions.append(found)
+        strand_codes.append(np.full(len(found), strand, dtype=np.int8))
+        counts.append(misses.astype(np.int16))
+    positions, strand_codes, counts = (np.concatenate(parts) for parts in (positions, strand_codes, counts))
+    if len(positions) > MAX_HITS:
+        raise ValueError(f"The pattern matches more than {MAX_HITS} times; use a longer pattern or fewer mismatches.")
+    order = np.lexsort((strand_codes, positions))
+    return {"position": positions[order], "strand": strand_codes[order], "mismatches": counts[order]}
+
+
+def search_sequence(sequence, pattern, mismatches=0, strands="both"):
+    validate_search(pattern, mismatches, strands)
+    params = {"pattern": pattern.upper(), "mismatches": mismatches, "strands": strands}
+
+    def compute():
+        hits = _text_hits(_Text.from_string(sequence), None, pattern, mismatches, strands)
+        hits["contig"] = np.zeros(len(hits["position"]), dtype=np.int32)
+        return hits
+
+    return cached_result("motif_hits", params, [sequence], compute)
+
+
+# Hits over every sequence of a registered reference, or within one region
+def search_reference(name, pattern, mismatches=0, strands="both", region=None):
+    validate_search(pattern, mismatches, strands)
+    reference = get_reference(name)
+    contigs = list(reference.contigs.all())
+    params = {"pattern": pattern.upper(), "mismatches": mismatches, "strands": strands, "region": region}
+
+    def compute():
+        if region:
+            contig_name, start, stop = parse_region(region, {contig.name for contig in contigs})
+            selected = [(contig, start, stop) for contig in contigs if contig.name == contig_name]
+        else:
+            selected = [(contig, 0, None) for contig in contigs]
+        parts, total = [], 0
+        for contig, start, stop in selected:
+            text = _Text(*contig_arrays(reference, contig))
+            hits = _text_hits(text, contig_index(reference, contig), pattern, mismatches, strands, start, stop)
+            hits["contig"] = np.full(len(hits["position"]), contig.index, dtype=np.int32)
+            total += len(hits["position"])
+            if total > MAX_HITS:
+                raise ValueError(f"The pattern matches more than {MAX_HITS} times; use a longer pattern or fewer mismatches.")
+            parts.append(hits)
+        return {key: np.concatenate([hits[key] for hits in parts]) for key in ("contig", "position", "strand", "mismatches")}
+
+    # The file name changes whenever a reference is registered again
+    return cached_result("motif_hits", params, [reference.file_name], compute)
+
+
+# One page of hits, with the matched bases read from the searched sequence
+def hit_page(hits, pattern_length, offset, limit, read, contig_names=None):
+    limit = max(1, min(limit, MAX_HIT_LIMIT))
+    offset = max(offset, 0)
+    page = []
+    for contig, position, strand, mismatches in zip(
+        *(hits[key][offset:offset + limit].tolist() for key in ("contig", "position", "strand", "mismatches"))
+    ):
+        hit = {
+            "start": position,
+            "end": position + pattern_length,
+            "strand": _STRAND_SIGNS[strand],
+            "mismatches": mismatches,
+            "match": read(contig, position, position + pattern_length),
+        }
+        if contig_names is not None:
+            hit = {"sequence": contig_names[contig], **hit}
+        page.append(hit)
+    total = len(hits["position"])
+    return {
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": offset + limit if offset + limit < total else None,
+        "hits": page,
+    }
+
+
+def sequence_hit_page(sequence, pattern, mismatches=0, strands="both", offset=0, limit=DEFAULT_HIT_LIMIT):
+    hits = search_sequence(sequence, pattern, mismatches, strands)
+    return hit_page(hits, len(pattern), offset, limit, lambda contig, start, stop: sequence[start:stop])
+
+
+def reference_hit_page(name, pattern, mismatches=0, strands="both", region=None, offset=0,
+                       limit=DEFAULT_HIT_LIMIT):
+    hits = search_reference(name, pattern, mismatches, strands, region)
+    reference = get_reference(name)
+    contigs = {contig.index: contig for contig in reference.contigs.all()}
+
+    def read(index, start, stop):
+        return decode_range(*contig_arrays(reference, contigs[index]), start, stop)
+
+    names = {index: contig.name for index, contig in contigs.items()}
+    return hit_page(hits, len(pattern), offset, limit, read, names)
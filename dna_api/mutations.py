@@ -0,0 +1,108 @@
+import json
+
+import numpy as np
+
+from .kernel import as_bytes
+
+# Substitutions are found by comparing the two sequences a block at a time,
+# so only one block of mismatch positions is alive at once and results can
+# be streamed out as they are found.
+
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+SUBSTITUTION = "substitution"
+MNV = "mnv"
+
+OUTPUT_FORMATS = ("json", "ndjson", "vcf")
+DETECTION_MODES = ("direct", "alignment")
+
+
+def _mismatch_blocks(reference, user, block_size):
+    for start in range(0, len(reference), block_size):
+        stop = start + block_size
+        yield np.flatnonzero(reference[start:stop] != user[start:stop]) + start
+
+
+# (start, end) of every maximal run of adjacent mismatches, merged across blocks
+def _mismatch_runs(blocks):
+    pending = None
+    for positions in blocks:
+        if not len(positions):
+            continue
+        breaks = np.flatnonzero(np.diff(positions) != 1) + 1
+        starts = positions[np.concatenate([[0], breaks])].tolist()
+        ends = (positions[np.concatenate([breaks - 1, [len(positions) - 1]])] + 1).tolist()
+        if pending is not None:
+            if starts[0] == pending[1]:
+                starts[0] = pending[0]
+            else:
+                yield pending
+        yield from zip(starts[:-1], ends[:-1])
+        pending = (starts[-1], ends[-1])
+    if pending is not None:
+        yield pending
+
+
+def _mismatch_positions(blocks):
+    for positions in blocks:
+        for position in positions.tolist():
+            yield position, position + 1
+
+
+# Mutations between two equal-length sequences, in position order. With
+# collapse_runs, adjacent substitutions are reported as one multi-nucleotide
+# variant (MNV). Lengths are checked eagerly so callers can report the
+# error before they start streaming.
+def iter_mutations(reference_sequence, user_sequence, collapse_runs=False, block_size=DEFAULT_BLOCK_SIZE):
+    if len(reference_sequence) != len(user_sequence):
+        raise ValueError("Sequences must be of the same length for mutation detection.")
+    return _iter_mutations(reference_sequence, user_sequence, collapse_runs, block_size)
+
+
+def _iter_mutations(reference_sequence, user_sequence, collapse_runs, block_size):
+    blocks = _mismatch_blocks(as_bytes(reference_sequence), as_bytes(user_sequence), block_size)
+    return mutations_from_blocks(reference_sequence, user_sequence, blocks, collapse_runs)
+
+
+# Mutation dicts from blocks of sorted mismatch positions
+def mutations_from_blocks(reference_sequence, user_sequence, blocks, collapse_runs=False):
+    spans = _mismatch_runs(blocks) if collapse_runs else _mismatch_positions(blocks)
+    for start, end in spans:
+        yield {
+            "position": start,
+            "reference_base": reference_sequence[start:end],
+            "user_base": user_sequence[start:end],
+            "mutation_type": SUBSTITUTION if end - start == 1 else MNV,
+        }
+
+
+def ndjson_mutations(mutations):
+    for mutation in mutations:
+        yield json.dumps(mutation) + "\n"
+
+
+# Minimal VCF-style text: 1-based POS, one line per variant. Insertions and
+# deletions (empty reference or user bases) are padded with the neighbouring
+# reference base as VCF requires, so the reference sequence is needed for them.
+def vcf_mutations(mutations, chrom="sequence", reference=None):
+    yield "##fileformat=VCFv4.2\n"
+    yield '##INFO=<ID=TYPE,Number=1,Type=String,Description="Mutation type">\n'
+    yield '##ALT=<ID=DEL,Description="Deletion">\n'
+    yield "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n"
+    for mutation in mutations:
+        position = mutation["position"]
+        ref, alt = mutation["reference_base"], mutation["user_base"]
+        if not ref or not alt:
+            if position > 0:
+                pad = reference[position - 1]
+                ref, alt = pad + ref, pad + alt
+                position -= 1
+            elif len(ref) < len(reference):
+                pad = reference[len(ref)]
+                ref, alt = ref + pad, alt + pad
+            else:
+                # A deletion of the whole reference has no flanking base
+                alt = "<DEL>"
+        yield (
+            f"{chrom}\t{position + 1}\t.\t{ref}\t{alt}\t.\tPASS\tTYPE={mutation['mutation_type']}\n"
+        )
@@ -0,0 +1,18 @@
+# Parsing of request options shared by the views, the job queue and
+# admission control, so all three read a request the same way.
+
+
+# Boolean option given as a JSON boolean, 0/1 or a string such as "true" or
+# "false" (form data); bool() would read "false" as true
+def parse_flag(value, name, default=False):
+    if value is None:
+        return default
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value in ("true", "1", "yes", "on"):
+            return True
+        if value in ("false", "0", "no", "off", ""):
+            return False
+    elif value in (True, False):
+        return bool(value)
+    raise ValueError(f"{name} must be true or false.")
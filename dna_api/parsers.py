@@ -0,0 +1,12 @@
+from rest_framework.parsers import JSONParser
+
+from .metrics import stage
+
+
+# JSON request bodies, timed as the "parse" stage of the request
+class TimedJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get("request")
+        length = int(request.META.get("CONTENT_LENGTH") or 0) if request is not None else None
+        with stage("request", "parse", length):
+            return super().parse(stream, media_type, parser_context)
@@ -0,0 +1,263 @@
+import mmap
+import shutil
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_slug
+from django.db import transaction
+
+from .ingest import RECORD, SEQUENCE, parse_records
+from .kernel import encode_codes, pack_codes
+from .models import ReferenceContig, ReferenceGenome
+from .storage import decode_range, exception_runs, fold_case
+
+# Registered reference genomes.
+#
+# A reference is written once into a single file under DNA_REFERENCE_ROOT:
+# for every sequence of the FASTA, its bases folded to upper case and packed
+# 2 bits per base, followed by its exception runs (N and IUPAC stretches)
+# and its lower-case (soft-masked) runs, as in dna_api.storage. The
+# ReferenceContig rows index where each part starts. Files are memory-mapped
+# read-only, so a region read touches only the pages holding that region and
+# every worker process shares them through the OS page cache.
+#
+# Regions use the samtools convention: "chr1" (the whole sequence) or
+# "chr1:1,001-2,000" (1-based, inclusive).
+
+FILE_SUFFIX = ".packed"
+
+_maps = {}
+_maps_lock = threading.Lock()
+
+
+def reference_root():
+    return Path(getattr(settings, "DNA_REFERENCE_ROOT", Path(settings.BASE_DIR) / "references"))
+
+
+def parse_region(region, contig_names):
+    if region in contig_names:
+        return region, 0, None
+    name, _, span = region.rpartition(":")
+    if not name or name not in contig_names:
+        raise ValueError(f"Unknown sequence in region '{region}'.")
+    first, _, last = span.replace(",", "").partition("-")
+    try:
+        start = int(first) - 1
+        end = int(last) if last else None
+    except ValueError:
+        raise ValueError(f"Region '{region}' must look like name:start-end.")
+    if start < 0 or (end is not None and end <= start):
+        raise ValueError(f"Region '{region}' is empty or starts before 1.")
+    return name, start, end
+
+
+# Runs found while packing a contig, spilled to temporary files as they
+# come so that a soft-masked chromosome does not hold millions of runs in
+# memory. The last run is kept back, since the next chunk may extend it.
+class _RunSpill:
+    def __init__(self, with_bases):
+        self.files = [tempfile.TemporaryFile() for _ in range(3 if with_bases else 2)]
+        self.pending = None
+        self.count = 0
+
+    def _write(self, starts, lengths, bases):
+        self.files[0].write(np.asarray(starts, dtype="<u8").tobytes())
+        self.files[1].write(np.asarray(lengths, dtype="<u8").tobytes())
+        if len(self.files) == 3:
+            self.files[2].write(np.asarray(bases, dtype=np.uint8).tobytes())
+        self.count += len(starts)
+
+    def add(self, starts, lengths, bases=None):
+        if not len(starts):
+            return
+        starts, lengths = starts.astype(np.int64), lengths.astype(np.int64)
+        bases = np.zeros(len(starts), dtype=np.uint8) if bases is None else bases
+        if self.pending is not None:
+            start, length, base = self.pending
+            if starts[0] == start + length and bases[0] == base:
+                # A run split at a chunk boundary is joined again
+                starts[0], lengths[0] = start, lengths[0] + length
+            else:
+                self._write([start], [length], [base])
+        self._write(starts[:-1], lengths[:-1], bases[:-1])
+        self.pending = (int(starts[-1]), int(lengths[-1]), int(bases[-1]))
+
+    # Copies the runs to `output` (all starts, then all lengths, then the
+    # characters) and returns their number
+    def close(self, output):
+        if self.pending is not None:
+            self._write(*([value] for value in self.pending))
+        for spilled in self.files:
+            spilled.seek(0)
+            shutil.copyfileobj(spilled, output)
+            spilled.close()
+        return self.count
+
+
+# Packs one FASTA record into `output`, chunk by chunk, and returns its
+# length and the file offsets of its parts
+class _ContigWriter:
+    def __init__(self, output):
+        self.output = output
+        self.packed_offset = output.tell()
+        self.length = 0
+        self.carry = np.zeros(0, dtype=np.uint8)
+        self.runs = _RunSpill(with_bases=True)
+        self.case_runs = _RunSpill(with_bases=False)
+
+    def write(self, chunk):
+        raw, case_starts, case_lengths = fold_case(np.frombuffer(chunk, dtype=np.uint8))
+        codes, positions, chars = encode_codes(raw)
+        if len(positions):
+            starts, lengths, bases = exception_runs(positions, chars)
+            self.runs.add(starts + self.length, lengths, bases)
+        self.case_runs.add(case_starts + self.length, case_lengths)
+        self.length += len(chunk)
+        codes = np.concatenate([self.carry, codes])
+        usable = len(codes) - len(codes) % 4
+        self.output.write(pack_codes(codes[:usable]).tobytes())
+        self.carry = codes[usable:]
+
+    def close(self):
+        if len(self.carry):
+            self.output.write(pack_codes(self.carry).tobytes())
+        runs_offset = self.output.tell()
+        run_count = self.runs.close(self.output)
+        case_offset = self.output.tell()
+        case_run_count = self.case_runs.close(self.output)
+        return self.length, self.packed_offset, runs_offset, run_count, case_offset, case_run_count
+
+
+# Registers the sequences of a FASTA stream (plain or gzip) as a reference
+def register_reference(name, stream, description=""):
+    try:
+        validate_slug(name)
+    except ValidationError:
+        raise ValueError("Name may only contain letters, digits, - and _.")
+    if ReferenceGenome.objects.filter(name=name).exists():
+        raise ValueError(f"Reference '{name}' already exists.")
+    root = reference_root()
+    root.mkdir(parents=True, exist_ok=True)
+    file_name = f"{uuid.uuid4().hex}{FILE_SUFFIX}"
+    path = root / file_name
+    contigs, writer, contig_name = [], None, None
+    try:
+        with open(path, "wb") as output:
+            for kind, value in parse_records(stream):
+                if kind == RECORD:
+                    if writer is not None:
+                        contigs.append((contig_name, *writer.close()))
+                    contig_name = value.split()[0] if value.split() else f"sequence{len(contigs) + 1}"
+                    writer = _ContigWriter(output)
+                elif kind == SEQUENCE:
+                    writer.write(value)
+            if writer is not None:
+                contigs.append((contig_name, *writer.close()))
+        if not sum(contig[1] for contig in contigs):
+            raise ValueError("The FASTA file contains no sequences.")
+        if len({contig[0] for contig in contigs}) != len(contigs):
+            raise ValueError("Sequence names in the FASTA file must be unique.")
+        with transaction.atomic():
+            reference = ReferenceGenome.objects.create(
+                name=name, description=description, file_name=file_name,
+                total_length=sum(contig[1] for contig in contigs),
+            )
+            ReferenceContig.objects.bulk_create([
+                ReferenceContig(reference=reference, name=contig_name, index=index, length=length,
+                                packed_offset=packed_offset, runs_offset=runs_offset, run_count=run_count,
+                                case_offset=case_offset, case_run_count=case_run_count)
+                for index, (contig_name, length, packed_offset, runs_offset, run_count, case_offset, case_run_count)
+                in enumerate(contigs)
+            ])
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return reference
+
+
+# Files derived from a reference (search indexes) are kept next to it and
+# named after it, so they go away with it
+def derived_file_name(reference, suffix):
+    return f"{reference.file_name}.{suffix}"
+
+
+def delete_reference(reference):
+    root = reference_root()
+    paths = [root / reference.file_name, *root.glob(f"{reference.file_name}.*")]
+    # Arrays may still be viewing the maps; they are closed once those are gone
+    with _maps_lock:
+        for path in paths:
+            _maps.pop(str(path), None)
+    reference.delete()
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+# Read-only map of a file under the reference root, opened once per process
+def mapped_file(file_name):
+    path = str(reference_root() / file_name)
+    with _maps_lock:
+        mapped = _maps.get(path)
+        if mapped is None:
+            with open(path, "rb") as source:
+                mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+            _maps[path] = mapped
+        return mapped
+
+
+# Sequence arrays of a contig (see dna_api.storage.sequence_arrays); the
+# packed bytes are a zero-copy view of the mapped file
+def contig_arrays(reference, contig):
+    mapped = mapped_file(reference.file_name)
+    runs = contig.run_count
+    offset = contig.runs_offset
+    starts = np.frombuffer(mapped, dtype="<u8", count=runs, offset=offset).astype(np.int64)
+    lengths = np.frombuffer(mapped, dtype="<u8", count=runs, offset=offset + 8 * runs).astype(np.int64)
+    bases = np.frombuffer(mapped, dtype=np.uint8, count=runs, offset=offset + 16 * runs)
+    packed = np.frombuffer(mapped, dtype=np.uint8, count=(contig.length + 3) // 4, offset=contig.packed_offset)
+    case_runs = contig.case_run_count
+    case_starts = np.frombuffer(mapped, dtype="<u8", count=case_runs, offset=contig.case_offset).astype(np.int64)
+    case_lengths = np.frombuffer(mapped, dtype="<u8", count=case_runs,
+                                 offset=contig.case_offset + 8 * case_runs).astype(np.int64)
+    return contig.length, starts, lengths, bases, packed, case_starts, case_lengths
+
+
+def get_reference(name):
+    try:
+        return ReferenceGenome.objects.get(name=name)
+    except ReferenceGenome.DoesNotExist:
+        raise ValueError(f"Unknown reference '{name}'.")
+
+
+# (reference, contig, start, end) of a region. Without a region the
+# reference must hold a single sequence, which is taken whole.
+def _resolve_region(name, region):
+    reference = get_reference(name)
+    contigs = {contig.name: contig for contig in reference.contigs.all()}
+    if region:
+        contig_name, start, end = parse_region(region, contigs)
+    elif len(contigs) == 1:
+        contig_name, start, end = next(iter(contigs)), 0, None
+    else:
+        raise ValueError(f"Reference '{name}' has several sequences; a region is required.")
+    contig = contigs[contig_name]
+    if start >= contig.length:
+        raise ValueError(f"Region '{region}' starts after the end of {contig_name} (length {contig.length}).")
+    end = contig.length if end is None else min(end, contig.length)
+    return reference, contig, start, end
+
+
+# Bases of a region of a registered reference
+def reference_region(name, region=None):
+    reference, contig, start, end = _resolve_region(name, region)
+    return decode_range(*contig_arrays(reference, contig), start, end)
+
+
+def reference_region_length(name, region=None):
+    reference, contig, start, end = _resolve_region(name, region)
+    return end - start
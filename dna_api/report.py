@@ -0,0 +1,177 @@
+import io
+import tempfile
+
+from .analysis import analyze_sequence
+from .cache import cache_key, get_result_cache
+from .kernel import encode
+from .metrics import stage
+from .utils import gc_content_graph_png
+
+# PDF analysis reports.
+#
+# The report is laid out line by line, starting a new page whenever the
+# current one is full, and written into a spooled buffer that stays in
+# memory for ordinary reports and moves to an anonymous temporary file
+# (removed on close) for very large ones. Reports up to the result cache's
+# item limit are cached by a hash of their input.
+
+SPOOL_BYTES = 8 * 1024 * 1024
+PDF_CONTENT_TYPE = 'application/pdf'
+
+MARGIN = 50
+LEADING = 14
+TITLE_FONT = ("Helvetica-Bold", 14)
+HEADING_FONT = ("Helvetica-Bold", 11)
+BODY_FONT = ("Helvetica", 10)
+SEQUENCE_FONT = ("Courier", 9)
+CHART_WIDTH = 500
+
+# Longer mutation lists and protein sequences are truncated in the report;
+# the full results are available from /api/analysis/ and the jobs API
+MAX_REPORT_MUTATIONS = 10000
+MAX_REPORT_PROTEIN = 200000
+
+
+# The analyses shown in a report, computed in one pass over the sequence
+def report_results(sequence, reference_sequence=None):
+    with stage("pdf_report", "analyze", len(sequence)):
+        result = analyze_sequence(sequence, reference_sequence)
+    return {
+        "summary": {
+            "Length": result["length"],
+            "Valid (ACGT only)": result["valid"],
+            "GC content (%)": round(result["gc_content"], 2),
+            "Base counts": encode(sequence).base_counts(),
+            "Mutations": len(result["mutations"]) if reference_sequence else "no reference given",
+        },
+        "gc_content_graph": gc_content_graph_png(sequence) if result["length"] else None,
+        "protein_sequence": result["translated_sequence"],
+        "mutations": result["mutations"],
+    }
+
+
+class _PageWriter:
+    def __init__(self, output):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.pdfgen import canvas
+
+        self.canvas = canvas.Canvas(output, pagesize=letter)
+        self.width, self.height = letter
+        self.page = 1
+        self.y = self.height - MARGIN
+
+    def _footer(self):
+        self.canvas.setFont(*BODY_FONT)
+        self.canvas.drawRightString(self.width - MARGIN, MARGIN / 2, f"Page {self.page}")
+
+    def new_page(self):
+        self._footer()
+        self.canvas.showPage()
+        self.page += 1
+        self.y = self.height - MARGIN
+
+    def ensure(self, height):
+        if self.y - height < MARGIN:
+            self.new_page()
+
+    def line(self, text, font=BODY_FONT, indent=0):
+        self.ensure(LEADING)
+        self.canvas.setFont(*font)
+        self.canvas.drawString(MARGIN + indent, self.y, text)
+        self.y -= LEADING
+
+    def heading(self, text):
+        self.ensure(3 * LEADING)
+        self.y -= LEADING / 2
+        self.line(text, HEADING_FONT)
+
+    # Unbroken text (sequences) split into lines that fit the page width
+    def wrapped(self, text, font=SEQUENCE_FONT, indent=0):
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+
+        per_line = max(1, int((self.width - 2 * MARGIN - indent) // stringWidth("M", *font)))
+        for start in range(0, len(text), per_line):
+            self.line(text[start:start + per_line], font, indent)
+
+    def image(self, png, width=CHART_WIDTH):
+        from reportlab.lib.utils import ImageReader
+
+        image = ImageReader(io.BytesIO(png))
+        image_width, image_height = image.getSize()
+        height = width * image_height / image_width
+        self.ensure(height)
+        self.y -= height
+        self.canvas.drawImage(image, MARGIN, self.y, width, height)
+        self.y -= LEADING
+
+    def save(self):
+        self._footer()
+        self.canvas.save()
+
+
+def _mutation_line(mutation):
+    change = f"{mutation['reference_base'] or '-'} > {mutation['user_base'] or '-'}"
+    return f"{mutation['position']:>12}  {change:<24} {mutation['mutation_type']}"
+
+
+# Writes the PDF for report_results() output (or any dict of label ->
+# value) to a binary file object
+def write_pdf_report(results, output):
+    writer = _PageWriter(output)
+    writer.line("DNA Analysis Report", TITLE_FONT)
+    for key, value in results.items():
+        if value is None:
+            continue
+        if key == "summary":
+            writer.heading("Summary")
+            for label, item in value.items():
+                if isinstance(item, dict):
+                    item = ", ".join(f"{name}: {count}" for name, count in item.items())
+                writer.line(f"{label}: {item}", indent=10)
+        elif key == "gc_content_graph":
+            writer.heading("GC Content")
+            writer.image(value)
+        elif key == "protein_sequence":
+            writer.heading(f"Protein Translation ({len(value)} residues)")
+            writer.wrapped(value[:MAX_REPORT_PROTEIN], indent=10)
+            if len(value) > MAX_REPORT_PROTEIN:
+                writer.line(f"... truncated after {MAX_REPORT_PROTEIN} residues", indent=10)
+        elif key == "mutations":
+            writer.heading(f"Mutations ({len(value)})")
+            for mutation in value[:MAX_REPORT_MUTATIONS]:
+                writer.line(_mutation_line(mutation), SEQUENCE_FONT, indent=10)
+            if len(value) > MAX_REPORT_MUTATIONS:
+                writer.line(f"... and {len(value) - MAX_REPORT_MUTATIONS} more", indent=10)
+        else:
+            writer.heading(str(key))
+            for item in value if isinstance(value, list) else [value]:
+                writer.wrapped(str(item), BODY_FONT, indent=10)
+    writer.save()
+
+
+# Readable file object positioned at the start of the report for the
+# sequence, from the result cache when possible. The caller closes it.
+def pdf_report_file(sequence, reference_sequence=None):
+    cache = get_result_cache()
+    key = cache_key("pdf_report", {}, [sequence, reference_sequence or ""])
+    found, pdf_bytes = cache.get(key)
+    if found:
+        return io.BytesIO(pdf_bytes)
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    try:
+        results = report_results(sequence, reference_sequence)
+        with stage("pdf_report", "write", len(sequence)):
+            write_pdf_report(results, output)
+        if output.tell() <= cache.max_item_bytes:
+            output.seek(0)
+            cache.set(key, output.read())
+        output.seek(0)
+    except BaseException:
+        output.close()
+        raise
+    return output
+
+
+def pdf_report_bytes(sequence, reference_sequence=None):
+    with pdf_report_file(sequence, reference_sequence) as report:
+        return report.read()
@@ -4,6 +4,9 @@ from django.contrib.auth.models import User
 
 
 class DNAAnalysisSerializer(serializers.ModelSerializer):
+    sequence = serializers.CharField()
+    translated_sequence = serializers.CharField(allow_blank=True)
+
     class Meta:
         model = DNAAnalysis
         fields = '__all__'
@@ -0,0 +1,205 @@
+import struct
+import zlib
+
+import numpy as np
+
+from .kernel import BASES, as_bytes, encode_codes, pack_codes, unpack_codes
+
+# Compact storage formats for sequences and protein text.
+#
+# Sequences are stored in the smallest of three forms, named by the first
+# byte of the blob:
+#
+#     packed   header   format (1 byte), length (uint64), exception runs and
+#                       lower-case runs (uint32 each)
+#              runs     exception starts, lengths (uint64 each), characters
+#                       (1 byte each); lower-case starts, lengths (uint64 each)
+#              packed   four bases per byte, first base in the high bits
+#     raw      format, length, then the ASCII text
+#     zlib     format, length, then the zlib-compressed ASCII text
+#
+# In the packed form the sequence is folded to upper case first, so
+# soft-masked (lower-case) bases are packed like any other and the case is
+# kept as runs: a masked repeat costs 16 bytes whatever its length.
+# Exceptions (N and IUPAC codes) are kept as runs of one repeated
+# character, so an assembly gap of a million Ns costs 17 bytes. Sequences
+# that pack poorly (short, or full of IUPAC codes) are stored raw or
+# compressed instead. Any range of a packed or raw blob can be decoded from
+# the bytes holding it, without reading the rest.
+#
+# Protein text is zlib-compressed when that makes it smaller; a leading flag
+# byte says which form is stored.
+
+SEQUENCE_PACKED_V1 = 1  # Before lower-case runs; read only
+SEQUENCE_PACKED = 2
+SEQUENCE_RAW = 3
+SEQUENCE_ZLIB = 4
+_PLAIN_HEADER = struct.Struct("<BQ")
+_V1_HEADER = struct.Struct("<BQI")
+_PACKED_HEADER = struct.Struct("<BQII")
+SEQUENCE_HEADER_SIZE = _PACKED_HEADER.size  # Enough to read the header of any form
+
+TEXT_RAW = 0
+TEXT_ZLIB = 1
+COMPRESS_MIN_LENGTH = 256
+
+_DECODE = np.frombuffer(BASES, dtype=np.uint8)
+_NO_RUNS = np.zeros(0, dtype=np.int64)
+
+
+# (starts, lengths, characters) of the runs of one repeated exception character
+def exception_runs(positions, bases):
+    if not len(positions):
+        return positions, positions, bases
+    breaks = np.flatnonzero((np.diff(positions) != 1) | (np.diff(bases) != 0)) + 1
+    firsts = np.concatenate([[0], breaks])
+    lengths = np.diff(np.concatenate([firsts, [len(positions)]]))
+    return positions[firsts], lengths, bases[firsts]
+
+
+# (starts, lengths) of the runs of True in a boolean array
+def mask_runs(mask):
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], mask.view(np.int8), [0]])))
+    return edges[0::2], edges[1::2] - edges[0::2]
+
+
+# Upper-case copy of raw sequence bytes, with the (starts, lengths) runs of
+# its lower-case letters
+def fold_case(raw):
+    lower = (raw >= ord("a")) & (raw <= ord("z"))
+    if not lower.any():
+        return raw, _NO_RUNS, _NO_RUNS
+    return np.where(lower, raw - 32, raw).astype(np.uint8), *mask_runs(lower)
+
+
+# (length, exception starts, lengths, characters, packed bytes, lower-case
+# starts, lengths) of a sequence, as stored in packed blobs and reference files
+def sequence_arrays(sequence):
+    raw, case_starts, case_lengths = fold_case(as_bytes(sequence))
+    codes, positions, chars = encode_codes(raw)
+    starts, lengths, bases = exception_runs(positions, chars)
+    return len(raw), starts, lengths, bases, pack_codes(codes), case_starts, case_lengths
+
+
+def pack_sequence(sequence):
+    length, starts, lengths, bases, packed, case_starts, case_lengths = sequence_arrays(sequence)
+    blob = b"".join([
+        _PACKED_HEADER.pack(SEQUENCE_PACKED, length, len(starts), len(case_starts)),
+        starts.astype("<u8").tobytes(),
+        lengths.astype("<u8").tobytes(),
+        bases.astype(np.uint8).tobytes(),
+        case_starts.astype("<u8").tobytes(),
+        case_lengths.astype("<u8").tobytes(),
+        packed.astype(np.uint8).tobytes(),
+    ])
+    if len(blob) <= _PLAIN_HEADER.size + length:
+        return blob
+    text = sequence.encode("ascii")
+    compressed = zlib.compress(text)
+    if len(compressed) < len(text):
+        return _PLAIN_HEADER.pack(SEQUENCE_ZLIB, length) + compressed
+    return _PLAIN_HEADER.pack(SEQUENCE_RAW, length) + text
+
+
+# Size of the header and runs of a packed blob, from its first bytes
+def _packed_runs(header):
+    if header[0] == SEQUENCE_PACKED_V1:
+        _, length, runs = _V1_HEADER.unpack_from(header)
+        return length, runs, 0, _V1_HEADER.size + 17 * runs
+    if header[0] == SEQUENCE_PACKED:
+        _, length, runs, case_runs = _PACKED_HEADER.unpack_from(header)
+        return length, runs, case_runs, _PACKED_HEADER.size + 17 * runs + 16 * case_runs
+    raise ValueError(f"Unsupported packed sequence version {header[0]}.")
+
+
+# Sequence arrays (see sequence_arrays) of a packed blob; `packed_first`
+# is the byte of the packed bases that `blob[runs_size:]` starts at
+def _read_packed(blob, packed_first=0):
+    length, runs, case_runs, runs_size = _packed_runs(blob)
+    offset = runs_size - 17 * runs - 16 * case_runs
+    arrays = []
+    for count, dtype in ((runs, "<u8"), (runs, "<u8"), (runs, np.uint8), (case_runs, "<u8"), (case_runs, "<u8")):
+        array = np.frombuffer(blob, dtype=dtype, count=count, offset=offset)
+        arrays.append(array if dtype == np.uint8 else array.astype(np.int64))
+        offset += count * np.dtype(dtype).itemsize
+    starts, lengths, bases, case_starts, case_lengths = arrays
+    packed = np.frombuffer(blob, dtype=np.uint8, offset=offset)
+    # Shift positions so that they count from the first base of `packed`
+    shift = packed_first * 4
+    return length - shift, starts - shift, lengths, bases, packed, case_starts - shift, case_lengths
+
+
+def packed_sequence_length(blob):
+    return _PLAIN_HEADER.unpack_from(blob)[1]
+
+
+# Bases [start, stop) of a stored sequence; only that range is decoded
+def unpack_sequence(blob, start=0, stop=None):
+    def read(ranges):
+        return [bytes(blob[offset:None if size is None else offset + size]) for offset, size in ranges]
+
+    return unpack_sequence_range(read, start, stop)
+
+
+# Bases [start, stop) of a stored sequence, reading only the bytes holding
+# them: read([(offset, size), ...]) returns those byte ranges of the blob
+def unpack_sequence_range(read, start=0, stop=None):
+    header = read([(0, SEQUENCE_HEADER_SIZE)])[0]
+    form, length = _PLAIN_HEADER.unpack_from(header)
+    stop = length if stop is None else min(stop, length)
+    start = min(max(start, 0), stop)
+    if form == SEQUENCE_RAW:
+        if stop == start:
+            return ""
+        return read([(_PLAIN_HEADER.size + start, stop - start)])[0].decode("ascii")
+    if form == SEQUENCE_ZLIB:
+        data = read([(_PLAIN_HEADER.size, None)])[0]
+        return zlib.decompressobj().decompress(data, stop)[start:stop].decode("ascii")
+    _, _, _, runs_size = _packed_runs(header)
+    first, last = start // 4, (stop + 3) // 4
+    runs, packed = read([(0, runs_size), (runs_size + first, last - first)])
+    arrays = _read_packed(runs + packed, first)
+    return decode_range(*arrays, start - first * 4, stop - first * 4)
+
+
+# Positions in [start, stop), counted from `start`, covered by the runs,
+# and the index of the run covering each
+def _covered(starts, lengths, start, stop):
+    lo = np.searchsorted(starts + lengths, start, side="right")
+    hi = np.searchsorted(starts, stop)
+    if hi <= lo:
+        return _NO_RUNS, _NO_RUNS
+    run_starts = np.maximum(starts[lo:hi], start)
+    run_lengths = np.minimum(starts[lo:hi] + lengths[lo:hi], stop) - run_starts
+    offsets = np.repeat(run_starts - start - (np.cumsum(run_lengths) - run_lengths), run_lengths)
+    return offsets + np.arange(len(offsets)), np.repeat(np.arange(lo, hi), run_lengths)
+
+
+# Bases [start, stop) from packed codes, exception runs and lower-case runs.
+# Only the packed bytes of the range are touched, so `packed` may be a view
+# of a mapped file.
+def decode_range(length, starts, lengths, bases, packed, case_starts, case_lengths, start=0, stop=None):
+    stop = length if stop is None else min(stop, length)
+    start = min(max(start, 0), stop)
+    out = _DECODE[unpack_codes(packed, start, stop)]
+    positions, runs = _covered(starts, lengths, start, stop)
+    out[positions] = bases[runs]
+    positions, _ = _covered(case_starts, case_lengths, start, stop)
+    out[positions] |= 0x20
+    return out.tobytes().decode("ascii")
+
+
+def pack_text(text):
+    data = text.encode("utf-8")
+    if len(data) >= COMPRESS_MIN_LENGTH:
+        compressed = zlib.compress(data)
+        if len(compressed) < len(data):
+            return bytes([TEXT_ZLIB]) + compressed
+    return bytes([TEXT_RAW]) + data
+
+
+def unpack_text(blob):
+    data = bytes(blob[1:])
+    if blob[0] == TEXT_ZLIB:
+        data = zlib.decompress(data)
+    return data.decode("utf-8")
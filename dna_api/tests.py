@@ -1,3 +1,1133 @@
-from django.test import TestCase
+import base64
+import gzip
+import io
+import json
+import os
+import re
+import random
+import shutil
+import tempfile
+import threading
+import zlib
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from . import batch, charts, utils
+from .admission import CostClass, Rejected, cost_classes
+from .alignment import collapse_substitution_runs, iter_aligned_variants
+from .analysis import analyze_sequence, save_sequence_analysis
+from .authentication import get_user_cache
+from .cache import BoundedFileBasedCache, ResultCache, cache_key, get_result_cache
+from .downsample import BLOCK_BUCKETS, MinMaxPyramid, gc_pyramids
+from .gc_profile import GCProfile, gc_profiles
+from .ingest import analyze_stream, open_stream
+from .jobs import execute_job
+from .kernel import EncodedSequence, encode
+from .kmers import kmer_spectrum
+from .models import AnalysisJob, DNAAnalysis, Mutation
+from .motifs import reference_hit_page, search_reference, search_sequence, sequence_hit_page
+from .mutations import iter_mutations, vcf_mutations
+from .references import reference_region, reference_root, register_reference
+from .storage import pack_sequence, packed_sequence_length, unpack_sequence
+from .translation import CODONS, MUTATION_TYPES, PAIR_TYPES, classify_codon_changes
+from .variants import filter_mutations, mutation_page, samples_with_mutations, store_mutations
+
+
+def random_sequence(length, alphabet="ACGT", seed=0):
+    rng = random.Random(seed)
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+# Half upper case, half lower case (soft-masked), in 200-300 base stretches
+def soft_masked_sequence(length, seed=0):
+    parts = [random_sequence(300, seed=seed + index) if index % 2 else random_sequence(200, seed=seed + index).lower()
+             for index in range(length // 250 + 1)]
+    return "".join(parts)[:length]
+
+
+class KernelTests(TestCase):
+    ALPHABETS = ("ACGT", "ACGTN", "ACGTacgtRYKMSWBDHVNn-")
+    COMPLEMENTS = str.maketrans("ACGTRYKMSWBDHVN-acgtrykmswbdhvn", "TGCAYRMKSWVHDBN-tgcayrmkswvhdbn")
+
+    def test_round_trip_and_ranges(self):
+        for alphabet in self.ALPHABETS:
+            for length in list(range(10)) + [1001]:
+                sequence = random_sequence(length, alphabet, seed=length)
+                encoded = encode(sequence)
+                self.assertEqual(len(encoded), length)
+                self.assertEqual(str(encoded), sequence)
+                self.assertEqual(encoded.is_valid(), set(sequence) <= set("ACGT"))
+                for start, stop in ((0, length), (1, length - 1), (length // 3, length // 3 + 5)):
+                    self.assertEqual(encoded.to_string(start, stop), sequence[start:stop])
+
+    def test_complements_and_counts(self):
+        for alphabet in self.ALPHABETS:
+            for length in list(range(10)) + [1001]:
+                sequence = random_sequence(length, alphabet, seed=length)
+                encoded = encode(sequence)
+                self.assertEqual(str(encoded.complement()), sequence.translate(self.COMPLEMENTS))
+                reverse = encoded.reverse_complement()
+                self.assertEqual(str(reverse), sequence.translate(self.COMPLEMENTS)[::-1])
+                self.assertEqual(str(reverse.reverse_complement()), sequence)
+                expected = {base: 0 for base in "ACGT"}
+                for base in sequence:
+                    expected[base] = expected.get(base, 0) + 1
+                self.assertEqual(encoded.base_counts(), expected)
+                self.assertEqual(reverse.base_counts(), {
+                    base.translate(self.COMPLEMENTS): count for base, count in expected.items()
+                })
+
+    def test_codes_and_invalid_input(self):
+        encoded = EncodedSequence.from_codes([0, 1, 2, 3, 3])
+        self.assertEqual(str(encoded), "ACGTT")
+        self.assertEqual(list(encoded.codes_at(np.array([4, 0, 2]))), [3, 0, 2])
+        with self.assertRaisesMessage(ValueError, "Cannot complement invalid base 'X'."):
+            encode("ACXGT").reverse_complement()
+        with self.assertRaises(ValueError):
+            encode("AC\u00e9GT")
+
+
+def brute_force_spectrum(sequence, k, canonical, top):
+    counts = {}
+    for position in range(len(sequence) - k + 1):
+        kmer = sequence[position:position + k]
+        if set(kmer) <= set("ACGT"):
+            if canonical:
+                kmer = min(kmer, kmer.translate(KernelTests.COMPLEMENTS)[::-1])
+            counts[kmer] = counts.get(kmer, 0) + 1
+    histogram = {}
+    for count in counts.values():
+        histogram[count] = histogram.get(count, 0) + 1
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:top]
+    return {
+        "k": k,
+        "canonical": canonical,
+        "total_kmers": sum(counts.values()),
+        "distinct_kmers": len(counts),
+        "top": [{"kmer": kmer, "count": count} for kmer, count in ranked],
+        "histogram": [{"multiplicity": m, "kmers": histogram[m]} for m in sorted(histogram)],
+    }
+
+
+class KmerTests(TestCase):
+    def test_matches_brute_force(self):
+        # Repeats give multiplicities above one; N runs split k-mers
+        repeat = random_sequence(40, seed=1)
+        sequence = (random_sequence(700, seed=2) + repeat * 6 + "NN" + random_sequence(300, "ACGTN", seed=3)
+                    + repeat[:25] + "n")
+        for k in (1, 2, 5, 11, 12, 21, 32):
+            for canonical in (False, True):
+                expected = brute_force_spectrum(sequence, k, canonical, 50)
+                self.assertEqual(kmer_spectrum(sequence, k, canonical, 50), expected)
+                # Several blocks and hash partitions must give the same result
+                with mock.patch("dna_api.kmers.BLOCK_SIZE", 97), mock.patch("dna_api.kmers.MAX_KMERS_PER_PASS", 64):
+                    self.assertEqual(kmer_spectrum(sequence, k, canonical, 50), expected)
+
+    def test_canonical_skips_characters_without_a_complement(self):
+        sequence = random_sequence(500, seed=4) + "X*" + random_sequence(500, seed=5) + "-?" + "ACGTT"
+        for k in (3, 15):
+            self.assertEqual(kmer_spectrum(sequence, k, True, 20), brute_force_spectrum(sequence, k, True, 20))
+        for path in ("/api/kmers/", "/api/async/kmers/"):
+            response = APIClient().post(path, {"sequence": sequence, "k": 15, "canonical": True}, format="json")
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(response.json()["total_kmers"], brute_force_spectrum(sequence, 15, True, 1)["total_kmers"])
+
+    def test_short_and_invalid_input(self):
+        self.assertEqual(kmer_spectrum("ACG", 5)["total_kmers"], 0)
+        self.assertEqual(kmer_spectrum("NNNNNN", 3)["histogram"], [])
+        for k, top in ((0, 10), (33, 10), (5, 0)):
+            with self.assertRaises(ValueError):
+                kmer_spectrum("ACGT", k, top=top)
+
+
+class OptionTests(TestCase):
+    def test_boolean_options(self):
+        client = APIClient()
+        for path in ("/api/protein-translation/", "/api/async/protein-translation/"):
+            for value, has_orfs in ((False, False), ("false", False), ("0", False), (True, True), ("true", True)):
+                response = client.post(path, {"sequence": "ATGAAATAG", "orfs": value}, format="json")
+                self.assertEqual(response.status_code, 200, (path, value))
+                self.assertEqual("orfs" in response.json(), has_orfs, (path, value))
+            response = client.post(path, {"sequence": "ATGAAATAG", "orfs": "maybe"}, format="json")
+            self.assertEqual(response.status_code, 400)
+        response = client.post("/api/protein-translation/", {"sequence": "ATGAAATAG", "orfs": "false"})
+        self.assertEqual(response.data, {"protein_sequence": "MK*"})
+
+
+# Substitutions found one position at a time, adjacent ones joined when collapsing
+def brute_force_mutations(reference, user, collapse_runs):
+    mutations = []
+    for position, (ref, alt) in enumerate(zip(reference, user)):
+        if ref == alt:
+            continue
+        last = mutations[-1] if mutations else None
+        if collapse_runs and last and last["position"] + len(last["reference_base"]) == position:
+            last["reference_base"] += ref
+            last["user_base"] += alt
+            last["mutation_type"] = "mnv"
+        else:
+            mutations.append({"position": position, "reference_base": ref, "user_base": alt,
+                              "mutation_type": "substitution"})
+    return mutations
+
+
+class GCProfileTests(TestCase):
+    def brute_force_windows(self, sequence, window, step, start, end):
+        window = min(window, end - start)
+        rows = []
+        for position in range(start, end - window + 1, step or window):
+            bases = sequence[position:position + window]
+            g, c = bases.count("G"), bases.count("C")
+            rows.append((position, position + window, (g + c) / window * 100, (g - c) / (g + c) if g + c else 0.0))
+        return rows
+
+    def test_windows_match_brute_force(self):
+        sequence = random_sequence(997, "ACGTGGCN", seed=8) + "N" * 60 + random_sequence(203, seed=9)
+        profile = GCProfile(sequence)
+        for window, step, start, end in (
+            (100, None, 0, None), (37, 1, 0, None), (50, 7, 13, 901), (5000, None, 0, None),
+            (200, 30, 400, 450), (20, 10, 1000, 1050), (1, None, 995, 1002),
+        ):
+            stop = len(sequence) if end is None else end
+            series = profile.windows(window, step, start, end)
+            rows = list(zip(series["start"].tolist(), series["end"].tolist(),
+                            series["gc_content"].tolist(), series["gc_skew"].tolist()))
+            expected = self.brute_force_windows(sequence, window, step, start, stop)
+            self.assertEqual([row[:2] for row in rows], [row[:2] for row in expected], (window, step, start, end))
+            for row, expected_row in zip(rows, expected):
+                self.assertAlmostEqual(row[2], expected_row[2])
+                self.assertAlmostEqual(row[3], expected_row[3])
+            self.assertAlmostEqual(profile.gc_content(start, stop), self.brute_force_windows(
+                sequence, stop - start, None, start, stop)[0][2])
+        # The all-N stretch has no G or C: zero content and zero skew
+        series = profile.windows(20, 10, 1000, 1050)
+        self.assertEqual(series["gc_content"].tolist(), [0.0] * 4)
+        self.assertEqual(series["gc_skew"].tolist(), [0.0] * 4)
+        self.assertEqual(list(gc_profiles(sequence, (10, 20))), [10, 20])
+
+    def test_invalid_regions(self):
+        profile = GCProfile("ACGT")
+        for window, step, start, end in ((0, None, 0, None), (2, 0, 0, None), (2, None, 3, 2), (2, None, 0, 5)):
+            with self.assertRaises(ValueError):
+                profile.windows(window, step, start, end)
+
+
+class MutationDetectionTests(TestCase):
+    def test_blocks_match_a_per_position_loop(self):
+        reference = random_sequence(5000, seed=6)
+        user = list(reference)
+        rng = random.Random(7)
+        # Runs of every length, some across the 64-base block boundaries
+        for start in rng.sample(range(4990), 120) + [0, 63, 127, 4995]:
+            for position in range(start, start + rng.randrange(1, 6)):
+                user[position] = "ACGT"[("ACGT".index(reference[position]) + 1) % 4]
+        user = "".join(user)
+        for collapse_runs in (False, True):
+            expected = brute_force_mutations(reference, user, collapse_runs)
+            for block_size in (64, 1000, 1 << 20):
+                self.assertEqual(list(iter_mutations(reference, user, collapse_runs, block_size)), expected)
+        self.assertEqual(list(iter_mutations(reference, reference, True, 64)), [])
+        with self.assertRaises(ValueError):
+            iter_mutations("ACGT", "ACG")
+
+    def test_output_formats(self):
+        client = APIClient()
+        data = {"reference_sequence": "ACGTACGTAC", "user_sequence": "ACCTACGAAC", "collapse_runs": True}
+        response = client.post("/api/mutation-detection/", {**data, "format": "ndjson"}, format="json")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual([json.loads(line) for line in b"".join(response.streaming_content).splitlines()],
+                         brute_force_mutations(data["reference_sequence"], data["user_sequence"], True))
+        response = client.post("/api/mutation-detection/", {**data, "format": "vcf", "chrom": "chr7"}, format="json")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "##fileformat=VCFv4.2")
+        self.assertEqual(lines[3].split("\t"), ["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO"])
+        self.assertEqual(lines[4:], ["chr7\t3\t.\tG\tC\t.\tPASS\tTYPE=substitution",
+                                     "chr7\t8\t.\tT\tA\t.\tPASS\tTYPE=substitution"])
+        # Indels from alignment mode are padded with the neighbouring base
+        response = client.post("/api/mutation-detection/", {
+            "reference_sequence": "GGACGTTACG", "user_sequence": "ACGTTACG", "mode": "alignment", "format": "vcf",
+        }, format="json")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([line.split("\t")[1:5] for line in lines[4:]], [["1", ".", "GGA", "A"]])
+        whole = list(vcf_mutations([{"position": 0, "reference_base": "ACGT", "user_base": "",
+                                     "mutation_type": "deletion"}], reference="ACGT"))
+        self.assertEqual(whole[-1].split("\t")[1:5], ["1", ".", "ACGT", "<DEL>"])
+
+
+class BatchTests(TestCase):
+    OPERATIONS = ["reverse_complement", "base_counts", "gc_content", "six_frame_translation", "validate_sequence"]
+
+    def expected(self, sequence):
+        return {operation: getattr(utils, operation)(sequence) for operation in self.OPERATIONS}
+
+    def test_inline_batch(self):
+        sequences = [random_sequence(length, seed=length) for length in (1, 30, 999)] + ["ACGX", "AC\u00e9"]
+        with mock.patch("dna_api.batch.get_batch_pool") as pool:
+            results = batch.run_batch(sequences, self.OPERATIONS)
+            pool.assert_not_called()
+        for index, sequence in enumerate(sequences[:3]):
+            self.assertEqual(results[index], {"index": index, "status": "ok", "results": self.expected(sequence),
+                                              "errors": {}})
+        self.assertEqual(results[3]["status"], "partial")
+        self.assertIn("reverse_complement", results[3]["errors"])
+        self.assertEqual((results[4]["index"], results[4]["status"]), (4, "error"))
+
+    def test_shared_memory_batch(self):
+        sequences = [random_sequence(40000, seed=index) for index in range(4)] + [""]
+        with mock.patch("dna_api.batch.TASK_BYTES", 50000):
+            results = batch.run_batch(sequences, self.OPERATIONS)
+        self.assertEqual([result["index"] for result in results], list(range(5)))
+        for sequence, result in zip(sequences[:4], results):
+            self.assertEqual(result["results"], self.expected(sequence))
+        self.assertEqual(results[4]["errors"], {"gc_content": "division by zero"})
+
+    def test_block_is_unlinked_after_an_error(self):
+        names = []
+        create = shared_memory.SharedMemory
+
+        def record(*args, **kwargs):
+            block = create(*args, **kwargs)
+            names.append(block.name)
+            return block
+
+        sequences = [random_sequence(40000, seed=index) for index in range(2)]
+        for error in (RuntimeError("pool failed"), BrokenProcessPool()):
+            pool = mock.Mock()
+            pool.submit.side_effect = error
+            with mock.patch("dna_api.batch.shared_memory.SharedMemory", side_effect=record), \
+                    mock.patch("dna_api.batch._pool", pool):
+                with self.assertRaises(type(error)):
+                    batch.run_batch(sequences, ["gc_content"])
+                self.assertEqual(batch._pool is None, isinstance(error, BrokenProcessPool))
+            with self.assertRaises(FileNotFoundError):
+                create(name=names[-1])
+
+
+class CodonClassificationTests(TestCase):
+    def test_pair_table_matches_biopython(self):
+        from Bio.Seq import Seq
+
+        amino_acids = [str(Seq(codon).translate()) for codon in CODONS]
+        for ref_index, ref_aa in enumerate(amino_acids):
+            for user_index, user_aa in enumerate(amino_acids):
+                expected = "nonsense" if user_aa == "*" else "missense" if ref_aa != user_aa else "silent"
+                self.assertEqual(MUTATION_TYPES[PAIR_TYPES[ref_index, user_index]], expected,
+                                 (CODONS[ref_index], CODONS[user_index]))
+
+    def test_changed_codons(self):
+        reference = random_sequence(3001, seed=1)
+        user = list(reference)
+        for position in random.Random(2).sample(range(3001), 300):
+            user[position] = random.Random(position).choice("ACGTNR")
+        user = "".join(user)
+        summary, mutations = classify_codon_changes(reference, user)
+        mutations = list(mutations)
+        changed = [position for position in range(0, 2999, 3) if reference[position:position + 3] != user[position:position + 3]]
+        self.assertEqual([mutation["position"] for mutation in mutations], changed)
+        self.assertEqual(sum(summary.values()), len(changed))
+        for mutation in mutations:
+            self.assertEqual(mutation["user_codon"], user[mutation["position"]:mutation["position"] + 3])
+
+    def test_untranslatable_codons_are_unknown(self):
+        summary, mutations = classify_codon_changes("ATGAAATTT", "ATG-AA*TT")
+        self.assertEqual([(mutation["ref_aa"], mutation["user_aa"], mutation["type"]) for mutation in mutations],
+                         [("K", "X", "missense"), ("F", "X", "missense")])
+        self.assertEqual(summary, {"silent": 0, "missense": 2, "nonsense": 0})
+        client = APIClient()
+        for path in ("/api/mutation-classification/", "/api/async/mutation-classification/"):
+            response = client.post(path, {"reference_sequence": "ATGAAA", "user_sequence": "ATG-AA"}, format="json")
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(response.json()["mutations"][0]["user_aa"], "X")
+
+
+class ResultCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def file_cache(self, max_bytes):
+        return BoundedFileBasedCache(self.directory, {"OPTIONS": {"MAX_BYTES": max_bytes, "MAX_ENTRIES": 1000}})
+
+    def test_keys_are_stable(self):
+        key = cache_key("gc_content", {"window": 100, "step": None}, ["ACGT"])
+        # The shared tier outlives processes and releases, so keys must not change
+        self.assertEqual(key, "dna:gc_content:d3629a34650efdf762bc497cee55af244191d1e1d7c0807032705f40203e4fb6")
+        self.assertEqual(key, cache_key("gc_content", {"step": None, "window": 100}, [b"ACGT"]))
+        self.assertNotEqual(key, cache_key("gc_content", {"window": 101, "step": None}, ["ACGT"]))
+        self.assertNotEqual(key, cache_key("gc_skew", {"window": 100, "step": None}, ["ACGT"]))
+        self.assertNotEqual(cache_key("op", {}, ["AC", "GT"]), cache_key("op", {}, ["ACG", "T"]))
+
+    def test_lru_byte_budget(self):
+        cache = ResultCache(max_bytes=3500, max_item_bytes=2000)
+        for name in "abc":
+            cache.set(name, name * 1000)
+        self.assertTrue(cache.get("a")[0])
+        cache.set("d", "d" * 1000)
+        self.assertEqual([cache.get(name)[0] for name in "abcd"], [True, False, True, True])
+        stats = cache.stats()
+        self.assertLessEqual(stats["bytes"], 3500)
+        self.assertEqual((stats["entries"], stats["evictions"], stats["hits"], stats["misses"]), (3, 1, 4, 1))
+
+    def test_too_large_items_are_skipped(self):
+        shared = self.file_cache(10 ** 6)
+        cache = ResultCache(max_item_bytes=1000, shared_cache=shared)
+        computed = []
+        for _ in range(2):
+            with self.assertLogs("dna_api.cache", "WARNING"):
+                cache.get_or_compute("op", {}, ["ACGT"], lambda: computed.append(1) or "A" * 5000)
+        self.assertEqual(len(computed), 2)
+        self.assertEqual(cache.stats()["skipped"], 2)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_shared_tier(self):
+        shared = self.file_cache(10 ** 6)
+        first, second = ResultCache(shared_cache=shared), ResultCache(shared_cache=shared)
+        self.assertEqual(first.get_or_compute("op", {}, ["ACGT"], lambda: {"value": 1}), {"value": 1})
+        self.assertEqual(second.get_or_compute("op", {}, ["ACGT"], self.fail), {"value": 1})
+        self.assertEqual((second.stats()["shared_hits"], second.stats()["misses"]), (1, 0))
+
+    def test_file_tier_byte_budget(self):
+        shared = self.file_cache(100000)
+        for index in range(12):
+            shared.set(f"key{index}", os.urandom(20000))
+            if index >= 1:
+                self.assertIsNotNone(shared.get("key0"))
+        sizes = [os.path.getsize(os.path.join(self.directory, name)) for name in os.listdir(self.directory)]
+        self.assertLessEqual(sum(sizes), 100000 + max(sizes))
+        self.assertIsNotNone(shared.get("key0"))
+        self.assertIsNotNone(shared.get("key11"))
+        self.assertIsNone(shared.get("key1"))
+
+
+class MetricsTests(TestCase):
+    def test_server_timing_header(self):
+        client = APIClient()
+        for index, path in enumerate(("/api/reverse-complement/", "/api/async/reverse-complement/")):
+            # Distinct sequences, so neither response comes from the result cache
+            sequence = random_sequence(2000, seed=30 + index)
+            response = client.post(path, {"sequence": sequence}, format="json")
+            self.assertEqual(response.status_code, 200, path)
+            entries = [entry.strip().split(";")[0] for entry in response["Server-Timing"].split(",")]
+            self.assertIn("reverse_complement-compute", entries, path)
+            self.assertEqual(entries[-1], "total", path)
+            self.assertRegex(response["Server-Timing"], r"total;dur=\d+\.\d\d$")
+        self.assertIn("Server-Timing", client.get("/api/no-such-endpoint/"))
+
+    def test_metrics_endpoint(self):
+        APIClient().post("/api/reverse-complement/", {"sequence": "ACGT"}, format="json")
+        response = APIClient().get("/api/metrics/")
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('dna_http_request_duration_seconds_count{method="POST",route="api/reverse-complement/",'
+                      'status="200"}', text)
+        self.assertIn('dna_stage_duration_seconds_bucket{operation="reverse_complement",stage="compute",size="1k",'
+                      'le="+Inf"}', text)
+        self.assertIn("dna_result_cache_hits_total", text)
+
+
+# Process executors are exercised in production settings only; spawning them
+# here would only slow the suite down
+@override_settings(DNA_ASYNC_EXECUTORS={"DEFAULT": "thread"})
+class AsyncViewTests(TestCase):
+    def post_both(self, name, data):
+        client = APIClient()
+        responses = []
+        for prefix in ("", "async/"):
+            # Both paths share result cache entries; each must compute its own
+            get_result_cache().clear()
+            responses.append(client.post(f"/api/{prefix}{name}/", data, format="json"))
+        return responses
+
+    def test_async_views_match_the_sync_views(self):
+        reference = random_sequence(3000, seed=40)
+        user = mutate(reference, seed=41)
+        same_length = "".join(base if position % 50 else "T" for position, base in enumerate(reference))
+        requests = [
+            ("reverse-complement", {"sequence": reference}),
+            ("reverse-complement", {}),
+            ("gc-content-graph", {"sequence": reference, "window": 200}),
+            ("gc-content-graph", {"sequence": reference, "format": "svg"}),
+            ("protein-translation", {"sequence": reference}),
+            ("protein-translation", {"sequence": reference, "frames": [1, -2], "orfs": True, "min_orf_length": 5}),
+            ("protein-translation", {"sequence": reference, "frames": [4]}),
+            ("mutation-detection", {"reference_sequence": reference, "user_sequence": same_length}),
+            ("mutation-detection", {"reference_sequence": reference, "user_sequence": same_length,
+                                    "collapse_runs": "true"}),
+            ("mutation-detection", {"reference_sequence": reference, "user_sequence": user, "mode": "alignment"}),
+            ("mutation-detection", {"reference_sequence": reference, "user_sequence": user}),
+            ("mutation-classification", {"reference_sequence": reference, "user_sequence": same_length}),
+            ("validate-sequence", {"sequence": reference}),
+            ("validate-sequence", {"sequence": reference + "X"}),
+            ("interactive-gc-content", {"sequence": reference, "windows": [100, 500], "points": 50}),
+            ("kmers", {"sequence": reference, "k": 7, "canonical": True, "top": 10}),
+            ("kmers", {"sequence": reference, "k": 40}),
+        ]
+        for name, data in requests:
+            sync, asynchronous = self.post_both(name, data)
+            self.assertEqual(sync.status_code, asynchronous.status_code, (name, data))
+            self.assertEqual(sync["Content-Type"], asynchronous["Content-Type"], (name, data))
+            self.assertEqual(json.loads(sync.content), json.loads(asynchronous.content), (name, data))
+
+    def test_async_report_matches_the_sync_report(self):
+        reference = random_sequence(1200, seed=42)
+        user = "".join(base if position % 40 else "G" for position, base in enumerate(reference))
+        sync, asynchronous = self.post_both("generate-report", {"sequence": user, "reference_sequence": reference})
+        self.assertEqual((sync.status_code, asynchronous.status_code), (200, 200))
+        self.assertEqual(asynchronous["Content-Disposition"], 'attachment; filename="DNA_Analysis_Report.pdf"')
+        self.assertEqual(pdf_text(b"".join(sync.streaming_content)), pdf_text(asynchronous.content))
+
+
+class JobTests(TestCase):
+    def submit(self, params):
+        return APIClient().post("/api/jobs/", {
+            "operation": "six_frame_translation", "sequence": "ATGAAATAGATGCCC", "params": params,
+        }, format="json")
+
+    def test_flag_params(self):
+        response = self.submit({"orfs": "false", "frames": [1]})
+        self.assertEqual(response.status_code, 202)
+        job = AnalysisJob.objects.get(pk=response.json()["job_id"])
+        self.assertEqual(job.params, {"orfs": False, "frames": [1]})
+        self.assertNotIn("orfs", execute_job(job.pk))
+        job = AnalysisJob.objects.get(pk=self.submit({"frames": [1]}).json()["job_id"])
+        self.assertIn("orfs", execute_job(job.pk))
+        response = self.submit({"orfs": "maybe"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "orfs must be true or false."})
+        self.assertEqual(AnalysisJob.objects.count(), 2)
+
+
+class FullAnalysisTests(TestCase):
+    def setUp(self):
+        self.reference = random_sequence(1001, seed=10)
+        user = list(self.reference)
+        for position in (0, 35, 36, 37, 500, 501, 999, 1000):
+            user[position] = "N" if position == 500 else "ACGT"[("ACGT".index(self.reference[position]) + 1) % 4]
+        self.user = "".join(user)
+
+    def test_fused_pass_matches_the_separate_analyses(self):
+        for reference in (None, self.reference):
+            for collapse_runs in (False, True):
+                # 1001 is not a multiple of the 36-base blocks
+                result = analyze_sequence(self.user, reference, collapse_runs=collapse_runs, block_size=36)
+                self.assertEqual(result["length"], 1001)
+                self.assertFalse(result["valid"])
+                self.assertAlmostEqual(result["gc_content"], utils.gc_content(self.user))
+                self.assertEqual(result["translated_sequence"], utils.translate_sequence(self.user))
+                expected = list(iter_mutations(reference, self.user, collapse_runs)) if reference else []
+                self.assertEqual(result["mutations"], expected)
+        result = analyze_sequence(self.user[:990] + self.user[995:], self.reference, block_size=36)
+        self.assertEqual(apply_variants(self.reference, result["mutations"]), self.user[:990] + self.user[995:])
+
+    def test_rows_are_saved_together(self):
+        result = analyze_sequence(self.user, self.reference)
+        with mock.patch("dna_api.analysis.store_mutations", side_effect=RuntimeError("disk full")):
+            with self.assertRaises(RuntimeError):
+                save_sequence_analysis(self.user, result)
+        self.assertEqual((DNAAnalysis.objects.count(), Mutation.objects.count()), (0, 0))
+
+        response = APIClient().post("/api/analysis/", {"sequence": self.user, "reference_sequence": self.reference},
+                                    format="json")
+        self.assertEqual(response.status_code, 201)
+        analysis = DNAAnalysis.objects.get(pk=response.data["analysis_id"])
+        self.assertEqual(response.data["mutation_count"], len(result["mutations"]))
+        self.assertEqual(
+            list(analysis.variants.order_by("position").values_list("position", "reference_base", "user_base")),
+            [(mutation["position"], mutation["reference_base"], mutation["user_base"]) for mutation in result["mutations"]],
+        )
+
+
+class MutationQueryTests(TestCase):
+    def setUp(self):
+        self.analyses = [
+            DNAAnalysis.objects.create(sequence="", gc_content=0, translated_sequence="", mutations="[]")
+            for _ in range(3)
+        ]
+
+    def store(self, analysis, positions, reference_base="A", user_base="G"):
+        return store_mutations(analysis, (
+            {"position": position, "reference_base": reference_base, "user_base": user_base,
+             "mutation_type": "substitution"}
+            for position in positions
+        ))
+
+    def all_pages(self, mutations, limit):
+        rows, cursor = mutation_page(mutations, limit=limit)
+        while cursor:
+            page, cursor = mutation_page(mutations, cursor, limit)
+            rows.extend(page)
+        return rows
+
+    def test_paging_across_batch_boundaries(self):
+        # 2500 rows are three bulk_create batches; positions repeat so pages split ties
+        self.assertEqual(self.store(self.analyses[0], [position // 2 for position in range(2500)]), 2500)
+        self.assertEqual(self.store(self.analyses[1], range(0, 2500, 5)), 500)
+        expected = list(Mutation.objects.order_by("position", "id").values_list("position", "id"))
+        self.assertEqual(len(expected), 3000)
+        for limit in (1, 999, 1000, 1001, 3000, 5000):
+            rows = self.all_pages(filter_mutations(), limit)
+            self.assertEqual([(row["position"], row["id"]) for row in rows], expected)
+        rows = self.all_pages(filter_mutations(start=100, end=600, analyses=[self.analyses[1].id]), 7)
+        self.assertEqual([row["position"] for row in rows], list(range(100, 600, 5)))
+
+    def test_cursor_is_stable_under_inserts(self):
+        self.store(self.analyses[0], range(0, 100, 2))
+        first, cursor = mutation_page(filter_mutations(), limit=20)
+        # Rows before the cursor must not shift the next page
+        self.store(self.analyses[1], range(0, 30))
+        second, cursor = mutation_page(filter_mutations(), cursor, 20)
+        self.assertEqual([row["position"] for row in first], list(range(0, 40, 2)))
+        self.assertEqual([row["position"] for row in second], list(range(40, 80, 2)))
+        self.assertEqual(mutation_page(filter_mutations(), cursor, 20)[0][0]["position"], 80)
+        with self.assertRaises(ValueError):
+            mutation_page(filter_mutations(), "12", 20)
+
+    def test_long_alleles_round_trip(self):
+        deleted = random_sequence(1000, seed=17)
+        store_mutations(self.analyses[0], [
+            {"position": 5, "reference_base": deleted, "user_base": "", "mutation_type": "deletion"},
+            {"position": 9, "reference_base": deleted[:255], "user_base": "", "mutation_type": "deletion"},
+        ])
+        row = Mutation.objects.get(position=5)
+        self.assertEqual((len(row.reference_base), len(row.reference_tail)), (255, 745))
+        rows, _ = mutation_page(filter_mutations(reference_base=deleted))
+        self.assertEqual([(row["position"], row["reference_base"]) for row in rows], [(5, deleted)])
+        rows, _ = mutation_page(filter_mutations(reference_base=deleted[:255]))
+        self.assertEqual([row["position"] for row in rows], [9])
+
+    def test_samples_with_mutations(self):
+        for index, analysis in enumerate(self.analyses):
+            self.store(analysis, range(index * 10, index * 10 + 15))
+        mutations = filter_mutations(start=10, end=20)
+        self.assertEqual(samples_with_mutations(mutations), [
+            {"analysis_id": self.analyses[0].id, "mutation_count": 5, "first_position": 10, "last_position": 14},
+            {"analysis_id": self.analyses[1].id, "mutation_count": 10, "first_position": 10, "last_position": 19},
+        ])
+        self.assertEqual(
+            [sample["analysis_id"] for sample in samples_with_mutations(filter_mutations(), self.analyses[0].id, 1)],
+            [self.analyses[1].id],
+        )
+
+    def test_query_endpoints(self):
+        self.store(self.analyses[0], range(10))
+        self.store(self.analyses[1], range(5, 15), "C", "T")
+        client = APIClient()
+        positions, cursor = [], None
+        while True:
+            params = {"reference_base": "C", "limit": 3, **({"cursor": cursor} if cursor else {})}
+            response = client.get("/api/mutations/", params)
+            self.assertEqual(response.status_code, 200)
+            positions.extend(row["position"] for row in response.data["mutations"])
+            cursor = response.data["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(positions, list(range(5, 15)))
+        response = client.get("/api/mutations/samples/", {"start": 12})
+        self.assertEqual([sample["analysis_id"] for sample in response.data["analyses"]], [self.analyses[1].id])
+        self.assertEqual(client.get("/api/mutations/", {"type": "inversion"}).status_code, 400)
+        self.assertEqual(client.get("/api/mutations/", {"cursor": "x"}).status_code, 400)
+
+
+# Text drawn on the pages of a reportlab PDF (ASCII85 + Flate content streams)
+def pdf_text(data):
+    text = []
+    streams = re.findall(rb"/ASCII85Decode /FlateDecode \] /Length \d+\s*>>\s*stream\r?\n(.*?)endstream", data, re.S)
+    for stream in streams:
+        text.append(zlib.decompress(base64.a85decode(stream.strip()[:-2])).decode("latin-1"))
+    return "".join(text)
+
+
+class ReportTests(TestCase):
+    def setUp(self):
+        get_result_cache().clear()
+
+    @mock.patch("dna_api.report.MAX_REPORT_PROTEIN", 100)
+    @mock.patch("dna_api.report.MAX_REPORT_MUTATIONS", 60)
+    def test_multi_page_report(self):
+        reference = random_sequence(3000, seed=11)
+        user = "".join(base if position % 10 else "ACGT"[("ACGT".index(base) + 1) % 4]
+                       for position, base in enumerate(reference))
+        response = APIClient().post("/api/generate-report/", {"sequence": user, "reference_sequence": reference},
+                                    format="json")
+        self.assertEqual((response.status_code, response["Content-Type"]), (200, "application/pdf"))
+        data = b"".join(response.streaming_content)
+        pages = int(re.search(rb"/Count (\d+)", data).group(1))
+        self.assertGreaterEqual(pages, 2)
+        text = pdf_text(data)
+        self.assertEqual(re.findall(r"\(Page (\d+)\)", text), [str(page) for page in range(1, pages + 1)])
+        self.assertIn("Mutations \\(300\\)", text)
+        self.assertIn("... and 240 more", text)
+        self.assertIn("Protein Translation \\(1000 residues\\)", text)
+        self.assertIn("... truncated after 100 residues", text)
+
+    def test_reports_are_cached(self):
+        client = APIClient()
+        first = b"".join(client.post("/api/generate-report/", {"sequence": "ACGT" * 100}, format="json").streaming_content)
+        self.assertTrue(first.startswith(b"%PDF"))
+        with mock.patch("dna_api.report.report_results") as report_results:
+            second = client.post("/api/generate-report/", {"sequence": "ACGT" * 100}, format="json")
+            self.assertEqual(b"".join(second.streaming_content), first)
+            report_results.assert_not_called()
+
+
+class ChartTests(TestCase):
+    def draw(self, windows):
+        def draw(figure):
+            gc_ax, skew_ax = figure.axes
+            for window in windows:
+                x = np.arange(0, 1000, window, dtype=float)
+                gc_ax.plot(x, (x / window) % 7 * 10, label=f"{window} bp")
+                skew_ax.plot(x, np.sin(x / window), label=f"{window} bp")
+            gc_ax.legend(loc="upper right")
+        return draw
+
+    def test_pooled_figures_are_cleared_between_renders(self):
+        fresh = charts.FigurePool(charts._gc_content_template, size=1).render_png(self.draw([50]))
+        pool = charts.FigurePool(charts._gc_content_template, size=1)
+        pool.render_png(self.draw([10, 20, 100]))
+        figure = pool.acquire()
+        self.assertEqual([len(ax.lines) for ax in figure.axes], [0, 0])
+        self.assertEqual([ax.get_legend() for ax in figure.axes], [None, None])
+        self.assertEqual(figure.axes[0].get_title(), "GC Content Analysis")
+        pool.release(figure)
+        # A reused figure draws exactly what a new one does
+        self.assertEqual(pool.render_png(self.draw([50])), fresh)
+        self.assertIs(pool.acquire(), figure)
+
+    def test_pngs_are_cached_by_data(self):
+        sequence = random_sequence(3000, seed=21)
+        profiles = gc_profiles(sequence, [100, 500])
+        png = charts.render_gc_content_png(profiles)
+        self.assertTrue(png.startswith(b"\x89PNG"))
+        with mock.patch.object(charts.gc_content_figures, "render_png", side_effect=AssertionError):
+            self.assertEqual(charts.render_gc_content_png(gc_profiles(sequence, [100, 500])), png)
+
+
+class PackedStorageTests(TestCase):
+    SEQUENCES = {
+        "plain": random_sequence(10000),
+        "soft_masked": soft_masked_sequence(10000),
+        "iupac": random_sequence(10000, "ACGTRYKMSWBDHVN"),
+        "gap": random_sequence(3000) + "N" * 5000 + "n" * 100 + random_sequence(1900, seed=1),
+        "mixed": random_sequence(5000, "ACGTacgtNn-*"),
+        "short": "acg",
+        "empty": "",
+    }
+
+    def test_round_trip_and_ranges(self):
+        rng = random.Random(0)
+        for name, sequence in self.SEQUENCES.items():
+            blob = pack_sequence(sequence)
+            self.assertEqual(unpack_sequence(blob), sequence, name)
+            self.assertEqual(packed_sequence_length(blob), len(sequence), name)
+            for _ in range(50):
+                start = rng.randrange(len(sequence) + 1)
+                stop = rng.randrange(start, len(sequence) + 2)
+                self.assertEqual(unpack_sequence(blob, start, stop), sequence[start:stop], (name, start, stop))
+
+    def test_never_larger_than_text(self):
+        for name, sequence in self.SEQUENCES.items():
+            self.assertLessEqual(len(pack_sequence(sequence)), len(sequence) + 9, name)
+        # Soft-masking costs a run per stretch, not a run per base
+        self.assertLess(len(pack_sequence(self.SEQUENCES["soft_masked"])), 3000)
+
+    def test_sequence_range_from_database(self):
+        for name, sequence in self.SEQUENCES.items():
+            analysis = DNAAnalysis.objects.create(sequence=sequence, gc_content=0, translated_sequence="", mutations="[]")
+            self.assertEqual(DNAAnalysis.objects.get(pk=analysis.pk).sequence, sequence, name)
+            self.assertEqual(DNAAnalysis.sequence_range(analysis.pk, 100, 250), sequence[100:250], name)
+            self.assertEqual(DNAAnalysis.sequence_range(analysis.pk), sequence, name)
+        with self.assertRaises(DNAAnalysis.DoesNotExist):
+            DNAAnalysis.sequence_range(10 ** 9)
+
+
+# Registered references are written under a temporary DNA_REFERENCE_ROOT
+class ReferenceTestCase(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        settings_override = override_settings(DNA_REFERENCE_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def register(self, name, records, line_length=61):
+        fasta = "".join(
+            f">{record}\n" + "".join(f"{sequence[i:i + line_length]}\n" for i in range(0, len(sequence), line_length))
+            for record, sequence in records.items()
+        )
+        return register_reference(name, io.BytesIO(fasta.encode("ascii")))
+
+
+class ReferenceTests(ReferenceTestCase):
+    def test_regions_round_trip(self):
+        soft = soft_masked_sequence(100000)
+        other = random_sequence(1000) + "NNNNnnnnNNNN" + random_sequence(50, seed=1).lower() + "RYKM"
+        reference = self.register("genome", {"chr1": soft, "chr2": other})
+        self.assertEqual(reference_region("genome", "chr1"), soft)
+        self.assertEqual(reference_region("genome", "chr2"), other)
+        rng = random.Random(0)
+        for _ in range(100):
+            start = rng.randrange(len(soft))
+            end = rng.randrange(start + 1, len(soft) + 1)
+            self.assertEqual(reference_region("genome", f"chr1:{start + 1}-{end}"), soft[start:end])
+        # Lower-case stretches are packed; the case runs are joined across lines
+        size = (reference_root() / reference.file_name).stat().st_size
+        self.assertLess(size, len(soft) // 2)
+        self.assertEqual(reference.contigs.get(name="chr1").case_run_count, 200)
+
+    def test_invalid_regions(self):
+        self.register("genome", {"chr1": random_sequence(100), "chr2": random_sequence(100, seed=1)})
+        for region in (None, "chr3", "chr1:0-10", "chr1:20-10", "chr1:200-300"):
+            with self.assertRaises(ValueError, msg=region):
+                reference_region("genome", region)
+        with self.assertRaises(ValueError):
+            reference_region("missing")
+
+
+IUPAC_BASES = {"A": "A", "C": "C", "G": "G", "T": "T", "R": "AG", "Y": "CT", "S": "CG", "W": "AT", "K": "GT",
+               "M": "AC", "B": "CGT", "D": "AGT", "H": "ACT", "V": "ACG", "N": "ACGT"}
+COMPLEMENT = str.maketrans("ACGTRYSWKMBDHVN", "TGCAYRSWMKVHDBN")
+
+
+# (position, strand, mismatches) of every window within the budget, case-insensitively
+def brute_force_hits(sequence, pattern, mismatches):
+    sequence = sequence.upper()
+    hits = []
+    for strand, masks in ((0, pattern), (1, pattern.translate(COMPLEMENT)[::-1])):
+        for position in range(len(sequence) - len(masks) + 1):
+            misses = sum(base not in IUPAC_BASES[mask] for base, mask in zip(sequence[position:], masks))
+            if misses <= mismatches:
+                hits.append((position, strand, misses))
+    return sorted(hits)
+
+
+def hit_tuples(hits):
+    return sorted(zip(hits["position"].tolist(), hits["strand"].tolist(), hits["mismatches"].tolist()))
+
+
+class MotifSearchTests(ReferenceTestCase):
+    def setUp(self):
+        super().setUp()
+        get_result_cache().clear()
+
+    def test_lower_case_bases_match(self):
+        self.assertEqual(sequence_hit_page("ttacgtacgtaa", "ACGT")["total"], 4)
+        self.assertEqual(sequence_hit_page("ttacgtacgtaa", "ACGT")["hits"][0]["match"], "acgt")
+
+    def test_sequence_matches_brute_force(self):
+        sequence = soft_masked_sequence(3000) + "NNNN" + random_sequence(500, "ACGTRY", seed=2)
+        for pattern, mismatches in (("ACGT", 0), ("GATTACA", 1), ("RYNNAC", 0), ("ACGTACGTAC", 2)):
+            self.assertEqual(hit_tuples(search_sequence(sequence, pattern, mismatches)),
+                             brute_force_hits(sequence, pattern, mismatches), pattern)
+
+    def test_reference_index_matches_brute_force(self):
+        sequence = soft_masked_sequence(20000) + "N" * 100 + random_sequence(2000, seed=3)
+        self.register("genome", {"chr1": sequence})
+        # Long enough for the suffix array seeds, and short enough to fall back to the scan
+        for pattern, mismatches in ((sequence[10:20].upper(), 0), (sequence[50:66].upper(), 1), ("ACGTAC", 1)):
+            self.assertEqual(hit_tuples(search_reference("genome", pattern, mismatches)),
+                             brute_force_hits(sequence, pattern, mismatches), pattern)
+        page = reference_hit_page("genome", "ACGTACGTAC", region="chr1:1-5000", limit=5)
+        self.assertEqual(page["total"], len(brute_force_hits(sequence[:5000], "ACGTACGTAC", 0)))
+        for hit in page["hits"]:
+            self.assertEqual(hit["match"], sequence[hit["start"]:hit["end"]])
+
+    def test_invalid_searches(self):
+        for pattern, mismatches, strands in (("", 0, "both"), ("ACGX", 0, "both"), ("ACGT", 4, "both"),
+                                             ("ACGT", 0, "up")):
+            with self.assertRaises(ValueError):
+                search_sequence("ACGTACGT", pattern, mismatches, strands)
+
+
+TINY_CLASSES = {"CLASSES": [{"NAME": "small", "MAX_COST": 1000, "CONCURRENCY": 1, "QUEUE": 1, "WAIT": 1}],
+                "DEFER_OVERSIZED": True, "MAX_DEFERRED_BYTES": 10000}
+
+
+class DownsampleTests(TestCase):
+    def setUp(self):
+        get_result_cache().clear()
+
+    def test_cached_pyramids_match_a_full_pyramid(self):
+        sequence = random_sequence(9000)
+        series = GCProfile(sequence).windows(30, 1)
+        midpoints = (series["start"] + series["end"]) / 2
+        cached = gc_pyramids(sequence, [30], 1)[30]
+        rng = random.Random(0)
+        with mock.patch("dna_api.downsample.BLOCK_BUCKETS", 256):
+            for _ in range(50):
+                start = rng.uniform(-10, 9000)
+                end, points = rng.uniform(start, 9010), rng.randrange(2, 3000)
+                for name in ("gc_content", "gc_skew"):
+                    expected = MinMaxPyramid(midpoints, series[name]).query(start, end, points)
+                    for actual, values in zip(cached[name].query(start, end, points), expected):
+                        self.assertTrue(np.array_equal(actual, values))
+                    self.assertLessEqual(len(expected[0]), points)
+
+    def test_zooming_reads_blocks_from_the_cache(self):
+        sequence = random_sequence(3 * BLOCK_BUCKETS)
+        pyramid = gc_pyramids(sequence, [100], 1)[100]["gc_content"]
+        pyramid.query(0, len(sequence))
+        with mock.patch("dna_api.downsample.GCProfile") as profile:
+            for start in range(0, len(sequence), 20000):
+                pyramid.query(start, start + 50000)
+            profile.assert_not_called()
+        largest = max(len(blob) for blob in get_result_cache().entries.values())
+        self.assertLess(largest, 40 * BLOCK_BUCKETS)
+
+    def test_oversized_results_are_logged(self):
+        cache = ResultCache(max_item_bytes=100)
+        with self.assertLogs("dna_api.cache", "WARNING"):
+            cache.set("big", "A" * 1000)
+        self.assertEqual(cache.get("big"), (False, None))
+        self.assertEqual(cache.stats()["skipped"], 1)
+
+
+class IngestTests(TestCase):
+    def upload(self, body, operations="length,valid,reverse_complement"):
+        response = APIClient().generic("POST", f"/api/upload/raw/?operations={operations}", body,
+                                       content_type="application/octet-stream")
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_records_across_chunks(self):
+        sequence = random_sequence(5000)
+        results = list(analyze_stream(io.BytesIO(f">one\n{sequence}\n>two\nAC\nGT\n".encode()),
+                                      ("length", "base_counts", "translation"), chunk_size=7))
+        self.assertEqual([result["name"] for result in results], ["one", "two"])
+        self.assertEqual(results[0]["length"], 5000)
+        self.assertEqual(results[0]["base_counts"], {base: sequence.count(base) for base in "ACGT"})
+        self.assertEqual(results[1]["translation"], "T")
+
+    def test_invalid_record_does_not_end_the_stream(self):
+        results = self.upload(">bad\nACGX\n>accent\nACG\u00e9\n>good\nAACC\n".encode())
+        self.assertEqual([result["name"] for result in results], ["bad", "accent", "good"])
+        self.assertIn("error", results[0])
+        self.assertIn("error", results[1])
+        self.assertEqual(results[2], {"name": "good", "length": 4, "valid": True, "reverse_complement": "GGTT"})
+
+    def test_truncated_gzip_ends_with_an_error(self):
+        body = gzip.compress(b">a\nACGT\n" * 50000)
+        self.assertEqual(len(list(analyze_stream(open_stream(io.BytesIO(body))))), 50000)
+        results = self.upload(body[:len(body) // 2])
+        self.assertEqual(list(results[-1]), ["error"])
+        self.assertTrue(all("error" not in result for result in results[:-1]))
+
+
+class AdmissionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_full_queue_and_timeout(self):
+        cost = CostClass("test", 100, concurrency=1, queue=1, wait=0.2)
+        cost.enter()
+        outcome = {}
+
+        def wait_for_slot():
+            try:
+                cost.enter()
+            except Rejected as rejected:
+                outcome["status"] = rejected.status
+
+        waiter = threading.Thread(target=wait_for_slot)
+        waiter.start()
+        while not cost.waiting:
+            pass
+        with self.assertRaises(Rejected) as full:
+            cost.enter()
+        self.assertEqual(full.exception.status, 429)
+        self.assertGreaterEqual(full.exception.retry_after, 1)
+        waiter.join()
+        self.assertEqual(outcome["status"], 503)
+        cost.leave(0.1)
+        cost.enter()
+        self.assertEqual(cost.active, 1)
+
+    @override_settings(DNA_ADMISSION=TINY_CLASSES)
+    def test_oversized_inputs(self):
+        response = self.client.post("/api/reverse-complement/", {"sequence": "ACGT" * 500}, format="json")
+        self.assertEqual(response.status_code, 202)
+        job = AnalysisJob.objects.get(pk=response.json()["job_id"])
+        self.assertEqual((job.operation, job.sequence), ("reverse_complement", "ACGT" * 500))
+        self.assertEqual(response["Location"], f"/api/jobs/{job.id}/")
+        # No job operation, or above the deferral limit
+        self.assertEqual(self.client.post("/api/validate-sequence/", {"sequence": "A" * 3000},
+                                          format="json").status_code, 413)
+        self.assertEqual(self.client.post("/api/reverse-complement/", {"sequence": "A" * 20000},
+                                          format="json").status_code, 413)
+        self.assertEqual(self.client.post("/api/batch/", {"sequences": ["ACGT" * 200] * 2, "operations": ["gc_content"]},
+                                          format="json").status_code, 413)
+        self.assertEqual(self.client.post("/api/reverse-complement/", {"sequence": "ACGT"}, format="json").json(),
+                         {"reverse_complement": "ACGT"})
+
+    @override_settings(DNA_ADMISSION=TINY_CLASSES)
+    def test_deferred_translation_matches_the_view(self):
+        for options, operation, params in (
+            ({"orfs": "false"}, "translation", {}),
+            ({"orfs": "0", "frames": [1, 2]}, "six_frame_translation", {"frames": [1, 2], "orfs": False}),
+            ({"orfs": "true"}, "six_frame_translation", {"orfs": True}),
+        ):
+            response = self.client.post("/api/protein-translation/", {"sequence": "ACGT" * 500, **options},
+                                        format="json")
+            self.assertEqual(response.status_code, 202, options)
+            job = AnalysisJob.objects.get(pk=response.json()["job_id"])
+            self.assertEqual((job.operation, job.params), (operation, params))
+        response = self.client.post("/api/protein-translation/", {"sequence": "ACGT" * 500, "orfs": "maybe"},
+                                    format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_streaming_response_keeps_its_slot(self):
+        reference = random_sequence(2000)
+        user = reference[:100] + reference[105:1500] + "ACGT" + reference[1500:]
+        response = self.client.post("/api/mutation-detection/", {
+            "reference_sequence": reference, "user_sequence": user, "mode": "alignment", "format": "ndjson",
+        }, format="json")
+        self.assertTrue(response.streaming)
+        for _ in response.streaming_content:
+            self.assertEqual(sum(cost.active for cost in cost_classes()), 1)
+        response.close()
+        self.assertEqual(sum(cost.active for cost in cost_classes()), 0)
+
+
+# Applies variants (in reference order) to the reference
+def apply_variants(reference, variants):
+    parts, cursor = [], 0
+    for variant in variants:
+        parts += [reference[cursor:variant["position"]], variant["user_base"]]
+        cursor = variant["position"] + len(variant["reference_base"])
+    return "".join(parts) + reference[cursor:]
+
+
+def mutate(sequence, seed, edits=20):
+    rng = random.Random(seed)
+    for _ in range(edits):
+        position = rng.randrange(len(sequence))
+        kind = rng.choice(("substitution", "insertion", "deletion"))
+        if kind == "substitution":
+            sequence = sequence[:position] + rng.choice("ACGT".replace(sequence[position], "")) + sequence[position + 1:]
+        elif kind == "insertion":
+            sequence = sequence[:position] + random_sequence(rng.randrange(1, 6), seed=seed + position) + sequence[position:]
+        else:
+            sequence = sequence[:position] + sequence[position + rng.randrange(1, 6):]
+    return sequence
+
+
+class AlignmentTests(TestCase):
+    def test_variants_rebuild_the_user_sequence(self):
+        for seed in range(20):
+            reference = random_sequence(3000, seed=seed)
+            user = mutate(reference, seed)
+            variants = list(iter_aligned_variants(reference, user))
+            self.assertEqual(apply_variants(reference, variants), user, seed)
+            self.assertEqual(apply_variants(reference, collapse_substitution_runs(iter(variants))), user, seed)
+            positions = [variant["position"] for variant in variants]
+            self.assertEqual(positions, sorted(positions))
+
+    def test_identical_and_edge_cases(self):
+        reference = random_sequence(500)
+        self.assertEqual(list(iter_aligned_variants(reference, reference)), [])
+        for user in ("TTT" + reference, reference + "TTT", reference[7:], reference[:-7]):
+            self.assertEqual(apply_variants(reference, iter_aligned_variants(reference, user)), user)
+
+    def test_invalid_arguments_fail_before_iteration(self):
+        with self.assertRaises(ValueError):
+            iter_aligned_variants("ACGT", "ACGT", band=-1)
+        with self.assertRaises(ValueError):
+            iter_aligned_variants("ACGT", "ACGTé")
+        client = APIClient()
+        for output_format in ("json", "ndjson", "vcf"):
+            response = client.post("/api/mutation-detection/", {
+                "reference_sequence": "ACGTACGT", "user_sequence": "ACGACGT", "mode": "alignment", "band": -1,
+                "format": output_format,
+            }, format="json")
+            self.assertEqual(response.status_code, 400, output_format)
+
+    def test_vcf_pads_indels(self):
+        lines = list(vcf_mutations([
+            {"position": 0, "reference_base": "AC", "user_base": "", "mutation_type": "deletion"},
+            {"position": 4, "reference_base": "", "user_base": "T", "mutation_type": "insertion"},
+        ], reference="ACGTA"))
+        self.assertEqual([line.split("\t")[1:5] for line in lines if not line.startswith("#")],
+                         [["1", ".", "ACG", "G"], ["4", ".", "T", "TT"]])
+        whole = list(vcf_mutations([{"position": 0, "reference_base": "ACGT", "user_base": "",
+                                     "mutation_type": "deletion"}], reference="ACGT"))
+        self.assertEqual(whole[-1].split("\t")[3:5], ["ACGT", "<DEL>"])
+
+
+# A fast hasher keeps the many logins below cheap
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class AuthenticationTests(TestCase):
+    def setUp(self):
+        get_user_cache().clear()
+        self.user = get_user_model().objects.create_user("alice", "alice@example.com", "correct horse 42")
+        self.client = APIClient()
+
+    def login(self, password="correct horse 42", username="alice"):
+        return self.client.post("/api/login/", {"username": username, "password": password}, format="json")
+
+    def protected(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        response = self.client.get("/api/protected/")
+        self.client.credentials()
+        return response.status_code
+
+    def test_login(self):
+        self.assertEqual(self.login(password="wrong").status_code, 401)
+        self.assertEqual(self.login(username="nobody").status_code, 401)
+        tokens = self.login().data
+        self.assertEqual(self.protected(tokens["access"]), 200)
+        self.assertEqual(self.protected(tokens["access"] + "x"), 401)
+        self.assertEqual(self.client.get("/api/protected/").status_code, 401)
+
+    def test_cached_user_needs_no_query(self):
+        access = self.login().data["access"]
+        self.assertEqual(self.protected(access), 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.protected(access), 200)
+
+    def test_refresh_rotation_and_logout(self):
+        refresh = self.login().data["refresh"]
+        rotated = self.client.post("/api/token/refresh/", {"refresh": refresh}, format="json")
+        self.assertEqual(rotated.status_code, 200)
+        self.assertEqual(self.client.post("/api/token/refresh/", {"refresh": refresh}, format="json").status_code, 401)
+        refresh = rotated.data["refresh"]
+        self.assertEqual(self.client.post("/api/logout/", {"refresh": refresh}, format="json").status_code, 205)
+        self.assertEqual(self.client.post("/api/logout/", {"refresh": refresh}, format="json").status_code, 400)
+        self.assertEqual(self.client.post("/api/token/refresh/", {"refresh": refresh}, format="json").status_code, 401)
+
+    def test_password_change_and_deactivation_revoke_tokens(self):
+        access = self.login().data["access"]
+        self.assertEqual(self.protected(access), 200)
+        self.user.set_password("another horse 43")
+        self.user.save()
+        self.assertEqual(self.protected(access), 401)
+
+        access = self.login(password="another horse 43").data["access"]
+        self.assertEqual(self.protected(access), 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.protected(access), 401)
+        self.assertEqual(self.login(password="another horse 43").status_code, 401)
+
+    def test_async_views_authenticate_like_the_sync_views(self):
+        access = self.login().data["access"]
+        for path in ("/api/reverse-complement/", "/api/async/reverse-complement/"):
+            for authorization, expected in ((None, 200), (f"Bearer {access}", 200), (f"Bearer {access}x", 401),
+                                            ("Bearer a b", 401)):
+                if authorization:
+                    self.client.credentials(HTTP_AUTHORIZATION=authorization)
+                response = self.client.post(path, {"sequence": "ACGT"}, format="json")
+                self.client.credentials()
+                self.assertEqual(response.status_code, expected, (path, authorization))
+                if expected == 401:
+                    self.assertEqual(response["WWW-Authenticate"], 'Bearer realm="api"', path)
+        self.user.is_active = False
+        self.user.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.assertEqual(self.client.post("/api/async/reverse-complement/", {"sequence": "ACGT"},
+                                          format="json").status_code, 401)
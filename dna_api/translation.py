@@ -0,0 +1,207 @@
+import numpy as np
+
+from .kernel import BASES, as_bytes, encode
+
+CODON_TABLE = {
+    'ATA': 'I', 'ATC': 'I', 'ATT': 'I', 'ATG': 'M',
+    'ACA': 'T', 'ACC': 'T', 'ACG': 'T', 'ACT': 'T',
+    'AAC': 'N', 'AAT': 'N', 'AAA': 'K', 'AAG': 'K',
+    'AGC': 'S', 'AGT': 'S', 'AGA': 'R', 'AGG': 'R',
+    'CTA': 'L', 'CTC': 'L', 'CTG': 'L', 'CTT': 'L',
+    'CCA': 'P', 'CCC': 'P', 'CCG': 'P', 'CCT': 'P',
+    'CAC': 'H', 'CAT': 'H', 'CAA': 'Q', 'CAG': 'Q',
+    'CGA': 'R', 'CGC': 'R', 'CGG': 'R', 'CGT': 'R',
+    'GTA': 'V', 'GTC': 'V', 'GTG': 'V', 'GTT': 'V',
+    'GCA': 'A', 'GCC': 'A', 'GCG': 'A', 'GCT': 'A',
+    'GAC': 'D', 'GAT': 'D', 'GAA': 'E', 'GAG': 'E',
+    'GGA': 'G', 'GGC': 'G', 'GGG': 'G', 'GGT': 'G',
+    'TCA': 'S', 'TCC': 'S', 'TCG': 'S', 'TCT': 'S',
+    'TTC': 'F', 'TTT': 'F', 'TTA': 'L', 'TTG': 'L',
+    'TAC': 'Y', 'TAT': 'Y', 'TAA': '*', 'TAG': '*',
+    'TGC': 'C', 'TGT': 'C', 'TGA': '*', 'TGG': 'W',
+}
+
+# Codon index = 16 * first + 4 * second + third, using the kernel's 2-bit codes
+CODONS = [a + b + c for a in BASES.decode() for b in BASES.decode() for c in BASES.decode()]
+AMINO_ACIDS = np.frombuffer(''.join(CODON_TABLE[codon] for codon in CODONS).encode('ascii'), dtype=np.uint8)
+
+# Marker for codons that contain an N, IUPAC code or other non-ACGT base
+UNKNOWN = ord('X')
+START = ord('M')
+STOP = ord('*')
+
+ALL_FRAMES = (1, 2, 3, -1, -2, -3)
+DEFAULT_MIN_ORF_LENGTH = 30
+
+
+def frame_name(frame):
+    return f"{frame:+d}"
+
+
+# Codon indices and validity for the codon starting at every position of the
+# forward strand, plus the index of the reverse-complement codon read over
+# the same three bases. Frames are strided views of these arrays.
+class CodonIndex:
+    def __init__(self, sequence):
+        encoded = encode(sequence)
+        self.length = len(encoded)
+        codes = encoded.codes()
+        span = max(self.length - 2, 0)
+        first, second, third = codes[:span], codes[1:span + 1], codes[2:span + 2]
+        self.forward = (first << 4) | (second << 2) | third
+        self.reverse = ((3 - third) << 4) | ((3 - second) << 2) | (3 - first)
+        mask = encoded.mask
+        self.unknown = mask[:span] | mask[1:span + 1] | mask[2:span + 2]
+
+    # Forward-strand position of the first base of every codon in a frame,
+    # in reading order
+    def codon_positions(self, frame):
+        offset = abs(frame) - 1
+        if frame > 0:
+            return np.arange(offset, self.length - 2, 3, dtype=np.int64)
+        return np.arange(self.length - 3 - offset, -1, -3, dtype=np.int64)
+
+    def translate_frame(self, frame):
+        positions = self.codon_positions(frame)
+        indices = self.forward if frame > 0 else self.reverse
+        amino_acids = AMINO_ACIDS[indices[positions]]
+        amino_acids[self.unknown[positions]] = UNKNOWN
+        return positions, amino_acids
+
+
+# ORFs of one translated frame: the first start codon after each stop codon
+# up to and including that stop, at least min_length amino acids long
+def find_orfs(amino_acids, positions, frame, min_length=DEFAULT_MIN_ORF_LENGTH):
+    starts = np.flatnonzero(amino_acids == START)
+    stops = np.flatnonzero(amino_acids == STOP)
+    if not len(starts) or not len(stops):
+        return []
+    next_stop = np.searchsorted(stops, starts)
+    closed = next_stop < len(stops)
+    starts, next_stop = starts[closed], stops[next_stop[closed]]
+    # starts are sorted, so the first occurrence of each stop is its longest ORF
+    next_stop, first = np.unique(next_stop, return_index=True)
+    starts = starts[first]
+    keep = next_stop - starts >= min_length
+    orfs = []
+    for start, stop in zip(starts[keep], next_stop[keep]):
+        if frame > 0:
+            begin, end = int(positions[start]), int(positions[stop]) + 3
+        else:
+            begin, end = int(positions[stop]), int(positions[start]) + 3
+        orfs.append({
+            "frame": frame_name(frame),
+            "strand": "+" if frame > 0 else "-",
+            "start": begin,
+            "end": end,
+            "length": int(stop - start),
+            "protein": amino_acids[start:stop].tobytes().decode('ascii'),
+        })
+    return orfs
+
+
+# Translate the requested frames and optionally collect their ORFs. ORF
+# coordinates are 0-based, end-exclusive positions on the forward strand.
+def translate_frames(sequence, frames=ALL_FRAMES, orfs=False, min_orf_length=DEFAULT_MIN_ORF_LENGTH):
+    for frame in frames:
+        if frame not in ALL_FRAMES:
+            raise ValueError(f"Invalid frame {frame}; frames must be one of 1, 2, 3, -1, -2, -3.")
+    index = CodonIndex(sequence)
+    result = {"frames": {}}
+    if orfs:
+        result["orfs"] = []
+    for frame in frames:
+        positions, amino_acids = index.translate_frame(frame)
+        result["frames"][frame_name(frame)] = amino_acids.tobytes().decode('ascii')
+        if orfs:
+            result["orfs"].extend(find_orfs(amino_acids, positions, frame, min_orf_length))
+    return result
+
+
+# Codon-pair classification, precomputed for all 64 x 64 pairs: a change is
+# nonsense if the user codon is a stop, missense if the amino acid changes and
+# silent otherwise
+MUTATION_TYPES = ("silent", "missense", "nonsense")
+_SILENT, _MISSENSE, _NONSENSE = range(3)
+PAIR_TYPES = np.where(
+    AMINO_ACIDS[np.newaxis, :] == STOP, _NONSENSE,
+    np.where(AMINO_ACIDS[:, np.newaxis] != AMINO_ACIDS[np.newaxis, :], _MISSENSE, _SILENT)
+).astype(np.uint8)
+
+
+# Frame-1 codon indices and their non-ACGT flags
+def frame_codons(sequence):
+    encoded = encode(sequence)
+    usable = len(encoded) - len(encoded) % 3
+    codes = encoded.codes(0, usable).reshape(-1, 3)
+    indices = (codes[:, 0] << 4) | (codes[:, 1] << 2) | codes[:, 2]
+    unknown = encoded.mask[:usable].reshape(-1, 3).any(axis=1)
+    return indices, unknown
+
+
+# Codons containing non-ACGT bases are outside the table; Biopython handles
+# their ambiguity codes, and anything it cannot translate (gaps, stray
+# characters) is X, as in CodonIndex
+def _translate_codon(codon):
+    from Bio.Data.CodonTable import TranslationError
+    from Bio.Seq import Seq
+    try:
+        return str(Seq(codon).translate())
+    except TranslationError:
+        return chr(UNKNOWN)
+
+
+def _classify_codon(ref_aa, user_aa):
+    return (
+        "nonsense" if user_aa == "*" else
+        "missense" if ref_aa != user_aa else
+        "silent"
+    )
+
+
+# Differing frame-1 codons of two equal-length sequences, classified with
+# the pair table. Returns the per-type counts and a generator of the
+# classified codons in position order.
+def classify_codon_changes(reference_sequence, user_sequence):
+    if len(reference_sequence) != len(user_sequence):
+        raise ValueError("Sequences must be of the same length for mutation classification.")
+    ref_indices, ref_unknown = frame_codons(reference_sequence)
+    user_indices, user_unknown = frame_codons(user_sequence)
+    usable = len(ref_indices) * 3
+    ref_bytes = as_bytes(reference_sequence)[:usable].reshape(-1, 3)
+    user_bytes = as_bytes(user_sequence)[:usable].reshape(-1, 3)
+    changed = np.flatnonzero((ref_bytes != user_bytes).any(axis=1))
+
+    unknown = ref_unknown[changed] | user_unknown[changed]
+    types = PAIR_TYPES[ref_indices[changed], user_indices[changed]]
+    counts = np.bincount(types[~unknown], minlength=len(MUTATION_TYPES))
+    counts = dict(zip(MUTATION_TYPES, counts.tolist()))
+
+    fallbacks = {}
+    for codon in changed[unknown].tolist():
+        position = codon * 3
+        ref_aa = _translate_codon(reference_sequence[position:position + 3])
+        user_aa = _translate_codon(user_sequence[position:position + 3])
+        fallbacks[codon] = (ref_aa, user_aa, _classify_codon(ref_aa, user_aa))
+        counts[fallbacks[codon][2]] += 1
+
+    def classified():
+        for codon, ref_index, user_index, codon_type in zip(
+            changed.tolist(), ref_indices[changed].tolist(), user_indices[changed].tolist(), types.tolist()
+        ):
+            if codon in fallbacks:
+                ref_aa, user_aa, mutation_type = fallbacks[codon]
+            else:
+                ref_aa, user_aa = chr(AMINO_ACIDS[ref_index]), chr(AMINO_ACIDS[user_index])
+                mutation_type = MUTATION_TYPES[codon_type]
+            position = codon * 3
+            yield {
+                "position": position,
+                "ref_codon": reference_sequence[position:position + 3],
+                "user_codon": user_sequence[position:position + 3],
+                "ref_aa": ref_aa,
+                "user_aa": user_aa,
+                "type": mutation_type,
+            }
+
+    return counts, classified()
@@ -1,9 +1,9 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
-from .views import register_user, login_user, protected_view
+from .views import register_user, login_user, logout_user, protected_view
 from rest_framework_simplejwt.views import TokenRefreshView
 
 
@@ -26,11 +26,42 @@ urlpatterns = [
     path('gc-content-graph/', views.gc_content_graph_view, name='gc_content_graph'),
     path('protein-translation/', views.protein_translation_view, name='protein_translation'),
     path('mutation-detection/', views.mutation_detection_view, name='mutation_detection'),
+    path('mutation-classification/', views.mutation_classification_view, name='mutation_classification'),
     path('validate-sequence/', views.sequence_validation_view, name='sequence_validation'),
     path('generate-report/', views.generate_report_view, name='generate_report'),  # New PDF Report Endpoint
     path('interactive-gc-content/', views.interactive_gc_content_view, name='interactive_gc_content'),  # New Interactive Graph Endpoint
+    path('kmers/', views.kmer_spectrum_view, name='kmer_spectrum'),
+    path('motifs/', views.motif_search_view, name='motif_search'),
+    path('async/reverse-complement/', async_views.reverse_complement_view, name='async_reverse_complement'),
+    path('async/gc-content-graph/', async_views.gc_content_graph_view, name='async_gc_content_graph'),
+    path('async/protein-translation/', async_views.protein_translation_view, name='async_protein_translation'),
+    path('async/mutation-detection/', async_views.mutation_detection_view, name='async_mutation_detection'),
+    path('async/mutation-classification/', async_views.mutation_classification_view,
+         name='async_mutation_classification'),
+    path('async/validate-sequence/', async_views.sequence_validation_view, name='async_sequence_validation'),
+    path('async/generate-report/', async_views.generate_report_view, name='async_generate_report'),
+    path('async/interactive-gc-content/', async_views.interactive_gc_content_view,
+         name='async_interactive_gc_content'),
+    path('async/kmers/', async_views.kmer_spectrum_view, name='async_kmer_spectrum'),
+    path('upload/', views.upload_sequence_view, name='upload_sequence'),
+    path('upload/raw/', views.upload_raw_sequence_view, name='upload_raw_sequence'),
+    path('analysis/', views.full_analysis_view, name='full_analysis'),
+    path('analyses/<int:analysis_id>/', views.analysis_detail_view, name='analysis_detail'),
+    path('analyses/<int:analysis_id>/sequence/', views.analysis_sequence_view, name='analysis_sequence'),
+    path('mutations/', views.mutation_query_view, name='mutation_query'),
+    path('mutations/samples/', views.mutation_samples_view, name='mutation_samples'),
+    path('references/', views.reference_list_view, name='reference_list'),
+    path('references/<slug:name>/', views.reference_detail_view, name='reference_detail'),
+    path('references/<slug:name>/sequence/', views.reference_region_view, name='reference_region'),
+    path('batch/', views.batch_analysis_view, name='batch_analysis'),
+    path('cache-stats/', views.cache_stats_view, name='cache_stats'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('jobs/', views.submit_job_view, name='submit_job'),
+    path('jobs/<uuid:job_id>/', views.job_status_view, name='job_status'),
+    path('jobs/<uuid:job_id>/result/', views.job_result_view, name='job_result'),
       path('register/', register_user, name='register'),
     path('login/', login_user, name='login'),
+    path('logout/', logout_user, name='logout'),
     path('protected/', protected_view, name='protected'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='swagger-doc'),
@@ -1,157 +1,104 @@
-import matplotlib.pyplot as plt
-import io
 import base64
-import plotly.graph_objects as go
-from Bio.Seq import Seq
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-import tempfile
+from .charts import render_gc_content_png
+from .downsample import DEFAULT_POINTS, gc_pyramids
+from .kernel import encode
+from .metrics import stage
+from .gc_profile import DEFAULT_WINDOW, gc_profiles
+from .mutations import iter_mutations
+from .translation import (
+    ALL_FRAMES, DEFAULT_MIN_ORF_LENGTH, UNKNOWN, CodonIndex, classify_codon_changes, translate_frames
+)
 
 # Reverse complement function
 def reverse_complement(sequence):
-    complement = {'A': 'T', 'T': 'A', 'C': 'G', 'G': 'C'}
-    return ''.join(complement[base] for base in reversed(sequence))
+    with stage("reverse_complement", "compute", len(sequence)):
+        return encode(sequence).reverse_complement().to_string()
+
+# Complement function
+def complement(sequence):
+    return encode(sequence).complement().to_string()
+
+# Per-base counts
+def base_counts(sequence):
+    return encode(sequence).base_counts()
 
 # GC Content function
 def gc_content(sequence):
-    gc_count = sum(1 for base in sequence if base in 'GC')
+    counts = base_counts(sequence)
+    gc_count = counts['G'] + counts['C']
     return (gc_count / len(sequence)) * 100
 
 # GC Content Graph function using Matplotlib
-def visualize_gc_content_graph(sequence):
-    gc_percentage = gc_content(sequence)
-    
-    # Create a bar plot of GC content
-    plt.bar(['GC Content'], [gc_percentage])
-    plt.ylabel("Percentage")
-    plt.title("GC Content Analysis")
-    
-    # Save the plot to a BytesIO object
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    img_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-    plt.close()  # Close the plot to free memory
-    
-    return img_base64
-
-# Translate DNA sequence to protein
+def gc_content_graph_png(sequence, windows=(DEFAULT_WINDOW,), step=None, start=0, end=None):
+    with stage("gc_content_graph", "compute", len(sequence)):
+        profiles = gc_profiles(sequence, windows, step, start, end)
+    with stage("gc_content_graph", "render", len(sequence)):
+        return render_gc_content_png(profiles)
+
+# Base64-encoded PNG of the GC content graph
+def visualize_gc_content_graph(sequence, windows=(DEFAULT_WINDOW,), step=None, start=0, end=None):
+    png = gc_content_graph_png(sequence, windows, step, start, end)
+    return base64.b64encode(png).decode('utf-8')
+
+# Translate DNA sequence to protein (forward frame 1, skipping codons with non-ACGT bases)
 def translate_sequence(sequence):
-    codon_table = {
-        'ATA': 'I', 'ATC': 'I', 'ATT': 'I', 'ATG': 'M',
-        'ACA': 'T', 'ACC': 'T', 'ACG': 'T', 'ACT': 'T',
-        'AAC': 'N', 'AAT': 'N', 'AAA': 'K', 'AAG': 'K',
-        'AGC': 'S', 'AGT': 'S', 'AGA': 'R', 'AGG': 'R',
-        'CTA': 'L', 'CTC': 'L', 'CTG': 'L', 'CTT': 'L',
-        'CCA': 'P', 'CCC': 'P', 'CCG': 'P', 'CCT': 'P',
-        'CAC': 'H', 'CAT': 'H', 'CAA': 'Q', 'CAG': 'Q',
-        'CGA': 'R', 'CGC': 'R', 'CGG': 'R', 'CGT': 'R',
-        'GTA': 'V', 'GTC': 'V', 'GTG': 'V', 'GTT': 'V',
-        'GCA': 'A', 'GCC': 'A', 'GCG': 'A', 'GCT': 'A',
-        'GAC': 'D', 'GAT': 'D', 'GAA': 'E', 'GAG': 'E',
-        'GGA': 'G', 'GGC': 'G', 'GGG': 'G', 'GGT': 'G',
-        'TCA': 'S', 'TCC': 'S', 'TCG': 'S', 'TCT': 'S',
-        'TTC': 'F', 'TTT': 'F', 'TTA': 'L', 'TTG': 'L',
-        'TAC': 'Y', 'TAT': 'Y', 'TAA': '*', 'TAG': '*',
-        'TGC': 'C', 'TGT': 'C', 'TGA': '*', 'TGG': 'W',
-    }
-    
-    protein_sequence = ""
-    for i in range(0, len(sequence), 3):
-        codon = sequence[i:i+3]
-        if codon in codon_table:
-            protein_sequence += codon_table[codon]
-    return protein_sequence
+    with stage("translate_sequence", "compute", len(sequence)):
+        positions, amino_acids = CodonIndex(sequence).translate_frame(1)
+    return amino_acids[amino_acids != UNKNOWN].tobytes().decode('ascii')
 
-# Detect mutations between reference and user sequences
-def detect_mutations(reference_sequence, user_sequence):
-    if len(reference_sequence) != len(user_sequence):
-        raise ValueError("Sequences must be of the same length for mutation detection.")
+# Translate several reading frames and optionally find their ORFs
+def six_frame_translation(sequence, frames=ALL_FRAMES, orfs=False, min_orf_length=DEFAULT_MIN_ORF_LENGTH):
+    with stage("six_frame_translation", "compute", len(sequence)):
+        return translate_frames(sequence, frames, orfs, min_orf_length)
 
-    mutations = []
-    for i in range(len(reference_sequence)):
-        if reference_sequence[i] != user_sequence[i]:
-            mutations.append({
-                "position": i,
-                "reference_base": reference_sequence[i],
-                "user_base": user_sequence[i],
-                "mutation_type": "substitution"  # Expand to other mutation types if needed
-            })
-    return mutations
+# Detect mutations between reference and user sequences
+def detect_mutations(reference_sequence, user_sequence, collapse_runs=False):
+    with stage("detect_mutations", "compute", len(reference_sequence)):
+        return list(iter_mutations(reference_sequence, user_sequence, collapse_runs))
 
 # Enhanced Mutation Classification
 def classify_mutations(reference_sequence, user_sequence):
-    if len(reference_sequence) != len(user_sequence):
-        raise ValueError("Sequences must be of the same length for mutation classification.")
-
-    mutations = []
-    for i in range(0, len(reference_sequence), 3):
-        ref_codon = reference_sequence[i:i + 3]
-        user_codon = user_sequence[i:i + 3]
-        if len(ref_codon) < 3 or len(user_codon) < 3:
-            break
-
-        if ref_codon != user_codon:
-            ref_aa = str(Seq(ref_codon).translate())
-            user_aa = str(Seq(user_codon).translate())
-
-            mutation_type = (
-                "nonsense" if user_aa == "*" else
-                "missense" if ref_aa != user_aa else
-                "silent"
-            )
-
-            mutations.append({
-                "position": i,
-                "ref_codon": ref_codon,
-                "user_codon": user_codon,
-                "ref_aa": ref_aa,
-                "user_aa": user_aa,
-                "type": mutation_type
-            })
-
-    return mutations
+    with stage("classify_mutations", "compute", len(reference_sequence)):
+        counts, mutations = classify_codon_changes(reference_sequence, user_sequence)
+        return list(mutations)
 
 # Validate DNA sequence (Only A, T, C, G)
 def validate_sequence(sequence):
-    valid_bases = {'A', 'T', 'C', 'G'}
-    return all(base in valid_bases for base in sequence)
-
-# Generate PDF Report
-def generate_pdf_report(results, filename="DNA_Analysis_Report.pdf"):
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-    file_path = temp_file.name
-
-    c = canvas.Canvas(file_path, pagesize=letter)
-    c.setFont("Helvetica", 12)
-    c.drawString(50, 750, "DNA Analysis Report")
-    c.setFont("Helvetica-Bold", 10)
-
-    # Add analysis results
-    y = 730
-    for key, value in results.items():
-        c.drawString(50, y, f"{key}:")
-        if isinstance(value, list):
-            for item in value:
-                c.drawString(70, y - 15, str(item))
-                y -= 15
-        else:
-            c.drawString(70, y - 15, str(value))
-            y -= 15
-        y -= 20
-
-    c.save()
-    return file_path
-
-# Interactive GC Content Graph using Plotly
-def interactive_gc_content_graph(sequence):
-    gc_percentage = gc_content(sequence)
-
-    # Create an interactive bar plot
-    fig = go.Figure(data=[
-        go.Bar(name="GC Content", x=["GC Content"], y=[gc_percentage])
-    ])
-    fig.update_layout(title="GC Content Analysis", yaxis_title="Percentage", xaxis_title="Category")
-
-    # Convert the figure to JSON for frontend rendering
-    return fig.to_json()
+    with stage("validate_sequence", "compute", len(sequence)):
+        try:
+            return encode(sequence).is_valid()
+        except ValueError:
+            return False
+
+# Interactive GC Content Graph using Plotly. Windows are laid over the
+# whole sequence and start/end select the zoom range, so every zoom level
+# is served from the same cached pyramids, with at most `points` points per trace.
+def interactive_gc_content_graph(sequence, windows=(DEFAULT_WINDOW,), step=None, start=0, end=None,
+                                 points=DEFAULT_POINTS):
+    import plotly.graph_objects as go
+
+    end = len(sequence) if end is None else end
+    if not 0 <= start < end <= len(sequence):
+        raise ValueError(f"Region {start}-{end} is outside the sequence (length {len(sequence)}).")
+    with stage("interactive_gc_content_graph", "compute", len(sequence)):
+        traces = [
+            (window, pyramid["gc_content"].query(start, end, points), pyramid["gc_skew"].query(start, end, points))
+            for window, pyramid in gc_pyramids(sequence, windows, step).items()
+        ]
+
+    # Create an interactive line plot with one GC content and one GC skew trace per window size
+    with stage("interactive_gc_content_graph", "render", len(sequence)):
+        fig = go.Figure()
+        for window, (gc_x, gc_y), (skew_x, skew_y) in traces:
+            fig.add_trace(go.Scatter(name=f"GC Content ({window} bp)", x=gc_x, y=gc_y, mode="lines"))
+            fig.add_trace(go.Scatter(name=f"GC Skew ({window} bp)", x=skew_x, y=skew_y, mode="lines", yaxis="y2"))
+        fig.update_layout(
+            title="GC Content Analysis",
+            xaxis_title="Position",
+            xaxis=dict(range=[start, end]),
+            yaxis_title="Percentage",
+            yaxis2=dict(title="GC Skew", overlaying="y", side="right", range=[-1, 1]),
+        )
+
+        # Convert the figure to JSON for frontend rendering
+        return fig.to_json()
@@ -0,0 +1,113 @@
+from itertools import islice
+
+from django.db.models import Count, Max, Min, Q
+
+from .models import ALLELE_INDEX_LENGTH, Mutation
+
+# Normalized mutation rows.
+#
+# Every saved analysis also writes its mutations as Mutation rows, in
+# bulk_create batches so a large variant list is never held as model
+# instances all at once. Queries filter on the indexed columns and page with
+# a (position, id) cursor instead of OFFSET, so their cost depends on the
+# page size rather than on how many variants are stored. Alleles longer than
+# the indexed column are split into base and tail (see Mutation) here and
+# joined again when rows are read.
+
+MUTATION_BATCH_SIZE = 1000
+DEFAULT_MUTATION_LIMIT = 1000
+MAX_MUTATION_LIMIT = 10000
+
+
+def split_allele(bases):
+    return bases[:ALLELE_INDEX_LENGTH], bases[ALLELE_INDEX_LENGTH:]
+
+
+def mutation_rows(analysis, mutations):
+    for mutation in mutations:
+        reference_base, reference_tail = split_allele(mutation["reference_base"])
+        user_base, user_tail = split_allele(mutation["user_base"])
+        yield Mutation(
+            analysis=analysis,
+            position=mutation["position"],
+            user_position=mutation.get("user_position"),
+            reference_base=reference_base,
+            reference_tail=reference_tail,
+            user_base=user_base,
+            user_tail=user_tail,
+            mutation_type=mutation["mutation_type"],
+        )
+
+
+def store_mutations(analysis, mutations, batch_size=MUTATION_BATCH_SIZE):
+    rows = mutation_rows(analysis, mutations)
+    stored = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return stored
+        Mutation.objects.bulk_create(batch, batch_size=batch_size)
+        stored += len(batch)
+
+
+def filter_mutations(start=None, end=None, mutation_type=None, reference_base=None, user_base=None, analyses=None):
+    mutations = Mutation.objects.all()
+    if start is not None:
+        mutations = mutations.filter(position__gte=start)
+    if end is not None:
+        mutations = mutations.filter(position__lt=end)
+    if mutation_type is not None:
+        mutations = mutations.filter(mutation_type=mutation_type)
+    if reference_base is not None:
+        base, tail = split_allele(reference_base)
+        mutations = mutations.filter(reference_base=base, reference_tail=tail)
+    if user_base is not None:
+        base, tail = split_allele(user_base)
+        mutations = mutations.filter(user_base=base, user_tail=tail)
+    if analyses is not None:
+        mutations = mutations.filter(analysis_id__in=analyses)
+    return mutations
+
+
+def parse_cursor(cursor):
+    try:
+        position, pk = (int(part) for part in cursor.split(":"))
+    except (AttributeError, ValueError):
+        raise ValueError("Cursor must be of the form '<position>:<id>'.")
+    return position, pk
+
+
+# One page of mutations in (position, id) order, and the cursor of the next
+# page (None on the last one)
+def mutation_page(mutations, cursor=None, limit=DEFAULT_MUTATION_LIMIT):
+    limit = max(1, min(limit, MAX_MUTATION_LIMIT))
+    if cursor:
+        position, pk = parse_cursor(cursor)
+        mutations = mutations.filter(Q(position__gt=position) | Q(position=position, id__gt=pk))
+    rows = list(
+        mutations.order_by("position", "id").values(
+            "id", "analysis_id", "position", "user_position", "reference_base", "reference_tail",
+            "user_base", "user_tail", "mutation_type",
+        )[:limit + 1]
+    )
+    for row in rows:
+        row["reference_base"] += row.pop("reference_tail")
+        row["user_base"] += row.pop("user_tail")
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1]['position']}:{rows[-1]['id']}"
+    return rows, next_cursor
+
+
+# Analyses having at least one of the mutations, with how many and where,
+# in analysis ID order starting after the `after` ID
+def samples_with_mutations(mutations, after=None, limit=DEFAULT_MUTATION_LIMIT):
+    limit = max(1, min(limit, MAX_MUTATION_LIMIT))
+    if after is not None:
+        mutations = mutations.filter(analysis_id__gt=after)
+    return list(
+        mutations.values("analysis_id")
+        .annotate(mutation_count=Count("id"), first_position=Min("position"), last_position=Max("position"))
+        .order_by("analysis_id")[:limit]
+    )
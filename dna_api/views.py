@@ -1,19 +1,117 @@
-from rest_framework.decorators import api_view , permission_classes
+from rest_framework.decorators import api_view , permission_classes, parser_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework import status
-from django.contrib.auth.models import User
+from django.contrib.auth import authenticate
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from .models import DNAAnalysis
 from .serializers import DNAAnalysisSerializer , UserSerializer
 from .utils import (
-    reverse_complement, visualize_gc_content_graph, translate_sequence,
-    detect_mutations, validate_sequence, interactive_gc_content_graph,
-    generate_pdf_report, gc_content
+    reverse_complement, gc_content_graph_png, translate_sequence,
+    validate_sequence, interactive_gc_content_graph,
+    gc_content, six_frame_translation
 )
-from django.http import FileResponse
+from .gc_profile import DEFAULT_WINDOW
+from .downsample import DEFAULT_POINTS, MAX_POINTS
+from .translation import ALL_FRAMES, DEFAULT_MIN_ORF_LENGTH, MUTATION_TYPES, classify_codon_changes
+from .mutations import DETECTION_MODES, OUTPUT_FORMATS, iter_mutations, ndjson_mutations, vcf_mutations
+from .alignment import DEFAULT_BAND, collapse_substitution_runs, iter_aligned_variants
+from .analysis import analyze_sequence, save_sequence_analysis
+from .batch import BATCH_OPERATIONS, parse_batch_operations, run_batch
+from .cache import cached_result, get_result_cache
+from .metrics import METRICS_CONTENT_TYPE, render_metrics
+from .admission import admission, batch_size
+from .jobs import DEFAULT_PAGE_SIZE, JOB_OPERATIONS, result_page, submit_job
+from .options import parse_flag
+from .models import AnalysisJob, Mutation, ReferenceGenome
+from .report import PDF_CONTENT_TYPE, pdf_report_file
+from .variants import (
+    DEFAULT_MUTATION_LIMIT, MAX_MUTATION_LIMIT, filter_mutations, mutation_page, samples_with_mutations
+)
+from .kmers import DEFAULT_K, DEFAULT_TOP, MAX_K, kmer_spectrum
+from .references import delete_reference, get_reference, reference_region, register_reference
+from .motifs import (
+    DEFAULT_HIT_LIMIT, MAX_HIT_LIMIT, MAX_MISMATCHES, STRANDS, reference_hit_page, sequence_hit_page
+)
+from .ingest import RecordAnalysis, analyze_stream, ndjson_lines, parse_operations
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+import base64
+import io
+
+GRAPH_FORMATS = ("json", "png")
+
+# Window / region parameters shared by the GC content graph views
+gc_window_properties = {
+    "window": openapi.Schema(
+        type=openapi.TYPE_ARRAY,
+        items=openapi.Schema(type=openapi.TYPE_INTEGER),
+        description=f"Window size(s) in bases; a single integer is also accepted (default {DEFAULT_WINDOW})"
+    ),
+    "step": openapi.Schema(
+        type=openapi.TYPE_INTEGER,
+        description="Distance between window starts (defaults to the window size)"
+    ),
+    "start": openapi.Schema(
+        type=openapi.TYPE_INTEGER,
+        description="Start of the region to profile (0-based, inclusive)"
+    ),
+    "end": openapi.Schema(
+        type=openapi.TYPE_INTEGER,
+        description="End of the region to profile (0-based, exclusive; defaults to the sequence length)"
+    ),
+}
+
+
+# A registered reference genome in place of an inline sequence
+reference_properties = {
+    "reference": openapi.Schema(
+        type=openapi.TYPE_STRING,
+        description="Name of a registered reference genome to read the sequence from"
+    ),
+    "region": openapi.Schema(
+        type=openapi.TYPE_STRING,
+        description='Region of the reference, "name" or "name:start-end" (1-based, inclusive)'
+    ),
+}
+
+
+# The sequence given inline under `field`, or the requested region of a
+# registered reference
+def request_sequence(data, field="sequence"):
+    if data.get("reference"):
+        return reference_region(data["reference"], data.get("region"))
+    return data.get(field, "")
+
+
+def parse_gc_window_params(data):
+    windows = data.get("window", DEFAULT_WINDOW)
+    if not isinstance(windows, list):
+        windows = [windows]
+    if not windows:
+        raise ValueError("At least one window size is required.")
+    step = data.get("step")
+    end = data.get("end")
+    try:
+        return {
+            "windows": [int(window) for window in windows],
+            "step": None if step is None else int(step),
+            "start": int(data.get("start", 0)),
+            "end": None if end is None else int(end),
+        }
+    except (TypeError, ValueError):
+        raise ValueError("Window, step, start and end must be integers.")
+
+
+def parse_frames(frames):
+    if frames is None or frames == "all":
+        return ALL_FRAMES
+    if not isinstance(frames, list):
+        frames = [frames]
+    return [int(frame) for frame in frames]
 
 # Reverse Complement View
 @swagger_auto_schema(
@@ -44,12 +142,13 @@ from django.http import FileResponse
     }
 )
 @api_view(["POST"])
+@admission("reverse_complement")
 def reverse_complement_view(request):
     sequence = request.data.get("sequence", "")
     if not sequence:
         return Response({"error": "DNA sequence is required."}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        rev_comp_sequence = reverse_complement(sequence)
+        rev_comp_sequence = cached_result("reverse_complement", {}, [sequence], lambda: reverse_complement(sequence))
         return Response({"reverse_complement": rev_comp_sequence}, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -58,16 +157,25 @@ def reverse_complement_view(request):
 @swagger_auto_schema(
     method='post',
     operation_summary="Visualize GC Content Graph",
-    operation_description="Generates a graph showing the GC content distribution of the given DNA sequence.",
+    operation_description=(
+        "Generates a graph of the sliding-window GC content and GC skew of the given DNA sequence, "
+        "either base64-encoded inside JSON or as a PNG image."
+    ),
     request_body=openapi.Schema(
         type=openapi.TYPE_OBJECT,
         properties={
             "sequence": openapi.Schema(
                 type=openapi.TYPE_STRING,
-                description="DNA sequence (string of A, T, C, G)"
+                description="DNA sequence (string of A, T, C, G); or use reference and region"
+            ),
+            **reference_properties,
+            **gc_window_properties,
+            "format": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                enum=list(GRAPH_FORMATS),
+                description="json (default, base64 PNG inside JSON) or png (the image itself)"
             )
         },
-        required=["sequence"]
     ),
     responses={
         200: openapi.Schema(
@@ -83,13 +191,25 @@ def reverse_complement_view(request):
     }
 )
 @api_view(["POST"])
+@admission("gc_content_graph", reads_references=True)
 def gc_content_graph_view(request):
-    sequence = request.data.get("sequence", "")
+    try:
+        sequence = request_sequence(request.data)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     if not sequence:
         return Response({"error": "DNA sequence is required."}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        graph_image = visualize_gc_content_graph(sequence)
-        return Response({"gc_content_graph": graph_image}, status=status.HTTP_200_OK)
+        graph_format = request.data.get("format", "json")
+        if graph_format not in GRAPH_FORMATS:
+            raise ValueError(f"Format must be one of {', '.join(GRAPH_FORMATS)}.")
+        params = parse_gc_window_params(request.data)
+        png = cached_result("gc_content_graph", params, [sequence], lambda: gc_content_graph_png(sequence, **params))
+        if graph_format == "png":
+            return HttpResponse(png, content_type="image/png")
+        return Response({"gc_content_graph": base64.b64encode(png).decode("utf-8")}, status=status.HTTP_200_OK)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -97,16 +217,32 @@ def gc_content_graph_view(request):
 @swagger_auto_schema(
     method='post',
     operation_summary="Translate DNA to Protein",
-    operation_description="Translates a given DNA sequence into its corresponding protein sequence.",
+    operation_description=(
+        "Translates a given DNA sequence into its corresponding protein sequence. "
+        "Optionally translates any of the six reading frames and finds open reading frames (ORFs)."
+    ),
     request_body=openapi.Schema(
         type=openapi.TYPE_OBJECT,
         properties={
             "sequence": openapi.Schema(
                 type=openapi.TYPE_STRING,
-                description="DNA sequence (string of A, T, C, G)"
+                description="DNA sequence (string of A, T, C, G); or use reference and region"
+            ),
+            **reference_properties,
+            "frames": openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                description='Reading frames to translate (1, 2, 3 forward; -1, -2, -3 reverse) or "all"'
+            ),
+            "orfs": openapi.Schema(
+                type=openapi.TYPE_BOOLEAN,
+                description="Return the ORFs found in the translated frames (all six if frames is omitted)"
+            ),
+            "min_orf_length": openapi.Schema(
+                type=openapi.TYPE_INTEGER,
+                description=f"Minimum ORF length in amino acids (default {DEFAULT_MIN_ORF_LENGTH})"
             )
         },
-        required=["sequence"]
     ),
     responses={
         200: openapi.Schema(
@@ -114,7 +250,16 @@ def gc_content_graph_view(request):
             properties={
                 "protein_sequence": openapi.Schema(
                     type=openapi.TYPE_STRING,
-                    description="The translated protein sequence"
+                    description="The translated protein sequence (frame 1, when neither frames nor orfs is given)"
+                ),
+                "frames": openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    description='Protein sequence per requested frame, keyed "+1" ... "-3"; X marks codons with non-ACGT bases'
+                ),
+                "orfs": openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_OBJECT),
+                    description="ORFs with frame, strand, 0-based forward-strand start/end, length and protein"
                 )
             }
         ),
@@ -122,13 +267,33 @@ def gc_content_graph_view(request):
     }
 )
 @api_view(["POST"])
+@admission("protein_translation", reads_references=True)
 def protein_translation_view(request):
-    sequence = request.data.get("sequence", "")
+    try:
+        sequence = request_sequence(request.data)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     if not sequence:
         return Response({"error": "DNA sequence is required."}, status=status.HTTP_400_BAD_REQUEST)
+    frames = request.data.get("frames")
     try:
-        protein_sequence = translate_sequence(sequence)
-        return Response({"protein_sequence": protein_sequence}, status=status.HTTP_200_OK)
+        find_orfs = parse_flag(request.data.get("orfs"), "orfs")
+        if frames is None and not find_orfs:
+            protein_sequence = cached_result("translation", {}, [sequence], lambda: translate_sequence(sequence))
+            return Response({"protein_sequence": protein_sequence}, status=status.HTTP_200_OK)
+        params = {
+            "frames": parse_frames(frames),
+            "orfs": find_orfs,
+            "min_orf_length": int(request.data.get("min_orf_length", DEFAULT_MIN_ORF_LENGTH)),
+        }
+        result = cached_result(
+            "six_frame_translation", params, [sequence], lambda: six_frame_translation(sequence, **params)
+        )
+        if frames is None:
+            del result["frames"]
+        return Response(result, status=status.HTTP_200_OK)
+    except (TypeError, ValueError) as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -136,20 +301,48 @@ def protein_translation_view(request):
 @swagger_auto_schema(
     method='post',
     operation_summary="Detect DNA Mutations",
-    operation_description="Detects mutations between a reference DNA sequence and a user-provided sequence.",
+    operation_description=(
+        "Detects mutations between a reference DNA sequence and a user-provided sequence. "
+        "The default direct mode compares equal-length sequences base by base; alignment mode "
+        "aligns sequences of any length and also reports insertions and deletions. "
+        "Results can be streamed as NDJSON or VCF-style text instead of a single JSON list."
+    ),
     request_body=openapi.Schema(
         type=openapi.TYPE_OBJECT,
         properties={
             "reference_sequence": openapi.Schema(
                 type=openapi.TYPE_STRING,
-                description="Reference DNA sequence"
+                description="Reference DNA sequence; or use reference and region"
             ),
+            **reference_properties,
             "user_sequence": openapi.Schema(
                 type=openapi.TYPE_STRING,
                 description="User-provided DNA sequence"
+            ),
+            "mode": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                enum=list(DETECTION_MODES),
+                description="direct (default, equal lengths, substitutions only) or alignment (substitutions and indels)"
+            ),
+            "band": openapi.Schema(
+                type=openapi.TYPE_INTEGER,
+                description=f"Alignment band width in bases around the expected diagonal (default {DEFAULT_BAND})"
+            ),
+            "collapse_runs": openapi.Schema(
+                type=openapi.TYPE_BOOLEAN,
+                description="Report runs of adjacent substitutions as one multi-nucleotide variant (mnv)"
+            ),
+            "format": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                enum=list(OUTPUT_FORMATS),
+                description="json (default), ndjson (one mutation per line) or vcf (VCF-style text)"
+            ),
+            "chrom": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description='CHROM column for vcf output (default "sequence")'
             )
         },
-        required=["reference_sequence", "user_sequence"]
+        required=["user_sequence"]
     ),
     responses={
         200: openapi.Schema(
@@ -166,14 +359,110 @@ def protein_translation_view(request):
     }
 )
 @api_view(["POST"])
+@admission("mutation_detection", reads_references=True)
 def mutation_detection_view(request):
+    try:
+        reference_sequence = request_sequence(request.data, "reference_sequence")
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    user_sequence = request.data.get("user_sequence", "")
+    if not reference_sequence or not user_sequence:
+        return Response({"error": "Both reference and user sequences are required."}, status=status.HTTP_400_BAD_REQUEST)
+    output_format = request.data.get("format", "json")
+    if output_format not in OUTPUT_FORMATS:
+        return Response({"error": f"Format must be one of {', '.join(OUTPUT_FORMATS)}."}, status=status.HTTP_400_BAD_REQUEST)
+    mode = request.data.get("mode", "direct")
+    if mode not in DETECTION_MODES:
+        return Response({"error": f"Mode must be one of {', '.join(DETECTION_MODES)}."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        collapse_runs = parse_flag(request.data.get("collapse_runs"), "collapse_runs")
+        if mode == "alignment":
+            band = int(request.data.get("band", DEFAULT_BAND))
+            mutations = iter_aligned_variants(reference_sequence, user_sequence, band)
+            if collapse_runs:
+                mutations = collapse_substitution_runs(mutations)
+        else:
+            mutations = iter_mutations(reference_sequence, user_sequence, collapse_runs)
+    except (TypeError, ValueError) as e:
+        message = str(e)
+        if mode == "direct" and len(reference_sequence) != len(user_sequence):
+            message += ' Use "mode": "alignment" for sequences with insertions or deletions.'
+        return Response({"error": message}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        if output_format == "ndjson":
+            return StreamingHttpResponse(ndjson_mutations(mutations), content_type="application/x-ndjson")
+        if output_format == "vcf":
+            chrom = request.data.get("chrom", "sequence")
+            return StreamingHttpResponse(
+                vcf_mutations(mutations, chrom, reference_sequence), content_type="text/tab-separated-values"
+            )
+        return Response({"mutations": list(mutations)}, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# Mutation Classification View
+@swagger_auto_schema(
+    method='post',
+    operation_summary="Classify DNA Mutations",
+    operation_description=(
+        "Compares the codons (reading frame 1) of a reference and a user sequence of equal length and "
+        "classifies every changed codon as silent, missense or nonsense."
+    ),
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "reference_sequence": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description="Reference DNA sequence"
+            ),
+            "user_sequence": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description="User-provided DNA sequence"
+            ),
+            "format": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                enum=["json", "ndjson"],
+                description="json (default) or ndjson (one classified codon per line)"
+            )
+        },
+        required=["reference_sequence", "user_sequence"]
+    ),
+    responses={
+        200: openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                "summary": openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    description=f"Number of changed codons per type ({', '.join(MUTATION_TYPES)})"
+                ),
+                "mutations": openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_OBJECT),
+                    description="Changed codons with position, ref/user codon and amino acid, and type"
+                )
+            }
+        ),
+        400: "Invalid input"
+    }
+)
+@api_view(["POST"])
+@admission("mutation_classification")
+def mutation_classification_view(request):
     reference_sequence = request.data.get("reference_sequence", "")
     user_sequence = request.data.get("user_sequence", "")
     if not reference_sequence or not user_sequence:
         return Response({"error": "Both reference and user sequences are required."}, status=status.HTTP_400_BAD_REQUEST)
+    output_format = request.data.get("format", "json")
+    if output_format not in ("json", "ndjson"):
+        return Response({"error": "Format must be one of json, ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        summary, mutations = classify_codon_changes(reference_sequence, user_sequence)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        mutations = detect_mutations(reference_sequence, user_sequence)
-        return Response({"mutations": mutations}, status=status.HTTP_200_OK)
+        if output_format == "ndjson":
+            return StreamingHttpResponse(ndjson_mutations(mutations), content_type="application/x-ndjson")
+        return Response({"summary": summary, "mutations": list(mutations)}, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -206,6 +495,7 @@ def mutation_detection_view(request):
     }
 )
 @api_view(["POST"])
+@admission("validate_sequence")
 def sequence_validation_view(request):
     sequence = request.data.get("sequence", "")
     if not sequence:
@@ -221,13 +511,20 @@ def sequence_validation_view(request):
 @swagger_auto_schema(
     method='post',
     operation_summary="Generate DNA Analysis Report",
-    operation_description="Generates a PDF report summarizing the DNA analysis results.",
+    operation_description=(
+        "Generates a multi-page PDF report of the sequence's analyses: summary, GC content graph, "
+        "protein translation and, when a reference is given, mutations."
+    ),
     request_body=openapi.Schema(
         type=openapi.TYPE_OBJECT,
         properties={
             "sequence": openapi.Schema(
                 type=openapi.TYPE_STRING,
                 description="DNA sequence (string of A, T, C, G)"
+            ),
+            "reference_sequence": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description="Optional reference DNA sequence for the mutations section"
             )
         },
         required=["sequence"]
@@ -238,13 +535,16 @@ def sequence_validation_view(request):
     }
 )
 @api_view(["POST"])
+@admission("generate_report")
 def generate_report_view(request):
     sequence = request.data.get("sequence", "")
     if not sequence:
         return Response({"error": "DNA sequence is required."}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        pdf_file = generate_pdf_report(sequence)
-        return FileResponse(pdf_file, content_type='application/pdf')
+        report = pdf_report_file(sequence, request.data.get("reference_sequence") or None)
+        return FileResponse(report, content_type=PDF_CONTENT_TYPE, filename="DNA_Analysis_Report.pdf")
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -252,16 +552,25 @@ def generate_report_view(request):
 @swagger_auto_schema(
     method='post',
     operation_summary="Interactive GC Content Graph",
-    operation_description="Generates an interactive GC content graph for the given DNA sequence.",
+    operation_description=(
+        "Generates an interactive sliding-window GC content and GC skew graph for the given DNA sequence. "
+        "start and end select the zoom range; each trace is downsampled to at most `points` points, "
+        "keeping the minimum and maximum of every bucket."
+    ),
     request_body=openapi.Schema(
         type=openapi.TYPE_OBJECT,
         properties={
             "sequence": openapi.Schema(
                 type=openapi.TYPE_STRING,
-                description="DNA sequence (string of A, T, C, G)"
+                description="DNA sequence (string of A, T, C, G); or use reference and region"
+            ),
+            **reference_properties,
+            **gc_window_properties,
+            "points": openapi.Schema(
+                type=openapi.TYPE_INTEGER,
+                description=f"Maximum points per trace (default {DEFAULT_POINTS}, at most {MAX_POINTS})"
             )
         },
-        required=["sequence"]
     ),
     responses={
         200: "Interactive graph",
@@ -269,16 +578,711 @@ def generate_report_view(request):
     }
 )
 @api_view(["POST"])
+@admission("interactive_gc_content_graph", reads_references=True)
 def interactive_gc_content_view(request):
-    sequence = request.data.get("sequence", "")
+    try:
+        sequence = request_sequence(request.data)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     if not sequence:
         return Response({"error": "DNA sequence is required."}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        graph = interactive_gc_content_graph(sequence)
+        params = parse_gc_window_params(request.data)
+        params["points"] = int(request.data.get("points", DEFAULT_POINTS))
+        graph = cached_result(
+            "interactive_gc_content_graph", params, [sequence], lambda: interactive_gc_content_graph(sequence, **params)
+        )
         return Response({"interactive_graph": graph}, status=status.HTTP_200_OK)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# k-mer Spectrum View
+@swagger_auto_schema(
+    method='post',
+    operation_summary="k-mer Spectrum",
+    operation_description=(
+        "Counts the k-mers of the given DNA sequence and returns the most frequent ones and the spectrum "
+        "histogram (number of distinct k-mers seen exactly m times). k-mers containing non-ACGT bases are skipped."
+    ),
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "sequence": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description="DNA sequence"
+            ),
+            "k": openapi.Schema(
+                type=openapi.TYPE_INTEGER,
+                description=f"k-mer length, 1 to {MAX_K} (default {DEFAULT_K})"
+            ),
+            "canonical": openapi.Schema(
+                type=openapi.TYPE_BOOLEAN,
+                description="Count each k-mer together with its reverse complement (default false)"
+            ),
+            "top": openapi.Schema(
+                type=openapi.TYPE_INTEGER,
+                description=f"Number of most frequent k-mers to return (default {DEFAULT_TOP})"
+            )
+        },
+        required=["sequence"]
+    ),
+    responses={200: "Top k-mers and spectrum histogram", 400: "Invalid input"}
+)
+@api_view(["POST"])
+@admission("kmer_spectrum")
+def kmer_spectrum_view(request):
+    sequence = request.data.get("sequence", "")
+    if not sequence:
+        return Response({"error": "DNA sequence is required."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        params = {
+            "k": int(request.data.get("k", DEFAULT_K)),
+            "canonical": parse_flag(request.data.get("canonical"), "canonical"),
+            "top": int(request.data.get("top", DEFAULT_TOP)),
+        }
+        spectrum = cached_result("kmer_spectrum", params, [sequence], lambda: kmer_spectrum(sequence, **params))
+    except (TypeError, ValueError) as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response(spectrum, status=status.HTTP_200_OK)
+
+
+# Streaming FASTA/FASTQ Upload Views
+upload_operations_description = (
+    f"Comma-separated analyses to run per record: {', '.join(RecordAnalysis.OPERATIONS)} "
+    f"(default {','.join(RecordAnalysis.DEFAULT_OPERATIONS)})"
+)
+upload_responses = {
+    200: "Newline-delimited JSON, one object per record with its name and the requested analyses",
+    400: "Invalid input"
+}
+
+
+def stream_record_results(stream, operations):
+    results = analyze_stream(stream, operations)
+    return StreamingHttpResponse(ndjson_lines(results), content_type="application/x-ndjson")
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_summary="Analyze an Uploaded FASTA/FASTQ File",
+    operation_description=(
+        "Parses an uploaded FASTA or FASTQ file (optionally gzip-compressed) as a stream of records "
+        "and runs the requested analyses on each record chunk by chunk."
+    ),
+    manual_parameters=[
+        openapi.Parameter("file", openapi.IN_FORM, type=openapi.TYPE_FILE, required=True,
+                          description="FASTA/FASTQ file, plain or gzip-compressed"),
+        openapi.Parameter("operations", openapi.IN_FORM, type=openapi.TYPE_STRING,
+                          description=upload_operations_description),
+    ],
+    responses=upload_responses
+)
+@api_view(["POST"])
+@parser_classes([MultiPartParser])
+def upload_sequence_view(request):
+    upload = request.FILES.get("file")
+    if upload is None:
+        return Response({"error": "A FASTA/FASTQ file is required."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        operations = parse_operations(request.data.get("operations"))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return stream_record_results(upload, operations)
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_summary="Analyze a Raw FASTA/FASTQ Request Body",
+    operation_description=(
+        "Reads a FASTA or FASTQ document (optionally gzip-compressed) directly from the request body "
+        "without buffering it, and runs the requested analyses on each record chunk by chunk."
+    ),
+    manual_parameters=[
+        openapi.Parameter("operations", openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description=upload_operations_description),
+    ],
+    responses=upload_responses
+)
+@api_view(["POST"])
+def upload_raw_sequence_view(request):
+    try:
+        operations = parse_operations(request.query_params.get("operations"))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if request.stream is None:
+        return Response({"error": "A FASTA/FASTQ request body is required."}, status=status.HTTP_400_BAD_REQUEST)
+    return stream_record_results(request.stream, operations)
+
+
+# Batch Analysis View
+@swagger_auto_schema(
+    method='post',
+    operation_summary="Batch Sequence Analysis",
+    operation_description=(
+        "Runs a list of analyses on many sequences in one request, spread across a process pool. "
+        "Results are returned in input order; a failing operation is reported per item."
+    ),
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "sequences": openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Schema(type=openapi.TYPE_STRING),
+                description="DNA sequences"
+            ),
+            "operations": openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Schema(type=openapi.TYPE_STRING, enum=list(BATCH_OPERATIONS)),
+                description="Analyses to run on every sequence"
+            )
+        },
+        required=["sequences", "operations"]
+    ),
+    responses={
+        200: openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                "results": openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_OBJECT),
+                    description="Per sequence: index, status (ok, partial or error), results and errors by operation"
+                )
+            }
+        ),
+        400: "Invalid input"
+    }
+)
+@api_view(["POST"])
+@admission("batch", size=batch_size)
+def batch_analysis_view(request):
+    sequences = request.data.get("sequences")
+    if not isinstance(sequences, list) or not sequences:
+        return Response({"error": "A non-empty list of sequences is required."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        operations = parse_batch_operations(request.data.get("operations"))
+    except (TypeError, ValueError) as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        return Response({"results": run_batch(sequences, operations)}, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+# Result Cache Statistics View
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Result Cache Statistics",
+    operation_description="Hit, miss and eviction counters and current size of the analysis result cache.",
+    responses={200: "Cache statistics"}
+)
+@api_view(["GET"])
+def cache_stats_view(request):
+    return Response(get_result_cache().stats(), status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Metrics",
+    operation_description=(
+        "Request and stage latency histograms and result cache counters of this worker process, "
+        "in the Prometheus text format."
+    ),
+    responses={200: "Prometheus text exposition"}
+)
+@api_view(["GET"])
+def metrics_view(request):
+    return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+
+# Full Analysis View
+@swagger_auto_schema(
+    method='post',
+    operation_summary="Full DNA Analysis",
+    operation_description=(
+        "Validates the sequence, computes its GC content, translates it and, when a reference is given, "
+        "detects mutations against it in a single pass over the sequence. The analysis is saved and its "
+        "ID returned; GET /analyses/<id>/ reads it back without recomputing."
+    ),
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "sequence": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description="DNA sequence"
+            ),
+            "reference_sequence": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description="Optional reference DNA sequence for mutation detection"
+            ),
+            "mode": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                enum=list(DETECTION_MODES),
+                description="Mutation detection mode (default: direct for equal lengths, otherwise alignment)"
+            ),
+            "band": openapi.Schema(
+                type=openapi.TYPE_INTEGER,
+                description=f"Alignment band width in bases (default {DEFAULT_BAND})"
+            ),
+            "collapse_runs": openapi.Schema(
+                type=openapi.TYPE_BOOLEAN,
+                description="Report runs of adjacent substitutions as one multi-nucleotide variant (mnv)"
+            )
+        },
+        required=["sequence"]
+    ),
+    responses={
+        201: openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                "analysis_id": openapi.Schema(type=openapi.TYPE_INTEGER, description="ID of the saved analysis"),
+                "length": openapi.Schema(type=openapi.TYPE_INTEGER, description="Sequence length"),
+                "valid": openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Whether the sequence is pure ACGT"),
+                "gc_content": openapi.Schema(type=openapi.TYPE_NUMBER, description="GC content in percent"),
+                "mutation_count": openapi.Schema(type=openapi.TYPE_INTEGER, description="Number of mutations")
+            }
+        ),
+        400: "Invalid input"
+    }
+)
+@api_view(["POST"])
+@admission("analysis")
+def full_analysis_view(request):
+    sequence = request.data.get("sequence", "")
+    if not sequence:
+        return Response({"error": "DNA sequence is required."}, status=status.HTTP_400_BAD_REQUEST)
+    mode = request.data.get("mode")
+    if mode is not None and mode not in DETECTION_MODES:
+        return Response({"error": f"Mode must be one of {', '.join(DETECTION_MODES)}."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        result = analyze_sequence(
+            sequence,
+            request.data.get("reference_sequence") or None,
+            mode=mode,
+            collapse_runs=parse_flag(request.data.get("collapse_runs"), "collapse_runs"),
+            band=int(request.data.get("band", DEFAULT_BAND)),
+        )
+    except (TypeError, ValueError) as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    analysis = save_sequence_analysis(sequence, result)
+    return Response({
+        "analysis_id": analysis.id,
+        "length": result["length"],
+        "valid": result["valid"],
+        "gc_content": result["gc_content"],
+        "mutation_count": len(result["mutations"]),
+    }, status=status.HTTP_201_CREATED)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Saved DNA Analysis",
+    responses={200: DNAAnalysisSerializer, 404: "Analysis not found"}
+)
+@api_view(["GET"])
+def analysis_detail_view(request, analysis_id):
+    analysis = DNAAnalysis.objects.filter(pk=analysis_id).first()
+    if analysis is None:
+        return Response({"error": "Analysis not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(DNAAnalysisSerializer(analysis).data, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Saved Sequence Range",
+    operation_description="Returns bases [start, end) of a saved analysis' sequence, decoding only that range.",
+    manual_parameters=[
+        openapi.Parameter("start", openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Start (0-based, default 0)"),
+        openapi.Parameter("end", openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description="End (exclusive, defaults to the sequence length)"),
+    ],
+    responses={200: "Sequence range", 404: "Analysis not found"}
+)
+@api_view(["GET"])
+def analysis_sequence_view(request, analysis_id):
+    try:
+        start = int(request.query_params.get("start", 0))
+        end = request.query_params.get("end")
+        end = None if end is None else int(end)
+        if start < 0 or (end is not None and end < start):
+            raise ValueError("Start and end must satisfy 0 <= start <= end.")
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        sequence = DNAAnalysis.sequence_range(analysis_id, start, end)
+    except DNAAnalysis.DoesNotExist:
+        return Response({"error": "Analysis not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"start": start, "end": start + len(sequence), "sequence": sequence}, status=status.HTTP_200_OK)
+
+
+# Indexed Mutation Query Views
+mutation_filter_parameters = [
+    openapi.Parameter("start", openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                      description="Only mutations at or after this position (0-based)"),
+    openapi.Parameter("end", openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                      description="Only mutations before this position"),
+    openapi.Parameter("type", openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      enum=[value for value, _ in Mutation.TYPE_CHOICES], description="Mutation type"),
+    openapi.Parameter("reference_base", openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Reference bases"),
+    openapi.Parameter("user_base", openapi.IN_QUERY, type=openapi.TYPE_STRING, description="User bases"),
+    openapi.Parameter("analyses", openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="Comma-separated analysis IDs to restrict the query to"),
+    openapi.Parameter("limit", openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                      description=f"Page size (default {DEFAULT_MUTATION_LIMIT}, at most {MAX_MUTATION_LIMIT})"),
+]
+
+
+def parse_mutation_filters(params):
+    mutation_type = params.get("type")
+    if mutation_type is not None and mutation_type not in dict(Mutation.TYPE_CHOICES):
+        raise ValueError(f"Type must be one of {', '.join(dict(Mutation.TYPE_CHOICES))}.")
+    try:
+        start, end = params.get("start"), params.get("end")
+        analyses = params.get("analyses")
+        return {
+            "start": None if start is None else int(start),
+            "end": None if end is None else int(end),
+            "mutation_type": mutation_type,
+            "reference_base": params.get("reference_base"),
+            "user_base": params.get("user_base"),
+            "analyses": None if analyses is None else [int(pk) for pk in analyses.split(",") if pk],
+        }
+    except ValueError:
+        raise ValueError("Start, end and analysis IDs must be integers.")
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Query Stored Mutations",
+    operation_description=(
+        "Stored mutations of all saved analyses matching the filters, in position order. "
+        "Pages are chained with the returned next_cursor."
+    ),
+    manual_parameters=mutation_filter_parameters + [
+        openapi.Parameter("cursor", openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="next_cursor of the previous page"),
+    ],
+    responses={200: "Mutations", 400: "Invalid input"}
+)
+@api_view(["GET"])
+def mutation_query_view(request):
+    try:
+        mutations = filter_mutations(**parse_mutation_filters(request.query_params))
+        rows, next_cursor = mutation_page(
+            mutations, request.query_params.get("cursor"),
+            int(request.query_params.get("limit", DEFAULT_MUTATION_LIMIT)),
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"mutations": rows, "next_cursor": next_cursor}, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Samples With Mutations",
+    operation_description=(
+        "Saved analyses with at least one stored mutation matching the filters (e.g. a position range), "
+        "with their mutation count and first and last matching positions, in analysis ID order."
+    ),
+    manual_parameters=mutation_filter_parameters + [
+        openapi.Parameter("after", openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description="Only analyses with a higher ID (the last ID of the previous page)"),
+    ],
+    responses={200: "Analyses", 400: "Invalid input"}
+)
+@api_view(["GET"])
+def mutation_samples_view(request):
+    try:
+        mutations = filter_mutations(**parse_mutation_filters(request.query_params))
+        after = request.query_params.get("after")
+        samples = samples_with_mutations(
+            mutations, None if after is None else int(after),
+            int(request.query_params.get("limit", DEFAULT_MUTATION_LIMIT)),
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"analyses": samples}, status=status.HTTP_200_OK)
+
+
+# Reference Genome Views
+def reference_summary(reference):
+    return {
+        "name": reference.name,
+        "description": reference.description,
+        "total_length": reference.total_length,
+        "created_at": reference.created_at,
+    }
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="List Reference Genomes",
+    responses={200: "Registered references"}
+)
+@swagger_auto_schema(
+    method='post',
+    operation_summary="Register a Reference Genome",
+    operation_description=(
+        "Stores an uploaded FASTA file (optionally gzip-compressed) as a packed, memory-mapped reference. "
+        "Other endpoints can then read regions of it with reference and region instead of a sequence."
+    ),
+    manual_parameters=[
+        openapi.Parameter("name", openapi.IN_FORM, type=openapi.TYPE_STRING, required=True,
+                          description="Reference name (letters, digits, - and _)"),
+        openapi.Parameter("file", openapi.IN_FORM, type=openapi.TYPE_FILE, required=True,
+                          description="FASTA file, plain or gzip-compressed"),
+        openapi.Parameter("description", openapi.IN_FORM, type=openapi.TYPE_STRING, description="Description"),
+    ],
+    responses={201: "Reference registered", 400: "Invalid input"}
+)
+@api_view(["GET", "POST"])
+@parser_classes([MultiPartParser])
+def reference_list_view(request):
+    if request.method == "GET":
+        references = ReferenceGenome.objects.order_by("name")
+        return Response({"references": [reference_summary(reference) for reference in references]},
+                        status=status.HTTP_200_OK)
+    name = request.data.get("name", "")
+    upload = request.FILES.get("file")
+    if not name or upload is None:
+        return Response({"error": "A name and a FASTA file are required."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        reference = register_reference(name, upload, request.data.get("description", ""))
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(reference_summary(reference), status=status.HTTP_201_CREATED)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Reference Genome Details",
+    responses={200: "Reference and its sequences", 404: "Reference not found"}
+)
+@swagger_auto_schema(
+    method='delete',
+    operation_summary="Delete a Reference Genome",
+    responses={204: "Deleted", 404: "Reference not found"}
+)
+@api_view(["GET", "DELETE"])
+def reference_detail_view(request, name):
+    try:
+        reference = get_reference(name)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+    if request.method == "DELETE":
+        delete_reference(reference)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    contigs = [{"name": contig.name, "length": contig.length} for contig in reference.contigs.all()]
+    return Response({**reference_summary(reference), "sequences": contigs}, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Reference Genome Region",
+    manual_parameters=[
+        openapi.Parameter("region", openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description='"name" or "name:start-end" (1-based, inclusive)'),
+    ],
+    responses={200: "Region sequence", 400: "Invalid region"}
+)
+@api_view(["GET"])
+def reference_region_view(request, name):
+    region = request.query_params.get("region")
+    try:
+        sequence = reference_region(name, region)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"reference": name, "region": region, "sequence": sequence}, status=status.HTTP_200_OK)
+
+
+# Motif Search View
+@swagger_auto_schema(
+    method='post',
+    operation_summary="Motif Search",
+    operation_description=(
+        "Finds a pattern (A, C, G, T or IUPAC codes) on one or both strands of an inline sequence or a "
+        "registered reference, allowing mismatches. References are searched through a suffix array built "
+        "once per sequence (or ahead of time with manage.py build_search_index); inline sequences are "
+        "scanned. Hit lists are cached, so further pages do not search again."
+    ),
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "pattern": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description="Pattern to find; IUPAC codes such as R, Y or N match any of their bases"
+            ),
+            "sequence": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description="DNA sequence to search (when no reference is given)"
+            ),
+            **reference_properties,
+            "mismatches": openapi.Schema(
+                type=openapi.TYPE_INTEGER,
+                description=f"Mismatches allowed per hit, 0 to {MAX_MISMATCHES} (default 0)"
+            ),
+            "strands": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                enum=list(STRANDS),
+                description="Strands to search (default both); minus strand hits are in forward coordinates"
+            ),
+            "offset": openapi.Schema(
+                type=openapi.TYPE_INTEGER,
+                description="Number of hits to skip (default 0)"
+            ),
+            "limit": openapi.Schema(
+                type=openapi.TYPE_INTEGER,
+                description=f"Hits per page, at most {MAX_HIT_LIMIT} (default {DEFAULT_HIT_LIMIT})"
+            )
+        },
+        required=["pattern"]
+    ),
+    responses={200: "Total hit count and one page of hits (0-based start, exclusive end)", 400: "Invalid input"}
+)
+@api_view(["POST"])
+@admission("motif_search", reads_references=True)
+def motif_search_view(request):
+    data = request.data
+    pattern = data.get("pattern", "")
+    if not pattern:
+        return Response({"error": "Pattern is required."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        options = {
+            "mismatches": int(data.get("mismatches", 0)),
+            "strands": data.get("strands", "both"),
+            "offset": int(data.get("offset", 0)),
+            "limit": int(data.get("limit", DEFAULT_HIT_LIMIT)),
+        }
+        if data.get("reference"):
+            page = reference_hit_page(data["reference"], pattern, region=data.get("region"), **options)
+        elif data.get("sequence"):
+            page = sequence_hit_page(data["sequence"], pattern, **options)
+        else:
+            return Response({"error": "A DNA sequence or a reference is required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+    except (TypeError, ValueError) as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"pattern": pattern, "mismatches": options["mismatches"], "strands": options["strands"], **page},
+                    status=status.HTTP_200_OK)
+
+
+# Analysis Job Views
+def job_status(job):
+    return {
+        "job_id": str(job.id),
+        "operation": job.operation,
+        "status": job.status,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "error": job.error or None,
+        "analysis_id": job.analysis_id,
+    }
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_summary="Submit Analysis Job",
+    operation_description=(
+        "Queues a long-running analysis for the background worker (manage.py run_analysis_worker) "
+        "and returns its job ID immediately."
+    ),
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "operation": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                enum=list(JOB_OPERATIONS),
+                description="Analysis to run"
+            ),
+            "sequence": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description="DNA sequence (the user sequence for mutation operations)"
+            ),
+            "reference_sequence": openapi.Schema(
+                type=openapi.TYPE_STRING,
+                description="Reference DNA sequence, for mutation operations"
+            ),
+            "params": openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                description="Operation parameters, as accepted by the corresponding endpoint"
+            )
+        },
+        required=["operation", "sequence"]
+    ),
+    responses={202: "Job queued", 400: "Invalid input"}
+)
+@api_view(["POST"])
+def submit_job_view(request):
+    sequence = request.data.get("sequence", "")
+    if not sequence:
+        return Response({"error": "DNA sequence is required."}, status=status.HTTP_400_BAD_REQUEST)
+    params = request.data.get("params") or {}
+    if not isinstance(params, dict):
+        return Response({"error": "Params must be an object."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        job = submit_job(
+            request.data.get("operation", ""), sequence, request.data.get("reference_sequence", ""), params
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(job_status(job), status=status.HTTP_202_ACCEPTED)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Analysis Job Status",
+    responses={200: "Job status", 404: "Job not found"}
+)
+@api_view(["GET"])
+def job_status_view(request, job_id):
+    job = AnalysisJob.objects.defer("sequence", "reference_sequence", "result", "result_file").filter(pk=job_id).first()
+    if job is None:
+        return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(job_status(job), status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Analysis Job Result",
+    operation_description=(
+        "Returns the result of a finished job. List-valued results (mutations, ORFs, ...) are paginated "
+        "with offset and limit; PDF results are returned as a file."
+    ),
+    manual_parameters=[
+        openapi.Parameter("field", openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="List-valued result field to page through (default: the first one)"),
+        openapi.Parameter("offset", openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="First item (default 0)"),
+        openapi.Parameter("limit", openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description=f"Number of items (default {DEFAULT_PAGE_SIZE})"),
+    ],
+    responses={200: "Job result", 404: "Job not found", 409: "Job not finished"}
+)
+@api_view(["GET"])
+def job_result_view(request, job_id):
+    job = AnalysisJob.objects.defer("sequence", "reference_sequence").filter(pk=job_id).first()
+    if job is None:
+        return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+    if job.status == AnalysisJob.FAILED:
+        return Response(job_status(job), status=status.HTTP_200_OK)
+    if job.status != AnalysisJob.SUCCEEDED:
+        return Response(job_status(job), status=status.HTTP_409_CONFLICT)
+    if job.result_file is not None:
+        return FileResponse(io.BytesIO(bytes(job.result_file)), content_type=job.result_content_type)
+    try:
+        page = result_page(
+            job,
+            request.query_params.get("field"),
+            int(request.query_params.get("offset", 0)),
+            int(request.query_params.get("limit", DEFAULT_PAGE_SIZE)),
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({**job_status(job), "result": page}, status=status.HTTP_200_OK)
+
 
 @swagger_auto_schema(
     method='post',
@@ -320,7 +1324,6 @@ login_params = openapi.Schema(
             },
         ),
         401: "Invalid credentials.",
-        404: "User does not exist.",
     },
 )
 @api_view(["POST"])
@@ -329,17 +1332,43 @@ def login_user(request):
     username = request.data.get("username")
     password = request.data.get("password")
 
-    try:
-        user = User.objects.get(username=username)
-        if user.check_password(password):
-            refresh = RefreshToken.for_user(user)
-            return Response({
-                "refresh": str(refresh),
-                "access": str(refresh.access_token),
-            }, status=status.HTTP_200_OK)
+    # One lookup; unknown users still cost a password hash, so timing does not reveal them
+    user = authenticate(request._request, username=username, password=password)
+    if user is None:
         return Response({"error": "Invalid credentials."}, status=status.HTTP_401_UNAUTHORIZED)
-    except User.DoesNotExist:
-        return Response({"error": "User does not exist."}, status=status.HTTP_404_NOT_FOUND)
+    refresh = RefreshToken.for_user(user)
+    return Response({
+        "refresh": str(refresh),
+        "access": str(refresh.access_token),
+    }, status=status.HTTP_200_OK)
+
+# Logout Parameters for Swagger
+logout_params = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'refresh': openapi.Schema(type=openapi.TYPE_STRING, description='Refresh token to revoke'),
+    },
+    required=['refresh']
+)
+
+# Logout User: blacklists the refresh token; access tokens issued from it
+# stay valid until they expire (SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'])
+@swagger_auto_schema(
+    method='post',
+    request_body=logout_params,
+    responses={
+        205: "Refresh token revoked.",
+        400: "Invalid or already revoked token.",
+    },
+)
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def logout_user(request):
+    try:
+        RefreshToken(request.data.get("refresh", "")).blacklist()
+    except TokenError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"message": "Refresh token revoked."}, status=status.HTTP_205_RESET_CONTENT)
 
 # Protected Endpoint Example
 @swagger_auto_schema(
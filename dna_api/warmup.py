@@ -0,0 +1,25 @@
+import importlib
+
+from .charts import gc_content_figures
+
+# The plotting, PDF and Biopython libraries are imported on first use, so a
+# worker that only serves sequence endpoints never loads them. Preforking
+# servers can instead load them once in the master (DNA_WARM_UP = True with
+# e.g. gunicorn --preload) so every worker shares the pages and the first
+# chart or report request does not pay the import.
+
+HEAVY_MODULES = (
+    "matplotlib.backends.backend_agg",
+    "matplotlib.figure",
+    "plotly.graph_objects",
+    "reportlab.lib.pagesizes",
+    "reportlab.pdfgen.canvas",
+    "Bio.Seq",
+)
+
+
+def warm_up(modules=HEAVY_MODULES):
+    for name in modules:
+        importlib.import_module(name)
+    # Building and drawing one chart template also loads fonts and the Agg renderer
+    gc_content_figures.render_png(lambda figure: None)